@@ -21,6 +21,14 @@ django_asgi_app = get_asgi_application()
 # Import routing and middleware after Django is initialized
 from predictions.routing import websocket_urlpatterns
 from predictions.middleware import TokenAuthMiddleware
+from django.conf import settings
+
+if settings.ML_PRELOAD_MODELS:
+    from predictions.ml_service import warmup
+    from recommendations.components import warmup as warmup_recommendations
+
+    warmup()
+    warmup_recommendations()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
@@ -191,6 +191,171 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@dealgoat.com'
 # OTP Configuration
 OTP_EXPIRY_MINUTES = 10
 
+# Load the price models and the recommendation components at server start
+# instead of on the first request. Under gunicorn with preload_app this
+# happens once in the master process.
+ML_PRELOAD_MODELS = config('ML_PRELOAD_MODELS', default=False, cast=bool)
+
+# Bundle checksums are verified when a version is made active or shadowed
+# (model_bundle.set_active_version); set this to check them again on every load
+ML_BUNDLE_VERIFY = config('ML_BUNDLE_VERIFY', default=False, cast=bool)
+
+# Tree inference: 'compiled' (NumPy node tables, checked against the trained
+# model when the bundle is built, or on first use for loose pickles) or
+# 'reference' (call the sklearn/xgboost estimator)
+ML_INFERENCE_BACKEND = config('ML_INFERENCE_BACKEND', default='compiled')
+
+# Largest batch the compiled backend serves per model kind; bigger batches
+# (bulk pricing, repricing jobs, depreciation curves) call the estimator,
+# which is faster there. Re-measure with `python -m predictions.benchmark`.
+ML_COMPILED_MAX_ROWS = {
+    'xgboost': config('ML_COMPILED_MAX_ROWS_XGBOOST', default=8, cast=int),
+    'sklearn_forest': config('ML_COMPILED_MAX_ROWS_FOREST', default=256, cast=int),
+}
+
+# Laptop model served: 'full' forest or the 'compact' model that
+# train_laptop_model.py derives from it within an MAE budget
+ML_LAPTOP_VARIANT = config('ML_LAPTOP_VARIANT', default='full')
+
+# ML prediction cache (per-process LRU, optionally backed by the Django cache)
+PREDICTION_CACHE = {
+    'MAX_ENTRIES': config('PREDICTION_CACHE_MAX_ENTRIES', default=10000, cast=int),
+    'TTL_SECONDS': config('PREDICTION_CACHE_TTL_SECONDS', default=3600, cast=int),
+    'USE_SHARED_CACHE': config('PREDICTION_CACHE_SHARED', default=False, cast=bool),
+}
+
+# Micro-batching of concurrent single predictions: requests arriving within
+# MAX_WAIT_MS (up to MAX_BATCH_SIZE rows) share one vectorized model call.
+# Only useful when a process serves requests concurrently (threads/ASGI).
+PREDICTION_BATCHING = {
+    'ENABLED': config('PREDICTION_BATCHING_ENABLED', default=False, cast=bool),
+    'MAX_BATCH_SIZE': config('PREDICTION_BATCHING_MAX_BATCH_SIZE', default=64, cast=int),
+    'MAX_WAIT_MS': config('PREDICTION_BATCHING_MAX_WAIT_MS', default=2.0, cast=float),
+    'TIMEOUT_SECONDS': config('PREDICTION_BATCHING_TIMEOUT_SECONDS', default=5.0, cast=float),
+}
+
+# Where predictions run: 'inline' (request thread), 'thread' or 'process'
+# pool (each process worker preloads the models). Requests beyond
+# MAX_PENDING in-flight jobs are rejected with 503 instead of queueing.
+INFERENCE_EXECUTOR = {
+    'KIND': config('INFERENCE_EXECUTOR_KIND', default='inline'),
+    'MAX_WORKERS': config('INFERENCE_EXECUTOR_MAX_WORKERS', default=2, cast=int),
+    'MAX_PENDING': config('INFERENCE_EXECUTOR_MAX_PENDING', default=32, cast=int),
+    'TIMEOUT_SECONDS': config('INFERENCE_EXECUTOR_TIMEOUT_SECONDS', default=10.0, cast=float),
+}
+
+# Bulk CSV repricing jobs (files are kept on local disk). Each process
+# prices at most MAX_WORKERS jobs at once, the rest stay queued; a user may
+# have MAX_ACTIVE_PER_USER jobs queued or running. Jobs whose process died
+# (or that recorded no progress for ORPHAN_SECONDS) are resumed with
+# `manage.py resume_repricing_jobs`.
+REPRICING_JOBS = {
+    'DIR': config('REPRICING_JOBS_DIR', default=os.path.join(MEDIA_ROOT, 'repricing')),
+    'CHUNK_ROWS': config('REPRICING_CHUNK_ROWS', default=1000, cast=int),
+    'MAX_UPLOAD_MB': config('REPRICING_MAX_UPLOAD_MB', default=50, cast=int),
+    'MAX_WORKERS': config('REPRICING_MAX_WORKERS', default=1, cast=int),
+    'MAX_ACTIVE_PER_USER': config('REPRICING_MAX_ACTIVE_PER_USER', default=2, cast=int),
+    'ORPHAN_SECONDS': config('REPRICING_ORPHAN_SECONDS', default=900, cast=int),
+}
+
+# Model version rollout: workers poll the bundle CURRENT/SHADOW pointers every
+# RELOAD_CHECK_SECONDS (0 disables) and hot-swap new versions. A SHADOW
+# version is scored on SHADOW_SAMPLE_RATE of live batches off the response
+# path; batches beyond SHADOW_QUEUE_SIZE pending are dropped.
+MODEL_REGISTRY = {
+    'RELOAD_CHECK_SECONDS': config('MODEL_RELOAD_CHECK_SECONDS', default=5.0, cast=float),
+    'SHADOW_SAMPLE_RATE': config('MODEL_SHADOW_SAMPLE_RATE', default=0.1, cast=float),
+    'SHADOW_QUEUE_SIZE': config('MODEL_SHADOW_QUEUE_SIZE', default=64, cast=int),
+}
+
+# Nearest-comparables index shown next to predictions: rebuilt with
+# `manage.py build_comparables_index`, then caught up from the database in
+# the background every SYNC_SECONDS and saved every SAVE_SECONDS.
+COMPARABLES = {
+    'ENABLED': config('COMPARABLES_ENABLED', default=True, cast=bool),
+    'DIR': config('COMPARABLES_DIR', default=os.path.join(BASE_DIR, 'predictions', 'ml_models', 'comparables')),
+    'COUNT': config('COMPARABLES_COUNT', default=5, cast=int),
+    'SYNC_SECONDS': config('COMPARABLES_SYNC_SECONDS', default=10.0, cast=float),
+    'SAVE_SECONDS': config('COMPARABLES_SAVE_SECONDS', default=300.0, cast=float),
+    'MERGE_ROWS': config('COMPARABLES_MERGE_ROWS', default=1024, cast=int),
+}
+
+# Live market price index: per-model monthly price aggregates (quantile
+# sketches) folded in from predictions and sold listings by
+# `python manage.py update_market_index` (run it from cron). Serving merges
+# the last WINDOW_MONTHS into a snapshot every REFRESH_SECONDS and uses it
+# for models with at least MIN_OBSERVATIONS prices in place of the
+# training-time smartphone stats. AUTO_UPDATE makes every serving process
+# run the update itself before reloading: only for single-process setups.
+MARKET_INDEX = {
+    'ENABLED': config('MARKET_INDEX_ENABLED', default=True, cast=bool),
+    'AUTO_UPDATE': config('MARKET_INDEX_AUTO_UPDATE', default=False, cast=bool),
+    'WINDOW_MONTHS': config('MARKET_INDEX_WINDOW_MONTHS', default=3, cast=int),
+    'MIN_OBSERVATIONS': config('MARKET_INDEX_MIN_OBSERVATIONS', default=20, cast=int),
+    'REFRESH_SECONDS': config('MARKET_INDEX_REFRESH_SECONDS', default=60.0, cast=float),
+    'RELATIVE_ACCURACY': config('MARKET_INDEX_RELATIVE_ACCURACY', default=0.01, cast=float),
+}
+
+# Recommendation pipeline: engines are built once per process (see
+# recommendations/components.py); the ranking model is only loaded from
+# RANKER_MODEL_PATH, never trained while serving.
+RECOMMENDATIONS = {
+    'RANKER_MODEL_PATH': config('RECOMMENDATIONS_RANKER_MODEL_PATH', default=os.path.join(BASE_DIR, 'product_ranker_model.pkl')),
+}
+
+# Live product search: every (retailer, query) scrape for the first
+# MAX_QUERIES queries runs concurrently on MAX_WORKERS threads per process.
+# Searches still running once ENOUGH_PRODUCTS are found or after
+# DEADLINE_SECONDS are cancelled.
+PRODUCT_SEARCH = {
+    'MAX_WORKERS': config('PRODUCT_SEARCH_MAX_WORKERS', default=4, cast=int),
+    'MAX_QUERIES': config('PRODUCT_SEARCH_MAX_QUERIES', default=2, cast=int),
+    'DEADLINE_SECONDS': config('PRODUCT_SEARCH_DEADLINE_SECONDS', default=20.0, cast=float),
+    'ENOUGH_PRODUCTS': config('PRODUCT_SEARCH_ENOUGH_PRODUCTS', default=5, cast=int),
+}
+
+# Scraped search results are kept in the database per retailer and
+# normalized query. Entries younger than the retailer's TTL are served as
+# is; for STALE_SECONDS after that they are still served while a background
+# scrape (REFRESH_DEADLINE_SECONDS) refreshes them. Refreshes run on their
+# own REFRESH_WORKERS threads, apart from live searches, with at most
+# REFRESH_MAX_PENDING queued per process. Expired rows are removed with
+# `manage.py purge_scrape_cache`.
+SCRAPE_CACHE = {
+    'ENABLED': config('SCRAPE_CACHE_ENABLED', default=True, cast=bool),
+    'TTL_SECONDS': {
+        'amazon': config('SCRAPE_CACHE_AMAZON_TTL_SECONDS', default=3600, cast=int),
+        'flipkart': config('SCRAPE_CACHE_FLIPKART_TTL_SECONDS', default=3600, cast=int),
+    },
+    'DEFAULT_TTL_SECONDS': config('SCRAPE_CACHE_DEFAULT_TTL_SECONDS', default=3600, cast=int),
+    'STALE_SECONDS': config('SCRAPE_CACHE_STALE_SECONDS', default=86400, cast=int),
+    'REFRESH_DEADLINE_SECONDS': config('SCRAPE_CACHE_REFRESH_DEADLINE_SECONDS', default=30.0, cast=float),
+    'REFRESH_WORKERS': config('SCRAPE_CACHE_REFRESH_WORKERS', default=1, cast=int),
+    'REFRESH_MAX_PENDING': config('SCRAPE_CACHE_REFRESH_MAX_PENDING', default=16, cast=int),
+}
+
+# Retailer search pages are first fetched over plain HTTP (kept-alive
+# connections, TIMEOUT_SECONDS per page); the browser is only used when the
+# page has no result containers or can't be fetched.
+HTTP_FETCH = {
+    'ENABLED': config('HTTP_FETCH_ENABLED', default=True, cast=bool),
+    'TIMEOUT_SECONDS': config('HTTP_FETCH_TIMEOUT_SECONDS', default=5.0, cast=float),
+    'POOL_SIZE': config('HTTP_FETCH_POOL_SIZE', default=8, cast=int),
+}
+
+# Headless browsers are kept warm and reused across searches: at most SIZE
+# per process, each quit after MAX_USES searches. A search waits at most
+# ACQUIRE_TIMEOUT_SECONDS (or its deadline) for a free browser. With
+# BLOCK_RESOURCES the browsers skip images, media, fonts, ads and trackers
+# and stop page loads at DOMContentLoaded.
+BROWSER_POOL = {
+    'SIZE': config('BROWSER_POOL_SIZE', default=4, cast=int),
+    'MAX_USES': config('BROWSER_POOL_MAX_USES', default=50, cast=int),
+    'ACQUIRE_TIMEOUT_SECONDS': config('BROWSER_POOL_ACQUIRE_TIMEOUT_SECONDS', default=15.0, cast=float),
+    'PAGE_LOAD_TIMEOUT_SECONDS': config('BROWSER_POOL_PAGE_LOAD_TIMEOUT_SECONDS', default=30.0, cast=float),
+    'BLOCK_RESOURCES': config('BROWSER_POOL_BLOCK_RESOURCES', default=True, cast=bool),
+}
+
 # ASGI Configuration for WebSockets
 ASGI_APPLICATION = 'dealgoat.asgi.application'
 
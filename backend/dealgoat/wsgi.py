@@ -15,3 +15,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dealgoat.settings')
 
 application = get_wsgi_application()
 
+from django.conf import settings
+
+if settings.ML_PRELOAD_MODELS:
+    # Load once before gunicorn forks so workers share the model pages
+    from predictions.ml_service import warmup
+    from recommendations.components import warmup as warmup_recommendations
+
+    warmup_recommendations()
+    warmup(freeze=True)
+
@@ -0,0 +1,18 @@
+"""
+Gunicorn configuration for dealgoat.
+
+Picked up automatically when gunicorn is started from backend/.
+"""
+
+from pathlib import Path
+
+from decouple import AutoConfig
+
+# Same source as dealgoat/settings.py: the environment, then backend/.env
+config = AutoConfig(search_path=str(Path(__file__).resolve().parent))
+
+# With ML_PRELOAD_MODELS the app (and the price models, see dealgoat/wsgi.py)
+# is loaded once in the master, and forked workers share it copy-on-write.
+# Read exactly like settings.ML_PRELOAD_MODELS, so the master never warms
+# models for workers that don't inherit them.
+preload_app = config('ML_PRELOAD_MODELS', default=False, cast=bool)
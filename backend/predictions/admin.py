@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import LaptopPrediction, SmartphonePrediction, Listing, Conversation, Message
+from .models import (
+    LaptopPrediction, SmartphonePrediction, Listing, Conversation, Message, RepricingJob, MarketPriceAggregate,
+)
 
 
 @admin.register(LaptopPrediction)
@@ -106,3 +108,21 @@ class MessageAdmin(admin.ModelAdmin):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content'
 
+
+
+@admin.register(RepricingJob)
+class RepricingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'device_type', 'status', 'processed_rows', 'failed_rows', 'worker', 'created_at']
+    list_filter = ['device_type', 'status', 'created_at']
+    search_fields = ['user__email', 'original_filename']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'heartbeat_at']
+    date_hierarchy = 'created_at'
+
+
+@admin.register(MarketPriceAggregate)
+class MarketPriceAggregateAdmin(admin.ModelAdmin):
+    list_display = ['model_name', 'device_type', 'period', 'count', 'median', 'p10', 'p90', 'updated_at']
+    list_filter = ['device_type', 'period']
+    search_fields = ['model_name']
+    readonly_fields = ['updated_at']
+    exclude = ['sketch']
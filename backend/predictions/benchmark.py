@@ -0,0 +1,462 @@
+"""
+Prediction Benchmarks
+Measures the model-serving hot paths of ml_service without network access
+
+Uses the trained artifacts in ml_models/ when present; otherwise (or with
+--synthetic) small synthetic models with the same feature pipeline are
+trained into a temporary directory first.
+
+Besides end-to-end latency, every batch size is timed through the tree
+tables and the estimator alone. With --check-cutoff the run fails when the
+compiled backend serves a batch size the other path is clearly faster for.
+
+Usage:
+    python -m predictions.benchmark --output bench.json
+    python -m predictions.benchmark --baseline bench.json --max-regression 0.25
+    python -m predictions.benchmark --check-cutoff --cutoff-tolerance 0.5
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # Allow running as a plain script from backend/predictions/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from predictions.feature_engineering import SMARTPHONE_FEATURES
+from predictions.feature_vectorizer import FeatureVectorizer
+from predictions.inference_backends import BACKEND_CHOICES, CompiledBackend, build_backend
+from predictions.ml_service import LaptopPricePredictor, SmartphonePricePredictor
+from predictions.model_bundle import active_version, save_bundle
+
+
+PREDICTORS = {
+    "laptop": LaptopPricePredictor,
+    "smartphone": SmartphonePricePredictor,
+}
+# Keep the benchmark off the database: no live market-index overlay
+PREDICTOR_OPTIONS = {
+    "smartphone": {"use_market_index": False},
+}
+DEFAULT_BATCH_SIZES = (1, 16, 64, 256, 1024)
+# Metrics compared against a baseline (lower is better)
+LATENCY_METRICS = ("single_p50_ms", "single_p99_ms")
+MODEL_CALL_REPEATS = 20
+# Served-vs-best differences below this are timer noise, whatever the ratio
+CUTOFF_MIN_DIFF_MS = 0.05
+
+LAPTOP_VOCAB = {
+    "brand": ["HP", "Dell", "Lenovo", "Asus", "Acer", "Apple", "MSI"],
+    "model": ["Pavilion", "Inspiron", "ThinkPad", "ZenBook", "Aspire", "MacBook Air"],
+    "processor": ["Intel Core i3", "Intel Core i5", "Intel Core i7", "AMD Ryzen 5", "AMD Ryzen 7", "Apple M1"],
+    "storage_type": ["SSD", "HDD", "Hybrid"],
+    "gpu": ["Intel Integrated Graphics", "NVIDIA GeForce RTX 3050", "AMD Radeon Graphics", "Apple GPU"],
+    "condition": ["Excellent", "Good", "Average", "Poor"],
+    "seller_location": ["Mumbai", "Delhi", "Bangalore", "Chennai"],
+}
+SMARTPHONE_VOCAB = {
+    "brand": ["Apple", "Samsung", "Xiaomi", "Oneplus", "Realme", "Google"],
+    "model": ["iPhone 13", "Galaxy S21", "Redmi Note 10", "Nord 2", "Narzo 50", "Pixel 6"],
+    "processor": ["A15", "SD888", "Dimensity 700", "Helio G85"],
+    "display_type": ["AMOLED", "LCD", "OLED"],
+    "condition": list(SmartphonePricePredictor.condition_map),
+    "seller_type": list(SmartphonePricePredictor.seller_map),
+    "seller_location": ["Mumbai", "Delhi", "Bangalore", "Chennai"],
+    "accessories": ["", "Charger, Box", "Box", "Charger, Earphones, Bill"],
+}
+
+
+def laptop_input(rng):
+    """A random, serializer-shaped laptop prediction input."""
+    row = {key: rng.choice(values) for key, values in LAPTOP_VOCAB.items()}
+    row.update(
+        launch_year=rng.randint(2015, 2025),
+        launch_price=float(rng.randint(25000, 200000)),
+        ram=rng.choice([4, 8, 16, 32, 64]),
+        storage_size=rng.choice([128, 256, 512, 1024, 2048]),
+        screen_size=rng.choice([13.3, 14.0, 15.6, 16.0]),
+        battery_cycle_count=rng.randint(0, 1000),
+        warranty_remaining=rng.randint(0, 24),
+    )
+    return row
+
+
+def smartphone_input(rng):
+    """A random, serializer-shaped smartphone prediction input."""
+    row = {key: rng.choice(values) for key, values in SMARTPHONE_VOCAB.items()}
+    row.update(
+        launch_year=rng.randint(2016, 2025),
+        launch_price=float(rng.randint(8000, 150000)),
+        storage_gb=rng.choice([64, 128, 256, 512]),
+        ram_gb=rng.choice([3, 4, 6, 8, 12]),
+        battery_percentage=rng.randint(60, 100),
+        battery_health=rng.randint(60, 100),
+        camera_rear_mp=rng.choice([12, 48, 50, 108]),
+        camera_front_mp=rng.choice([8, 12, 16, 32]),
+        display_size_inch=rng.choice([6.1, 6.4, 6.7]),
+        supports_5g=rng.random() < 0.5,
+        warranty_months=rng.randint(0, 24),
+        screen_cracked=rng.random() < 0.1,
+        body_damage=rng.random() < 0.1,
+    )
+    return row
+
+
+INPUT_GENERATORS = {"laptop": laptop_input, "smartphone": smartphone_input}
+
+
+def _fit_encoders(feature_rows, columns):
+    from sklearn.preprocessing import LabelEncoder
+
+    return {
+        col: LabelEncoder().fit([str(row[col]) for row in feature_rows])
+        for col in columns
+    }
+
+
+def build_synthetic_models(models_dir, n_samples=2000, seed=0):
+    """Train small stand-in models into ``models_dir`` as bundles.
+
+    The feature rows come from the predictors' own feature engineering, so
+    the synthetic models exercise exactly the serving code paths.
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBRegressor
+
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory(prefix="bench-empty-") as empty_dir:
+        # Predictors without artifacts, used only for their feature engineering
+        laptop = LaptopPricePredictor(models_dir=empty_dir)
+        smartphone = SmartphonePricePredictor(models_dir=empty_dir, **PREDICTOR_OPTIONS["smartphone"])
+
+    # Laptop: RandomForest on label-encoded features
+    inputs = [laptop_input(rng) for _ in range(n_samples)]
+    features = [laptop._features(row) for row in inputs]
+    feature_names = list(features[0])
+    categorical = [col for col in feature_names if isinstance(features[0][col], str)]
+    encoders = _fit_encoders(features, categorical)
+    X = FeatureVectorizer(feature_names, encoders).transform(features)
+    y = np.array([row["launch_price"] * 0.85 ** (2025 - row["launch_year"]) for row in inputs])
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=100, max_depth=15, random_state=42, n_jobs=-1)
+    model.fit(scaler.transform(X), y)
+    save_bundle(
+        models_dir, "laptop", model, scaler, encoders, feature_names,
+        {"synthetic": True, "n_samples": n_samples, "n_features": len(feature_names)},
+    )
+
+    # Smartphone: XGBoost on the log price
+    inputs = [smartphone_input(rng) for _ in range(n_samples)]
+    categorical = ["brand", "processor", "display_type", "seller_type", "seller_location"]
+    encoders = _fit_encoders(inputs, categorical)
+    # Unscaled serving features from the shared columnar pipeline
+    feature_names = list(SMARTPHONE_FEATURES)
+    smartphone.vectorizer = FeatureVectorizer(feature_names, encoders, sanitize=True)
+    X = smartphone.preprocess_many(inputs)
+    y = np.log1p([row["launch_price"] * 0.8 ** (2025 - row["launch_year"]) for row in inputs])
+    scaler = StandardScaler().fit(X)
+    model = XGBRegressor(n_estimators=1000, learning_rate=0.03, max_depth=10, subsample=0.8,
+                         colsample_bytree=0.8, random_state=42, n_jobs=-1)
+    model.fit(scaler.transform(X), y)
+    stats = {"model_popularity": {}, "model_avg_resale": {}}
+    save_bundle(
+        models_dir, "smartphone", model, scaler, encoders, feature_names,
+        {"synthetic": True, "n_samples": n_samples, "n_features": len(feature_names)},
+        stats=stats,
+    )
+
+
+def _has_artifacts(models_dir, name):
+    if active_version(models_dir, name):
+        return True
+    return os.path.exists(os.path.join(models_dir, f"{name}_price_model.pkl"))
+
+
+def _reset_peak_rss():
+    """Restart the process's RSS high-water mark at its current RSS.
+
+    Only Linux can do this (writing 5 to ``clear_refs``); elsewhere the
+    peak keeps covering everything since the process started.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 4)
+
+
+def _median_call_ms(predict, X, repeats=MODEL_CALL_REPEATS):
+    predict(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return round(float(np.median(timings)) * 1000, 4)
+
+
+def bench_model_calls(predictor, rows, batch_sizes):
+    """Median model-call latency per batch size of the tree tables, the
+    estimator and the compiled backend as served (which picks one of the
+    two by batch size). None unless the predictor serves a CompiledBackend.
+    """
+    backend = predictor.backend
+    if not isinstance(backend, CompiledBackend):
+        return None
+    candidates = {"tables": backend.tables.predict, "reference": backend.reference.predict, "served": backend.predict}
+    timings = {}
+    for size in batch_sizes:
+        X = predictor.preprocess_many(rows[:size])
+        timings[str(size)] = {label: _median_call_ms(predict, X) for label, predict in candidates.items()}
+    return timings
+
+
+def bench_predictor(name, models_dir, backend, iterations, batch_sizes, seed):
+    """Benchmark one predictor with one inference backend."""
+    factory = PREDICTORS[name]
+    rng = random.Random(seed)
+    generate = INPUT_GENERATORS[name]
+    # The high-water mark restarts here, so the peak covers this predictor only
+    _reset_peak_rss()
+    baseline_rss_mb = _peak_rss_mb()
+
+    start = time.perf_counter()
+    predictor = factory(models_dir=models_dir, **PREDICTOR_OPTIONS.get(name, {}))
+    cold_load_ms = (time.perf_counter() - start) * 1000
+    if not predictor.is_loaded:
+        raise RuntimeError(f"{name} model could not be loaded from {models_dir}")
+    predictor.backend = build_backend(
+        predictor.model if predictor.bundle is None else None, len(predictor.feature_names),
+        preferred=backend, bundle=predictor.bundle, label=name,
+    )
+    # Measure the model path (input normalization included), not the memo cache
+    predictor.cache.max_entries = 0
+
+    rows = [generate(rng) for _ in range(max(iterations, max(batch_sizes)))]
+    for row in rows[:20]:
+        predictor.predict_many([row])
+
+    timings = []
+    for row in rows[:iterations]:
+        start = time.perf_counter()
+        predictor.predict_many([row])
+        timings.append(time.perf_counter() - start)
+
+    throughput = {}
+    for size in batch_sizes:
+        batch = rows[:size]
+        repeats = max(3, 2000 // size)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            predictor.predict_many(batch)
+        elapsed = time.perf_counter() - start
+        throughput[str(size)] = round(size * repeats / elapsed, 1)
+
+    # Python-level allocations of a single-row call (NumPy buffers included)
+    tracemalloc.start()
+    predictor.predict_many([rows[0]])
+    tracemalloc.reset_peak()
+    baseline_size = tracemalloc.get_traced_memory()[0]
+    calls = 50
+    for row in rows[:calls]:
+        predictor.predict_many([row])
+    current_size, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Before bench_model_calls, which loads the estimator even where
+    # serving never needs it
+    peak_rss_mb = _peak_rss_mb()
+    model_call_ms = bench_model_calls(predictor, rows, batch_sizes)
+
+    return {
+        "backend": predictor.backend.name,
+        "artifact_version": predictor.artifact_version(),
+        "cold_load_ms": round(cold_load_ms, 2),
+        "single_p50_ms": _percentile_ms(timings, 50),
+        "single_p99_ms": _percentile_ms(timings, 99),
+        "single_mean_ms": round(float(np.mean(timings)) * 1000, 4),
+        "batch_rows_per_second": throughput,
+        "compiled_max_rows": getattr(predictor.backend, "max_rows", None),
+        "model_call_ms": model_call_ms,
+        "alloc_peak_kb_per_call": round((peak_size - baseline_size) / 1024, 2),
+        "retained_bytes_per_call": round((current_size - baseline_size) / calls, 1),
+        "baseline_rss_mb": baseline_rss_mb,
+        "peak_rss_mb": peak_rss_mb,
+        "rss_delta_mb": round(peak_rss_mb - baseline_rss_mb, 1),
+    }
+
+
+def _bench_case(args):
+    # Runs in a fresh process; keep the predictors' load messages out of
+    # the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return bench_predictor(*args)
+
+
+def run_case(name, models_dir, backend, iterations, batch_sizes, seed):
+    """Benchmark one predictor/backend case in a freshly spawned process,
+    so no other case's models or caches share its memory."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_bench_case, ((name, models_dir, backend, iterations, batch_sizes, seed),))
+
+
+def run_benchmarks(models_dir=None, synthetic=False, backends=BACKEND_CHOICES, iterations=500,
+                   batch_sizes=DEFAULT_BATCH_SIZES, seed=0):
+    """Run every benchmark and return the JSON-serializable results."""
+    models_dir = models_dir or os.path.join(os.path.dirname(__file__), "ml_models")
+    tmp_dir = None
+    if synthetic or not all(_has_artifacts(models_dir, name) for name in PREDICTORS):
+        tmp_dir = tempfile.TemporaryDirectory(prefix="bench-models-")
+        models_dir = tmp_dir.name
+        synthetic = True
+        with contextlib.redirect_stdout(sys.stderr):
+            build_synthetic_models(models_dir, seed=seed)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "synthetic_models": synthetic,
+        "iterations": iterations,
+        "predictors": {},
+    }
+    try:
+        for name in PREDICTORS:
+            results["predictors"][name] = {}
+            for backend in backends:
+                results["predictors"][name][backend] = run_case(
+                    name, models_dir, backend, iterations, batch_sizes, seed,
+                )
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    return results
+
+
+def find_regressions(results, baseline, max_regression):
+    """List latency metrics that got slower than ``baseline`` by more than ``max_regression``."""
+    regressions = []
+    for name, backends in results["predictors"].items():
+        for backend, metrics in backends.items():
+            previous = baseline.get("predictors", {}).get(name, {}).get(backend)
+            if not previous:
+                continue
+            for metric in LATENCY_METRICS:
+                old, new = previous.get(metric), metrics.get(metric)
+                if old and new and new > old * (1 + max_regression):
+                    regressions.append(
+                        f"{name}/{backend} {metric}: {old:.3f}ms -> {new:.3f}ms (+{(new / old - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def find_slow_batch_sizes(results, tolerance, min_diff_ms=CUTOFF_MIN_DIFF_MS):
+    """List batch sizes where the served backend is slower than the faster
+    of tables and estimator by more than ``tolerance`` and ``min_diff_ms``
+    (a misplaced ML_COMPILED_MAX_ROWS cutoff). Timings are medians of
+    MODEL_CALL_REPEATS calls."""
+    slow = []
+    for name, backends in results["predictors"].items():
+        for backend, metrics in backends.items():
+            for size, calls in (metrics.get("model_call_ms") or {}).items():
+                best = min(calls["tables"], calls["reference"])
+                if calls["served"] > best * (1 + tolerance) and calls["served"] - best > min_diff_ms:
+                    slow.append(
+                        f"{name}/{backend} {size} rows: served {calls['served']:.3f}ms, "
+                        f"tables {calls['tables']:.3f}ms, reference {calls['reference']:.3f}ms "
+                        f"(max_rows={metrics.get('compiled_max_rows')})"
+                    )
+    return slow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the price prediction hot paths")
+    parser.add_argument("--models-dir", default=None, help="Artifact directory (default: ml_models/)")
+    parser.add_argument("--synthetic", action="store_true", help="Always use synthetic models")
+    parser.add_argument("--backend", choices=BACKEND_CHOICES, action="append",
+                        help="Inference backend(s) to measure (default: all)")
+    parser.add_argument("--iterations", type=int, default=500, help="Single-row predictions to time")
+    parser.add_argument("--batch-sizes", default=",".join(map(str, DEFAULT_BATCH_SIZES)))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="Previous results to compare latency against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Allowed latency increase over the baseline (0.25 = 25%%)")
+    parser.add_argument("--check-cutoff", action="store_true",
+                        help="Fail when the compiled backend serves a batch size the estimator is faster for")
+    parser.add_argument("--cutoff-tolerance", type=float, default=0.25,
+                        help="Allowed slowdown of the served backend over the faster of tables/estimator")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        models_dir=args.models_dir,
+        synthetic=args.synthetic,
+        backends=args.backend or BACKEND_CHOICES,
+        iterations=args.iterations,
+        batch_sizes=[int(size) for size in args.batch_sizes.split(",") if size],
+        seed=args.seed,
+    )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"[INFO] Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    status = 0
+    slow = find_slow_batch_sizes(results, args.cutoff_tolerance) if args.check_cutoff else []
+    if slow:
+        print("[FAIL] Compiled backend serves batches its estimator is faster for:", file=sys.stderr)
+        for line in slow:
+            print(f"  {line}", file=sys.stderr)
+        status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.max_regression)
+        if regressions:
+            print("[FAIL] Latency regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print("[OK] No latency regressions", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,539 @@
+"""
+Comparables Index
+Nearest past predictions and active listings for a priced device
+
+Each device type has an in-memory index of normalized spec vectors, one
+BallTree per brand. New rows go to a small per-brand delta that is scanned
+directly and merged into a rebuilt tree once it grows; listings that stop
+being active are masked out. The index catches up with the database in a
+background thread (prediction ids and listing ``updated_at`` watermarks),
+so queries never wait on the database or a rebuild, and it is persisted to
+disk so a restart only replays rows added since the last save.
+
+Each save writes a new version directory under the index path and then
+atomically repoints the ``CURRENT`` file at it, so a concurrent load reads
+either the old or the new index, and concurrent saves never write into the
+same directory. Saves on one host are serialized with a lock file, so one
+saver can't prune a version another is still writing.
+"""
+
+import contextlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized between processes
+    fcntl = None
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from .feature_engineering import CONDITION_MAP, DEFAULT_CONDITION_SCORE
+from .ml_config import ml_setting
+from .models import LaptopPrediction, Listing, SmartphonePrediction
+
+
+DEFAULT_COUNT = 5
+DEFAULT_SYNC_SECONDS = 10.0
+DEFAULT_SAVE_SECONDS = 300.0
+DEFAULT_MERGE_ROWS = 1024
+SYNC_CHUNK_ROWS = 2000
+INDEX_FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+# Saved versions kept on disk; older ones may still be open in another process
+KEEP_VERSIONS = 3
+
+PREDICTION, LISTING = 0, 1
+KIND_NAMES = {PREDICTION: "prediction", LISTING: "listing"}
+
+LAPTOP_CONDITION_SCORES = {"Excellent": 4, "Good": 3, "Average": 2, "Poor": 1}
+
+
+def _log2(value):
+    return math.log2(max(float(value or 0), 1.0))
+
+
+def _log_price(value):
+    return math.log(max(float(value or 0), 1.0))
+
+
+# Each spec is scaled so that one unit is a comparable difference
+# (about a year, a third more launch price, a doubling of RAM/storage...)
+def laptop_vector(row):
+    return [
+        float(row["launch_year"] or 0) / 1.0,
+        _log_price(row["launch_price"]) / 0.3,
+        _log2(row["ram"]),
+        _log2(row["storage_size"]),
+        float(row["screen_size"] or 0) / 1.5,
+        LAPTOP_CONDITION_SCORES.get(row["condition"], 2) / 1.0,
+    ]
+
+
+def smartphone_vector(row):
+    return [
+        float(row["launch_year"] or 0) / 1.0,
+        _log_price(row["launch_price"]) / 0.3,
+        _log2(row["ram"]),
+        _log2(row["storage"]),
+        CONDITION_MAP.get(row["condition"], DEFAULT_CONDITION_SCORE) / 2.0,
+        float(row["battery_health"] or 0) / 10.0,
+        float(bool(row["supports_5g"])),
+        2.0 * float(bool(row["screen_cracked"])),
+        float(bool(row["body_damage"])),
+    ]
+
+
+SOURCES = {
+    "laptop": {
+        "prediction_model": LaptopPrediction,
+        "listing_relation": "laptop_prediction",
+        "fields": (
+            "brand", "model", "launch_year", "launch_price", "ram", "storage_size",
+            "screen_size", "condition",
+        ),
+        "vector": laptop_vector,
+    },
+    "smartphone": {
+        "prediction_model": SmartphonePrediction,
+        "listing_relation": "smartphone_prediction",
+        "fields": (
+            "brand", "model", "launch_year", "launch_price", "ram", "storage", "condition",
+            "battery_health", "supports_5g", "screen_cracked", "body_damage",
+        ),
+        "vector": smartphone_vector,
+    },
+}
+
+
+class _Partition:
+    """Vectors of one brand: a BallTree over ``base`` rows plus a scanned delta.
+
+    Partitions are never modified in place; ``with_changes`` returns a new
+    one, so concurrent queries always see a consistent snapshot.
+    """
+
+    def __init__(self, base_vectors, base_entries, delta_vectors=None, delta_entries=None, alive=None, tree=None):
+        self.base_vectors = base_vectors
+        self.base_entries = base_entries
+        self.tree = tree if tree is not None else (BallTree(base_vectors) if len(base_entries) else None)
+        self.delta_vectors = delta_vectors if delta_vectors is not None else np.empty((0, base_vectors.shape[1]))
+        self.delta_entries = delta_entries or []
+        self.alive = alive if alive is not None else np.ones(len(base_entries) + len(self.delta_entries), dtype=bool)
+
+    @classmethod
+    def build(cls, vectors, entries):
+        return cls(np.asarray(vectors, dtype=np.float64).reshape(len(entries), -1), list(entries))
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    @property
+    def entries(self):
+        return self.base_entries + self.delta_entries
+
+    def with_changes(self, added_vectors, added_entries, removed_positions, merge_rows):
+        alive = np.concatenate([self.alive, np.ones(len(added_entries), dtype=bool)])
+        alive[list(removed_positions)] = False
+        added_vectors = np.asarray(added_vectors, dtype=np.float64).reshape(len(added_entries), self.base_vectors.shape[1])
+        delta_vectors = np.vstack([self.delta_vectors, added_vectors])
+        delta_entries = self.delta_entries + list(added_entries)
+
+        dead = len(alive) - int(alive.sum())
+        if len(delta_entries) > max(merge_rows, len(self.base_entries) // 10) or dead > max(merge_rows, len(alive) // 5):
+            # Rebuild the tree over every live row
+            vectors = np.vstack([self.base_vectors, delta_vectors])[alive]
+            entries = [entry for entry, keep in zip(self.base_entries + delta_entries, alive) if keep]
+            return _Partition(vectors, entries)
+        return _Partition(
+            self.base_vectors, self.base_entries, delta_vectors, delta_entries, alive, tree=self.tree,
+        )
+
+    def query(self, vector, k):
+        """Return up to ``k`` ``(distance, entry)`` pairs, nearest first."""
+        found = []
+        n_base = len(self.base_entries)
+        if self.tree is not None:
+            # Ask for enough extra neighbours to skip the masked-out rows
+            dead = n_base - int(self.alive[:n_base].sum())
+            distances, positions = self.tree.query(vector.reshape(1, -1), k=min(n_base, k + dead))
+            found.extend(
+                (float(distance), self.base_entries[pos])
+                for distance, pos in zip(distances[0], positions[0])
+                if self.alive[pos]
+            )
+        if self.delta_entries:
+            distances = np.sqrt(((self.delta_vectors - vector) ** 2).sum(axis=1))
+            distances[~self.alive[n_base:]] = np.inf
+            for pos in np.argsort(distances)[:k]:
+                if np.isfinite(distances[pos]):
+                    found.append((float(distances[pos]), self.delta_entries[pos]))
+        found.sort(key=lambda item: item[0])
+        return found[:k]
+
+
+class ComparablesIndex:
+    """Nearest-neighbour index over the predictions and listings of one device type."""
+
+    def __init__(self, device_type, path=None, merge_rows=None):
+        config = ml_setting("COMPARABLES", {})
+        self.device_type = device_type
+        self.source = SOURCES[device_type]
+        self.path = path or os.path.join(
+            config.get("DIR") or os.path.join(os.path.dirname(__file__), "ml_models", "comparables"),
+            device_type,
+        )
+        self.merge_rows = merge_rows or config.get("MERGE_ROWS", DEFAULT_MERGE_ROWS)
+        self.partitions = {}
+        # (kind, id) -> (brand, position)
+        self.positions = {}
+        self.prediction_watermark = 0
+        self.listing_watermark = None
+        self.ready = False
+
+    # ------------------------------------------------------------------
+    # Building and updating
+    # ------------------------------------------------------------------
+    def _entry(self, kind, pk, row, price, created_at):
+        return {
+            "kind": kind,
+            "id": pk,
+            "brand": row["brand"],
+            "model": row["model"],
+            "price": float(price),
+            "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else created_at,
+        }
+
+    def apply(self, added, removed=()):
+        """Add ``(vector, entry)`` pairs and drop ``(kind, id)`` keys.
+
+        Re-adding an existing key replaces it (a listing whose price moved).
+        """
+        added_by_brand = {}
+        removed_by_brand = {}
+        for key in list(removed) + [(entry["kind"], entry["id"]) for _, entry in added]:
+            located = self.positions.pop(key, None)
+            if located is not None:
+                removed_by_brand.setdefault(located[0], set()).add(located[1])
+        for vector, entry in added:
+            added_by_brand.setdefault(self._brand_key(entry["brand"]), []).append((vector, entry))
+
+        for brand in set(added_by_brand) | set(removed_by_brand):
+            rows = added_by_brand.get(brand, [])
+            previous = self.partitions.get(brand)
+            if previous is None:
+                partition = _Partition.build([vector for vector, _ in rows], [entry for _, entry in rows])
+            else:
+                partition = previous.with_changes(
+                    [vector for vector, _ in rows], [entry for _, entry in rows],
+                    removed_by_brand.get(brand, ()), self.merge_rows,
+                )
+            if previous is not None and partition.base_entries is previous.base_entries:
+                # Not rebuilt: existing rows kept their positions
+                start = len(partition.alive) - len(rows)
+                changed = enumerate(partition.delta_entries[len(partition.delta_entries) - len(rows):], start)
+            else:
+                changed = enumerate(partition.entries)
+            for pos, entry in changed:
+                if partition.alive[pos]:
+                    self.positions[(entry["kind"], entry["id"])] = (brand, pos)
+            self.partitions[brand] = partition
+
+    @staticmethod
+    def _brand_key(brand):
+        return (brand or "").strip().lower()
+
+    def _prediction_rows(self, queryset):
+        fields = self.source["fields"]
+        values = queryset.values("pk", "predicted_price", "created_at", *fields).order_by("pk")
+        for row in values.iterator(chunk_size=SYNC_CHUNK_ROWS):
+            yield row["pk"], row
+
+    def _listing_rows(self, queryset):
+        relation = self.source["listing_relation"]
+        fields = self.source["fields"]
+        values = queryset.values(
+            "pk", "status", "expected_price", "created_at", "updated_at",
+            *[f"{relation}__{field}" for field in fields],
+        ).order_by("updated_at", "pk")
+        for row in values.iterator(chunk_size=SYNC_CHUNK_ROWS):
+            yield row, {field: row[f"{relation}__{field}"] for field in fields}
+
+    def sync(self):
+        """Apply database rows added or changed since the watermarks; returns the row count."""
+        vector = self.source["vector"]
+        added, removed, changed = [], [], 0
+
+        predictions = self.source["prediction_model"].objects.filter(pk__gt=self.prediction_watermark)
+        for pk, row in self._prediction_rows(predictions):
+            added.append((vector(row), self._entry(PREDICTION, pk, row, row["predicted_price"], row["created_at"])))
+            self.prediction_watermark = max(self.prediction_watermark, pk)
+            changed += 1
+
+        listings = Listing.objects.filter(
+            device_type=self.device_type, **{f"{self.source['listing_relation']}__isnull": False}
+        )
+        if self.listing_watermark is not None:
+            # Inclusive: rows sharing the watermark timestamp may have been missed; upserts are idempotent
+            listings = listings.filter(updated_at__gte=self.listing_watermark)
+        for listing, row in self._listing_rows(listings):
+            if listing["status"] == "active":
+                added.append((vector(row), self._entry(
+                    LISTING, listing["pk"], row, listing["expected_price"], listing["created_at"],
+                )))
+            else:
+                removed.append((LISTING, listing["pk"]))
+            self.listing_watermark = listing["updated_at"]
+            changed += 1
+
+        if added or removed:
+            self.apply(added, removed)
+        self.ready = True
+        return changed
+
+    def rebuild(self):
+        self.partitions = {}
+        self.positions = {}
+        self.prediction_watermark = 0
+        self.listing_watermark = None
+        return self.sync()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def query(self, row, k=DEFAULT_COUNT, exclude=()):
+        """Return the ``k`` nearest comparables of ``row`` (a dict of prediction fields).
+
+        Candidates of the same brand come first; other brands only fill
+        the remaining places.
+        """
+        vector = np.asarray(self.source["vector"](row), dtype=np.float64)
+        exclude = set(exclude)
+        brand = self._brand_key(row.get("brand"))
+        partitions = dict(self.partitions)
+
+        def search(partition, limit):
+            return [
+                (distance, entry) for distance, entry in partition.query(vector, limit + len(exclude))
+                if (entry["kind"], entry["id"]) not in exclude
+            ][:limit]
+
+        found = search(partitions[brand], k) if brand in partitions else []
+        if len(found) < k:
+            others = []
+            for other, partition in partitions.items():
+                if other != brand:
+                    others.extend(search(partition, k - len(found)))
+            others.sort(key=lambda item: item[0])
+            found.extend(others[:k - len(found)])
+        return [
+            {**entry, "kind": KIND_NAMES[entry["kind"]], "distance": round(distance, 4)}
+            for distance, entry in found
+        ]
+
+    def __len__(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self):
+        """Write every live row and the watermarks as a new version under
+        ``path`` and make it the current one; returns the version name."""
+        vectors, entries = [], []
+        for partition in self.partitions.values():
+            all_vectors = np.vstack([partition.base_vectors, partition.delta_vectors])
+            vectors.append(all_vectors[partition.alive])
+            entries.extend(entry for entry, keep in zip(partition.entries, partition.alive) if keep)
+
+        os.makedirs(self.path, exist_ok=True)
+        with self._save_lock():
+            return self._save_version(vectors, entries)
+
+    @contextlib.contextmanager
+    def _save_lock(self):
+        with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                # Per open file, so it also serializes threads of one process
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _save_version(self, vectors, entries):
+        # Unique suffix, so savers never share a directory
+        version_path = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-", time.gmtime()), dir=self.path)
+        version = os.path.basename(version_path)
+        np.save(os.path.join(version_path, "vectors.npy"), np.vstack(vectors) if vectors else np.empty((0, 0)))
+        with open(os.path.join(version_path, "entries.json"), "w") as f:
+            json.dump(entries, f)
+        with open(os.path.join(version_path, "manifest.json"), "w") as f:
+            json.dump({
+                "format": INDEX_FORMAT_VERSION,
+                "device_type": self.device_type,
+                "rows": len(entries),
+                "prediction_watermark": self.prediction_watermark,
+                "listing_watermark": self.listing_watermark.isoformat() if self.listing_watermark else None,
+                "saved_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }, f, indent=2)
+
+        tmp_path = os.path.join(self.path, f".{CURRENT_FILE}.{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.path, CURRENT_FILE))
+        self._prune(version)
+        return version
+
+    def _prune(self, saved):
+        """Delete all but the newest KEEP_VERSIONS saved versions, never the one
+        CURRENT points at or ``saved``."""
+        keep = {saved, self.current_version()}
+        versions = []
+        for entry in os.scandir(self.path):
+            if entry.is_dir() and not entry.name.startswith("."):
+                versions.append((entry.stat().st_mtime, entry.path))
+        versions.sort()
+        for _, path in versions[:-KEEP_VERSIONS]:
+            if os.path.basename(path) not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def current_version(self):
+        """Name of the saved version CURRENT points at, or None."""
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """Load the current saved index; returns False when there is none (or it is unusable)."""
+        from django.utils.dateparse import parse_datetime
+
+        # A save in another process may prune the version between reading
+        # CURRENT and opening its files; the pointer then names a newer one
+        for _ in range(2):
+            version = self.current_version()
+            if version is None:
+                return False
+            version_path = os.path.join(self.path, version)
+            try:
+                with open(os.path.join(version_path, "manifest.json")) as f:
+                    manifest = json.load(f)
+                if manifest.get("format") != INDEX_FORMAT_VERSION:
+                    return False
+                vectors = np.load(os.path.join(version_path, "vectors.npy"))
+                with open(os.path.join(version_path, "entries.json")) as f:
+                    entries = json.load(f)
+                break
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as exc:
+                print(f"⚠️  Warning: Ignoring unreadable {self.device_type} comparables index: {exc}")
+                return False
+        else:
+            return False
+
+        self.partitions, self.positions = {}, {}
+        self.apply(list(zip(vectors, entries)))
+        self.prediction_watermark = manifest["prediction_watermark"]
+        watermark = manifest.get("listing_watermark")
+        self.listing_watermark = parse_datetime(watermark) if watermark else None
+        self.ready = True
+        return True
+
+
+class ComparablesService:
+    """Process-wide comparables indexes, kept fresh in the background.
+
+    ``find`` answers from whatever the index holds right now; at most every
+    ``SYNC_SECONDS`` it starts a background catch-up (loading the saved
+    index first, on first use). Until that first load finishes it returns
+    no comparables rather than blocking the request.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._syncing = set()
+        self._synced_at = {}
+        self._saved_at = {}
+
+    def index(self, device_type):
+        index = self._indexes.get(device_type)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(device_type)
+                if index is None:
+                    index = self._indexes[device_type] = ComparablesIndex(device_type)
+        return index
+
+    def _maybe_sync(self, device_type):
+        config = ml_setting("COMPARABLES", {})
+        interval = config.get("SYNC_SECONDS", DEFAULT_SYNC_SECONDS)
+        now = time.monotonic()
+        with self._lock:
+            if device_type in self._syncing:
+                return
+            if device_type in self._synced_at and now - self._synced_at[device_type] < interval:
+                return
+            self._syncing.add(device_type)
+            self._synced_at[device_type] = now
+        threading.Thread(
+            target=self._sync, args=(device_type,), name=f"comparables-{device_type}", daemon=True,
+        ).start()
+
+    def _sync(self, device_type):
+        from django.db import connection
+
+        index = self.index(device_type)
+        try:
+            if not index.ready and index.load():
+                print(f"✅ Loaded {device_type} comparables index ({len(index):,} rows)")
+            changed = index.sync()
+            save_every = ml_setting("COMPARABLES", {}).get("SAVE_SECONDS", DEFAULT_SAVE_SECONDS)
+            now = time.monotonic()
+            if changed and now - self._saved_at.get(device_type, 0.0) >= save_every:
+                index.save()
+                self._saved_at[device_type] = now
+        except Exception as exc:
+            print(f"⚠️  Warning: {device_type} comparables sync failed: {exc}")
+        finally:
+            # The thread's own database connection
+            connection.close()
+            with self._lock:
+                self._syncing.discard(device_type)
+
+    def find(self, device_type, row, k=None, exclude=()):
+        """Nearest comparables of ``row`` (prediction model fields), or [] while loading."""
+        config = ml_setting("COMPARABLES", {})
+        if not config.get("ENABLED", True):
+            return []
+        self._maybe_sync(device_type)
+        index = self.index(device_type)
+        if not index.ready:
+            return []
+        return index.query(row, k or config.get("COUNT", DEFAULT_COUNT), exclude)
+
+    def stats(self):
+        return {
+            device_type: {"rows": len(index), "brands": len(index.partitions), "ready": index.ready}
+            for device_type, index in self._indexes.items()
+        }
+
+
+comparables = ComparablesService()
+
+
+def prediction_row(prediction):
+    """Index fields of a saved LaptopPrediction/SmartphonePrediction."""
+    device_type = "laptop" if isinstance(prediction, LaptopPrediction) else "smartphone"
+    return {field: getattr(prediction, field) for field in SOURCES[device_type]["fields"]}
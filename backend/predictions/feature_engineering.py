@@ -0,0 +1,172 @@
+"""
+Feature Engineering
+Columnar smartphone feature pipeline shared by the trainer and the predictor
+
+Every step works on whole columns (pandas Series for training frames,
+NumPy arrays for serving batches), so pricing one phone is a one-row batch
+and training scales with vectorized operations instead of per-row helpers.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+CONDITION_MAP = {
+    'Like New': 10, 'Good': 8, 'Fair': 6, 'Average': 5,
+    'Used': 5, 'Refurbished': 7, 'Screen Damage': 2, 'No Box': 6
+}
+PREMIUM_BRANDS = {'Apple', 'Samsung', 'Google', 'Oneplus', 'Nothing'}
+SELLER_MAP = {'Store': 3, 'Refurbisher': 2, 'Individual': 1}
+DEFAULT_CONDITION_SCORE = 5
+DEFAULT_SELLER_RELIABILITY = 2
+
+# Label-encoded columns (each becomes ``<col>_encoded``)
+CATEGORICAL_TO_ENCODE = ['brand', 'processor', 'display_type', 'seller_type', 'seller_location']
+
+# Model input columns, in training order
+SMARTPHONE_FEATURES = [
+    'storage_GB', 'RAM_GB', 'Battery %', 'battery_health',
+    'camera_rear_mp', 'camera_front_mp', 'display_size_inch',
+    'supports_5g', 'launch_year', 'screen_cracked', 'body_damage', 'warranty',
+    'price_numeric', 'log_price', 'device_age_years', 'depreciation_rate',
+    'expected_value', 'total_memory_score', 'memory_ratio', 'is_high_memory',
+    'total_camera', 'camera_quality', 'is_good_camera', 'battery_avg',
+    'battery_score', 'condition_score', 'damage_penalty', 'device_quality',
+    'is_premium_brand', 'is_modern', 'year_squared', 'is_large_display',
+    '5g_premium', 'accessories_value', 'seller_reliability',
+    'model_popularity', 'model_avg_resale', 'price_age_interaction',
+    'price_condition_interaction', 'brand_encoded', 'processor_encoded',
+    'display_type_encoded', 'seller_type_encoded', 'seller_location_encoded'
+]
+
+
+def _is_categorical(values):
+    return isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype)
+
+
+def _by_category(values, column_fn):
+    """Apply ``column_fn`` once per category and broadcast the results by code."""
+    categories = pd.Series(list(values.cat.categories) + [np.nan], dtype=object)
+    per_category = np.asarray(column_fn(categories), dtype=np.float64)
+    # Code -1 (missing) picks the trailing NaN entry
+    return pd.Series(per_category[values.cat.codes.to_numpy()], index=values.index)
+
+
+def _lookup(values, mapping, default):
+    if _is_categorical(values):
+        return _by_category(values, lambda column: _lookup(column, mapping, default))
+    if isinstance(values, pd.Series):
+        return values.map(mapping).fillna(default)
+    return np.fromiter((mapping.get(value, default) for value in values), dtype=np.float64, count=len(values))
+
+
+def convert_warranty(values):
+    """Warranty as months: numbers as-is, 'Under Warranty'/'yes' as 12, anything else 0."""
+    if _is_categorical(values):
+        return _by_category(values, convert_warranty)
+    series = pd.Series(values, copy=False)
+    months = pd.to_numeric(series, errors='coerce').fillna(0).astype(float)
+    text = series.astype(str).str.strip().str.lower()
+    under_warranty = text.str.contains('under warranty', regex=False) | text.str.contains('yes', regex=False)
+    months[under_warranty & series.notna()] = 12
+    return months
+
+
+def score_accessories(values):
+    """Points for the accessories bundled with the phone (charger, earphones, box, bill)."""
+    if _is_categorical(values):
+        return _by_category(values, score_accessories)
+    if isinstance(values, pd.Series):
+        values = values.fillna('')
+    text = np.char.lower(np.asarray(values, dtype=str))
+
+    def has(word):
+        return np.char.find(text, word) >= 0
+
+    return (
+        has('charger') * 2
+        + (has('earphone') | has('headphone')) * 2
+        + has('box') * 2
+        + has('bill') * 1
+    )
+
+
+def engineer_features(frame):
+    """Add the engineered smartphone features to ``frame`` in place.
+
+    ``frame`` is a DataFrame or a dict of equal-length arrays using the
+    dataset column names (storage_GB, RAM_GB, Battery %, price_numeric,
+    condition, ...). The caller supplies ``device_age_years``,
+    ``model_popularity`` and ``model_avg_resale``, which training and
+    serving derive differently. Features whose inputs are absent are
+    skipped. Returns ``frame``.
+    """
+    age = frame['device_age_years']
+
+    if 'price_numeric' in frame:
+        price = frame['price_numeric']
+        frame['log_price'] = np.log1p(price)
+        frame['depreciation_rate'] = price / (age + 1)
+        frame['expected_value'] = price * (0.85 ** age)
+
+    if 'storage_GB' in frame and 'RAM_GB' in frame:
+        storage, ram = frame['storage_GB'], frame['RAM_GB']
+        frame['total_memory_score'] = storage + (ram * 8)
+        frame['memory_ratio'] = storage / (ram + 1)
+        frame['is_high_memory'] = ((storage >= 128) & (ram >= 6)).astype(int)
+
+    if 'camera_rear_mp' in frame and 'camera_front_mp' in frame:
+        rear, front = frame['camera_rear_mp'], frame['camera_front_mp']
+        frame['total_camera'] = rear + front
+        frame['camera_quality'] = rear / (front + 1)
+        frame['is_good_camera'] = (rear >= 48).astype(int)
+
+    if 'Battery %' in frame and 'battery_health' in frame:
+        frame['battery_avg'] = (frame['Battery %'] + frame['battery_health']) / 2
+        frame['battery_score'] = frame['battery_avg'] * np.exp(-0.05 * age)
+
+    if 'condition' in frame:
+        frame['condition_score'] = _lookup(frame['condition'], CONDITION_MAP, DEFAULT_CONDITION_SCORE)
+
+    damage_penalty = 0
+    if 'screen_cracked' in frame:
+        damage_penalty = damage_penalty + frame['screen_cracked'] * 5
+    if 'body_damage' in frame:
+        damage_penalty = damage_penalty + frame['body_damage'] * 2
+    frame['damage_penalty'] = damage_penalty
+
+    frame['device_quality'] = (
+        frame.get('condition_score', 5) * 3 +
+        frame.get('battery_score', 80) / 10 +
+        frame.get('warranty', 0) / 2 -
+        frame['damage_penalty']
+    )
+
+    if 'brand' in frame:
+        brand = frame['brand']
+        if _is_categorical(brand):
+            frame['is_premium_brand'] = _by_category(brand, lambda column: column.isin(PREMIUM_BRANDS)).astype(int)
+        else:
+            frame['is_premium_brand'] = np.isin(np.asarray(brand, dtype=object), list(PREMIUM_BRANDS)).astype(int)
+
+    if 'launch_year' in frame:
+        frame['is_modern'] = (frame['launch_year'] >= 2020).astype(int)
+        frame['year_squared'] = frame['launch_year'] ** 2
+
+    if 'display_size_inch' in frame:
+        frame['is_large_display'] = (frame['display_size_inch'] >= 6.5).astype(int)
+
+    if 'supports_5g' in frame:
+        frame['5g_premium'] = frame['supports_5g'] * frame.get('is_modern', 1)
+
+    if 'accessories' in frame:
+        frame['accessories_value'] = score_accessories(frame['accessories'])
+
+    if 'seller_type' in frame:
+        frame['seller_reliability'] = _lookup(frame['seller_type'], SELLER_MAP, DEFAULT_SELLER_RELIABILITY)
+
+    if 'price_numeric' in frame:
+        frame['price_age_interaction'] = frame['price_numeric'] * np.exp(-0.1 * age)
+        frame['price_condition_interaction'] = frame['price_numeric'] * (frame.get('condition_score', 5) / 10)
+
+    return frame
@@ -0,0 +1,115 @@
+"""
+Feature Vectorizer
+Compiles trained preprocessing artifacts into plain NumPy lookups
+"""
+
+import threading
+
+import numpy as np
+
+
+class FeatureVectorizer:
+    """Encodes engineered feature dicts into model-ready float rows.
+
+    Built once at model load from the trained feature order, label encoders
+    and scaler, so encoding one input is a few dict lookups and a write into
+    a preallocated array instead of building a pandas DataFrame.
+
+    Values follow the same rules as the original pandas preprocessing:
+    numbers are used as-is, strings are mapped through the column's label
+    encoder (``-1`` for unseen categories, ``0`` for columns without an
+    encoder) and features missing from the input are ``0``.
+    """
+
+    def __init__(self, feature_names, label_encoders=None, scaler=None, sanitize=False, mean=None, scale=None):
+        self.feature_names = list(feature_names)
+        self.column_index = {name: idx for idx, name in enumerate(self.feature_names)}
+        self.category_codes = {
+            col: {label: code for code, label in enumerate(encoder.classes_)}
+            for col, encoder in (label_encoders or {}).items()
+        }
+        # Replace inf/NaN with 0 before scaling (smartphone pipeline)
+        self.sanitize = sanitize
+
+        n_features = len(self.feature_names)
+        self.mean = np.zeros(n_features)
+        self.scale = np.ones(n_features)
+        if scaler is not None:
+            if getattr(scaler, "with_mean", True) and scaler.mean_ is not None:
+                self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if getattr(scaler, "with_std", True) and scaler.scale_ is not None:
+                self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        # Precomputed (e.g. memory-mapped) scaler vectors take precedence
+        if mean is not None:
+            self.mean = mean
+        if scale is not None:
+            self.scale = scale
+
+        self._local = threading.local()
+
+    def encode_category(self, col, value):
+        """Return the label-encoder code for ``value`` in ``col``."""
+        codes = self.category_codes.get(col)
+        if codes is None:
+            return 0
+        return codes.get(value, -1)
+
+    def encode_column(self, col, values):
+        """Label-encoder codes for a whole column of values."""
+        codes = self.category_codes.get(col)
+        if codes is None:
+            return np.zeros(len(values))
+        return np.fromiter((codes.get(value, -1) for value in values), dtype=np.float64, count=len(values))
+
+    def _coerce(self, col, value):
+        # bool, int, float and NumPy scalars were numeric columns in pandas;
+        # anything else (str, Decimal, None) was an object column.
+        if isinstance(value, (int, float, np.number, np.bool_)):
+            return value
+        return self.encode_category(col, value)
+
+    def _fill(self, out, features):
+        out.fill(0.0)
+        for name, value in features.items():
+            idx = self.column_index.get(name)
+            if idx is not None:
+                out[idx] = self._coerce(name, value)
+
+    def _finish(self, matrix):
+        if self.sanitize:
+            matrix[~np.isfinite(matrix)] = 0.0
+        np.subtract(matrix, self.mean, out=matrix)
+        np.divide(matrix, self.scale, out=matrix)
+        return matrix
+
+    def transform_one(self, features):
+        """Encode a single feature dict into a ``(1, n_features)`` array.
+
+        The returned array is a per-thread buffer that is overwritten by the
+        next call on the same thread.
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.zeros((1, len(self.feature_names)))
+        self._fill(buffer[0], features)
+        return self._finish(buffer)
+
+    def transform(self, rows):
+        """Encode a list of feature dicts into an ``(n, n_features)`` array."""
+        matrix = np.empty((len(rows), len(self.feature_names)))
+        for out, features in zip(matrix, rows):
+            self._fill(out, features)
+        return self._finish(matrix)
+
+    def transform_columns(self, columns, n_rows):
+        """Encode a dict of numeric feature columns into an ``(n_rows, n_features)`` array.
+
+        Categorical columns must already be encoded (see ``encode_column``);
+        entries that are not model features are ignored.
+        """
+        matrix = np.zeros((n_rows, len(self.feature_names)))
+        for name, values in columns.items():
+            idx = self.column_index.get(name)
+            if idx is not None:
+                matrix[:, idx] = values
+        return self._finish(matrix)
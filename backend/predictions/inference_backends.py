@@ -0,0 +1,231 @@
+"""
+Inference Backends
+Pluggable ways of evaluating the trained tree ensembles
+"""
+
+import threading
+
+import numpy as np
+
+from .ml_config import ml_setting
+from .tree_tables import export_tree_tables
+
+
+BACKEND_CHOICES = ("compiled", "reference")
+
+# Maximum relative/absolute difference tolerated against the reference model
+VERIFY_RTOL = 1e-6
+VERIFY_ATOL = 1e-6
+VERIFY_ROWS = 256
+# Largest batch the compiled tables serve, per model kind. The tables have
+# no per-call overhead (a single row takes a few tenths of a millisecond)
+# but their cost grows with the row count, while the estimators' native
+# code is faster once its fixed overhead is amortized: xgboost from a few
+# ten rows, an n_jobs sklearn forest from a few hundred. Larger batches
+# go to the estimator. Measured by ``python -m predictions.benchmark``.
+DEFAULT_COMPILED_MAX_ROWS = {"xgboost": 8, "sklearn_forest": 256}
+
+
+class ReferenceBackend:
+    """Calls the trained sklearn/xgboost estimator directly.
+
+    Takes the estimator, or a ``loader`` that returns it on first use.
+    """
+
+    name = "reference"
+
+    def __init__(self, model=None, loader=None):
+        self._model = model
+        self._loader = loader
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._loader()
+        return self._model
+
+    def predict(self, X):
+        return np.asarray(self.model.predict(X))
+
+
+class TreeTableBackend:
+    """Vectorized tree walk over flat NumPy node arrays.
+
+    Every row descends every tree in lock-step, one level per iteration,
+    so a batch costs the same number of NumPy calls as a single row; pairs
+    that reached a leaf drop out of the active set. Leaf values are summed
+    sequentially in tree order (via ``cumsum``) to reproduce the reference
+    summation.
+    """
+
+    name = "compiled"
+
+    def __init__(self, meta, tables):
+        self.meta = meta
+        self.roots = np.asarray(tables["roots"], dtype=np.intp)
+        self.left = tables["left"]
+        self.right = tables["right"]
+        self.feature = tables["feature"]
+        self.value = tables["value"]
+        self.default_left = tables["default_left"].astype(bool)
+        self.is_xgboost = meta["kind"] == "xgboost"
+        if self.is_xgboost:
+            # xgboost compares float32 values against float32 split conditions
+            self.threshold = np.asarray(tables["threshold"], dtype=np.float32)
+            self.base_score = np.float32(meta["base_score"])
+        else:
+            self.threshold = tables["threshold"]
+            self.base_score = 0.0
+        self.n_trees = len(self.roots)
+
+    def _leaves(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if not self.is_xgboost:
+            # sklearn casts to float32, then compares against float64 thresholds
+            X = X.astype(np.float64)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows) * n_features, self.n_trees)
+
+        # Only (row, tree) pairs still sitting on an internal node are walked
+        active = np.arange(nodes.size)
+        while active.size:
+            current = nodes[active]
+            left = self.left[current]
+            internal = left >= 0
+            if not internal.all():
+                active, current, left = active[internal], current[internal], left[internal]
+                if not active.size:
+                    break
+            values = flat_X[row_offsets[active] + self.feature[current]]
+            threshold = self.threshold[current]
+            if self.is_xgboost:
+                go_left = values < threshold
+            else:
+                go_left = values <= threshold
+            missing = np.isnan(values)
+            if missing.any():
+                go_left = np.where(missing, self.default_left[current], go_left)
+            nodes[active] = np.where(go_left, left, self.right[current])
+        return nodes.reshape(n_rows, self.n_trees)
+
+    def predict(self, X):
+        leaf_values = self.value[self._leaves(X)]
+        if self.is_xgboost:
+            margins = np.empty((leaf_values.shape[0], self.n_trees + 1), dtype=np.float32)
+            margins[:, 0] = self.base_score
+            margins[:, 1:] = leaf_values
+            # float32, like xgboost's own output
+            return np.cumsum(margins, axis=1, dtype=np.float32)[:, -1]
+        totals = np.cumsum(leaf_values, axis=1)[:, -1]
+        return totals / self.n_trees
+
+
+def verify_backend(backend, reference, n_features, n_rows=VERIFY_ROWS, seed=0):
+    """Compare ``backend`` with ``reference`` on synthetic standardized rows.
+
+    Returns the largest absolute difference; raises ValueError when it is
+    outside the tolerance.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0.0, 1.5, size=(n_rows, n_features))
+    expected = reference.predict(X)
+    actual = backend.predict(X)
+    max_diff = float(np.max(np.abs(actual.astype(np.float64) - expected))) if n_rows else 0.0
+    if not np.allclose(actual, expected, rtol=VERIFY_RTOL, atol=VERIFY_ATOL):
+        raise ValueError(f"{backend.name} backend differs from reference by up to {max_diff:g}")
+    return max_diff
+
+
+class CompiledBackend:
+    """Serves predictions from tree tables that match the reference model.
+
+    Calls with up to ``max_rows`` rows (None: any number) use the tables,
+    larger batches the reference model, each where it is faster.
+
+    Tables whose match was recorded when their bundle was built are used
+    as they are. Any other tables (loose pickles, older bundles, models
+    compiled in memory) are compared with the reference before their first
+    use, so the reference model never runs at load time, e.g. in a
+    pre-forking master. On a mismatch every call goes to the reference.
+    """
+
+    def __init__(self, tables, reference, n_features, verified=False, label="Model", max_rows=None):
+        self.tables = tables
+        self.reference = reference
+        self.n_features = n_features
+        self.verified = verified
+        self.label = label
+        self.max_rows = max_rows
+        self._use_reference = False
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return ReferenceBackend.name if self._use_reference else TreeTableBackend.name
+
+    def verify(self):
+        with self._lock:
+            if self.verified:
+                return
+            try:
+                verify_backend(self.tables, self.reference, self.n_features)
+            except ValueError as exc:
+                print(f"⚠️  Warning: {self.label} compiled inference unavailable, using reference: {exc}")
+                self._use_reference = True
+            self.verified = True
+
+    def predict(self, X):
+        if self.max_rows is not None and len(X) > self.max_rows:
+            return self.reference.predict(X)
+        if not self.verified:
+            self.verify()
+        if self._use_reference:
+            return self.reference.predict(X)
+        return self.tables.predict(X)
+
+
+def compiled_max_rows(kind):
+    """Largest batch served by the compiled tables of a ``kind`` model (None: no limit)."""
+    limits = {**DEFAULT_COMPILED_MAX_ROWS, **ml_setting("ML_COMPILED_MAX_ROWS", {})}
+    return limits.get(kind)
+
+
+def build_backend(model, n_features, preferred="compiled", bundle=None, label="Model", max_rows=None):
+    """Return the inference backend to serve ``model`` with.
+
+    The compiled backend uses the bundle's memory-mapped tree tables when
+    present, otherwise flattens the model once. Tables are only trusted
+    once they match the reference model: checked by ``save_bundle`` for
+    bundles, else on first use (see CompiledBackend). Any failure falls
+    back to the reference.
+
+    ``model`` may be None for a bundle: its estimator is then only
+    unpickled if the reference is actually needed. ``max_rows`` defaults
+    to ``compiled_max_rows`` for the model's kind.
+    """
+    if model is None:
+        reference = ReferenceBackend(loader=lambda: bundle.model)
+    else:
+        reference = ReferenceBackend(model)
+    if preferred not in BACKEND_CHOICES:
+        print(f"⚠️  Warning: Unknown inference backend {preferred!r}, using reference")
+    elif preferred == "compiled":
+        try:
+            tables = bundle.tree_tables() if bundle is not None else None
+            if tables:
+                meta = bundle.tree_meta
+            else:
+                meta, tables = export_tree_tables(reference.model)
+            return CompiledBackend(
+                TreeTableBackend(meta, tables), reference, n_features,
+                verified="verified_max_diff" in meta, label=label,
+                max_rows=max_rows if max_rows is not None else compiled_max_rows(meta["kind"]),
+            )
+        except (ValueError, KeyError) as exc:
+            print(f"⚠️  Warning: {label} compiled inference unavailable, using reference: {exc}")
+
+    # Served by the estimator itself: unpickle it now, not on the first request
+    reference.model
+    return reference
@@ -0,0 +1,173 @@
+"""
+Inference Executor
+Runs CPU-bound predictions off the request thread with bounded concurrency
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import (
+    BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError,
+)
+
+from .ml_config import ml_setting
+from .micro_batcher import PredictionTimeout
+
+
+EXECUTOR_KINDS = ("inline", "thread", "process")
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_PENDING = 32
+DEFAULT_TIMEOUT_SECONDS = 10.0
+
+
+class InferenceOverloaded(Exception):
+    """Raised when the executor already has ``max_pending`` jobs in flight."""
+
+
+def _init_process_worker(settings_module):
+    """Process-pool initializer: set up Django and load the models once."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+    from .ml_service import warmup
+
+    warmup()
+
+
+class InferenceExecutor:
+    """Submits ``task(name, rows, **options)`` calls to a thread or process pool.
+
+    ``kind`` is ``inline`` (run on the caller's thread), ``thread`` or
+    ``process``. Process workers import Django and preload the models in
+    their initializer, so a job only ships rows and results. At most
+    ``max_pending`` jobs may be queued or running; beyond that ``submit``
+    raises InferenceOverloaded immediately instead of queueing.
+    """
+
+    def __init__(self, task, kind=None, max_workers=None, max_pending=None, timeout_seconds=None):
+        config = ml_setting("INFERENCE_EXECUTOR", {})
+        self.task = task
+        self.kind = config.get("KIND", "inline") if kind is None else kind
+        if self.kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown inference executor kind {self.kind!r}")
+        self.max_workers = config.get("MAX_WORKERS", DEFAULT_MAX_WORKERS) if max_workers is None else max_workers
+        self.max_pending = config.get("MAX_PENDING", DEFAULT_MAX_PENDING) if max_pending is None else max_pending
+        self.timeout_seconds = (
+            config.get("TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS) if timeout_seconds is None else timeout_seconds
+        )
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # Pools and their threads do not survive a fork; rebuild lazily
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.kind == "thread":
+                        self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="inference")
+                    else:
+                        self._pool = ProcessPoolExecutor(
+                            self.max_workers,
+                            # A fresh interpreter: forking a threaded server is unsafe
+                            mp_context=multiprocessing.get_context("spawn"),
+                            initializer=_init_process_worker,
+                            initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "dealgoat.settings"),),
+                        )
+        return self._pool
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def submit(self, name, rows, **options):
+        """Schedule ``task(name, rows, **options)`` and return a Future."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise InferenceOverloaded(f"Inference queue is full ({self.max_pending} pending)")
+        with self._lock:
+            self.pending += 1
+
+        if self.kind == "inline":
+            future = Future()
+            try:
+                future.set_result(self.task(name, rows, **options))
+            except Exception as exc:
+                future.set_exception(exc)
+            finally:
+                self._release()
+            return future
+
+        try:
+            future = self._get_pool().submit(self.task, name, rows, **options)
+        except BrokenExecutor:
+            # A worker died; replace the pool and retry once
+            with self._lock:
+                self._pool = None
+            try:
+                future = self._get_pool().submit(self.task, name, rows, **options)
+            except Exception:
+                self._release()
+                raise
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, name, rows, timeout=None, **options):
+        """Run ``task(name, rows, **options)`` and wait for its result."""
+        future = self.submit(name, rows, **options)
+        timeout = self.timeout_seconds if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PredictionTimeout(f"{name} inference timed out after {timeout:g}s")
+
+    async def arun(self, name, rows, timeout=None):
+        """Async variant of ``run``; the event loop is never blocked."""
+        future = self.submit(name, rows)
+        timeout = self.timeout_seconds if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PredictionTimeout(f"{name} inference timed out after {timeout:g}s")
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self):
+        """Concurrency counters for monitoring."""
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
@@ -0,0 +1,38 @@
+"""
+Rebuild the nearest-comparables index from the database and save it.
+
+Usage:
+    python manage.py build_comparables_index
+    python manage.py build_comparables_index smartphone
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.comparables import SOURCES, ComparablesIndex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the comparables (nearest predictions/listings) index for laptops and smartphones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'device_types', nargs='*', metavar='device_type',
+            help=f"Device types to index: {', '.join(sorted(SOURCES))} (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        device_types = options['device_types'] or sorted(SOURCES)
+        unknown = [name for name in device_types if name not in SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown device type(s): {', '.join(unknown)}")
+        for device_type in device_types:
+            start = time.perf_counter()
+            index = ComparablesIndex(device_type)
+            index.rebuild()
+            version = index.save()
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {device_type}: indexed {len(index):,} rows across {len(index.partitions)} brands "
+                f"in {time.perf_counter() - start:.2f}s -> {index.path}/{version}"
+            ))
@@ -0,0 +1,40 @@
+"""
+Resume repricing jobs whose worker process stopped (restart, recycle, crash).
+
+Each job continues after its last recorded chunk, in this command's process.
+
+Usage:
+    python manage.py resume_repricing_jobs
+    python manage.py resume_repricing_jobs --fail
+"""
+
+from django.core.management.base import BaseCommand
+
+from predictions import repricing
+
+
+class Command(BaseCommand):
+    help = "Resume (or mark failed) queued/running repricing jobs whose worker process is gone"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail', action='store_true', help="Mark orphaned jobs failed instead of resuming them")
+        parser.add_argument('--orphan-seconds', type=int, default=None,
+                            help="Treat jobs without progress for this long as orphaned "
+                                 "(default: REPRICING_JOBS['ORPHAN_SECONDS'])")
+
+    def handle(self, *args, **options):
+        recovered = repricing.recover_jobs(options['orphan_seconds'], resume=not options['fail'])
+        if not recovered:
+            self.stdout.write("No orphaned repricing jobs")
+            return
+        for job, future in recovered:
+            if future is None:
+                self.stdout.write(self.style.WARNING(f"⚠️  Job #{job.id} marked failed"))
+                continue
+            self.stdout.write(f"Resuming job #{job.id} after row {job.processed_rows:,}...")
+            future.result()
+            job.refresh_from_db()
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Job #{job.id}: {job.status}, {job.priced_rows:,} priced, {job.failed_rows:,} failed"
+            ))
+        repricing.runner.shutdown()
@@ -0,0 +1,90 @@
+"""
+Continue training the price models on ground truth gathered since the last run.
+
+Usage:
+    python manage.py retrain_models
+    python manage.py retrain_models smartphone --rounds 200 --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions import retraining
+
+
+class Command(BaseCommand):
+    help = "Incrementally retrain the laptop/smartphone models from sold listings and saved predictions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*', metavar='model',
+            help=f"Models to retrain: {', '.join(sorted(retraining.SOURCES))} (default: all)",
+        )
+        parser.add_argument('--models-dir', default=None, help="Artifact directory (default: ml_models/)")
+        parser.add_argument('--rounds', type=int, default=retraining.DEFAULT_ROUNDS,
+                            help="Boosting rounds / forest trees to add")
+        parser.add_argument('--holdout', type=float, default=retraining.DEFAULT_HOLDOUT_FRACTION,
+                            help="Fraction of the new rows held out for evaluation")
+        parser.add_argument('--min-rows', type=int, default=retraining.DEFAULT_MIN_ROWS,
+                            help="Skip a model with fewer new rows than this")
+        parser.add_argument('--prediction-weight', type=float, default=retraining.DEFAULT_PREDICTION_WEIGHT,
+                            help="Sample weight of quoted predictions relative to sold listings")
+        parser.add_argument('--max-regression', type=float, default=retraining.DEFAULT_MAX_REGRESSION,
+                            help="Largest relative holdout MAE increase that is still published")
+        parser.add_argument('--chunk-rows', type=int, default=retraining.DEFAULT_CHUNK_ROWS,
+                            help="Database rows fetched and encoded per chunk")
+        parser.add_argument('--compact-budget', type=float, default=retraining.DEFAULT_BUDGET,
+                            help="Largest relative MAE increase allowed for a rebuilt compact laptop model")
+        parser.add_argument('--dry-run', action='store_true', help="Evaluate without writing a new version")
+        parser.add_argument('--force', action='store_true', help="Publish even if the holdout MAE regressed")
+
+    def handle(self, *args, **options):
+        names = options['models'] or sorted(retraining.SOURCES)
+        unknown = [name for name in names if name not in retraining.SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown model(s): {', '.join(unknown)}")
+        failures = 0
+        for name in names:
+            try:
+                result = retraining.retrain(
+                    name,
+                    models_dir=options['models_dir'],
+                    rounds=options['rounds'],
+                    holdout_fraction=options['holdout'],
+                    min_rows=options['min_rows'],
+                    prediction_weight=options['prediction_weight'],
+                    max_regression=options['max_regression'],
+                    chunk_rows=options['chunk_rows'],
+                    dry_run=options['dry_run'],
+                    force=options['force'],
+                    compact_budget=options['compact_budget'],
+                )
+            except retraining.RetrainingError as exc:
+                failures += 1
+                self.stdout.write(self.style.WARNING(f"⚠️  {name}: {exc}"))
+                continue
+            self._report(result)
+
+        if failures == len(names):
+            raise CommandError("No model was retrained")
+
+    def _report(self, result):
+        base, candidate = result['base_holdout'], result['candidate_holdout']
+        self.stdout.write(
+            f"{result['name']}: {result['rows']:,} new rows ({result['sold_rows']:,} sold) since "
+            f"{result['since'] or 'the first run'}; trained on {result['train_rows']:,}, "
+            f"held out {result['holdout_rows']:,}"
+        )
+        self.stdout.write(
+            f"   holdout MAE ₹{base['mae']:,.2f} -> ₹{candidate['mae']:,.2f}, "
+            f"within 10% {base['within_10_pct']:.1f}% -> {candidate['within_10_pct']:.1f}%"
+        )
+        if result['published']:
+            self.stdout.write(self.style.SUCCESS(f"✅ {result['name']}: new version written to {result['path']}"))
+            if result.get('compact_path'):
+                self.stdout.write(self.style.SUCCESS(f"✅ {result['name']}: compact version written to {result['compact_path']}"))
+        elif not result['accepted']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  {result['name']}: holdout MAE regressed, keeping {result['base_version']} (use --force to publish)"
+            ))
+        else:
+            self.stdout.write(f"   dry run: {result['name']} {result['base_version']} left active")
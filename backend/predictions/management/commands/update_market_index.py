@@ -0,0 +1,36 @@
+"""
+Fold new predictions and sold listings into the market price index.
+
+Usage:
+    python manage.py update_market_index
+    python manage.py update_market_index smartphone
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions import market_index
+
+
+class Command(BaseCommand):
+    help = "Update the per-model market price aggregates from new predictions and sold listings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'device_types', nargs='*', metavar='device_type',
+            help=f"Device types to update: {', '.join(sorted(market_index.SOURCES))} (default: all)",
+        )
+        parser.add_argument('--chunk-rows', type=int, default=market_index.DEFAULT_CHUNK_ROWS,
+                            help="Database rows fetched per chunk")
+
+    def handle(self, *args, **options):
+        device_types = options['device_types'] or sorted(market_index.SOURCES)
+        unknown = [name for name in device_types if name not in market_index.SOURCES]
+        if unknown:
+            raise CommandError(f"Unknown device type(s): {', '.join(unknown)}")
+        for device_type in device_types:
+            added = market_index.update(device_type, chunk_rows=options['chunk_rows'])
+            snapshot = market_index.MarketSnapshot.load(device_type)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {device_type}: {added:,} new prices; {snapshot.total_count:,} prices across "
+                f"{len(snapshot.models):,} models since {snapshot.window_start:%Y-%m}"
+            ))
@@ -0,0 +1,430 @@
+"""
+Market Price Index
+Rolling per-model resale price aggregates from predictions and sold listings
+
+Prices are folded into one ``MarketPriceAggregate`` row per device model
+and calendar month: count, sum, min/max and a mergeable quantile sketch.
+``update`` only reads rows past the stored cursors, so it never
+recomputes. A rolling window is the merge of the last ``WINDOW_MONTHS``
+monthly rows, which the serving processes hold as an in-memory snapshot
+refreshed in the background.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .ml_config import ml_setting
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_WINDOW_MONTHS = 3
+DEFAULT_MIN_OBSERVATIONS = 20
+DEFAULT_REFRESH_SECONDS = 60.0
+DEFAULT_CHUNK_ROWS = 2000
+# Prices at or below this go to the sketch's zero bucket
+MIN_SKETCH_VALUE = 1.0
+QUANTILES = {"p10": 0.10, "p25": 0.25, "median": 0.50, "p75": 0.75, "p90": 0.90}
+
+# Models are looked up when used, so ml_service can import this module
+# before Django's app registry is ready
+SOURCES = {
+    "laptop": {"prediction_model": "LaptopPrediction", "listing_relation": "laptop_prediction"},
+    "smartphone": {"prediction_model": "SmartphonePrediction", "listing_relation": "smartphone_prediction"},
+}
+
+
+def _model(name):
+    return apps.get_model("predictions", name)
+
+
+def min_observations():
+    return ml_setting("MARKET_INDEX", {}).get("MIN_OBSERVATIONS", DEFAULT_MIN_OBSERVATIONS)
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (as in DDSketch).
+
+    A value ``x`` is counted in bucket ``ceil(log(x) / log(gamma))`` with
+    ``gamma = (1 + alpha) / (1 - alpha)``, so every quantile is returned
+    within relative error ``alpha``. Sketches with the same ``alpha``
+    merge by adding bucket counts, which makes monthly rows combinable
+    into any rolling window.
+    """
+
+    def __init__(self, alpha=DEFAULT_RELATIVE_ACCURACY, buckets=None, zeros=0):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = dict(buckets or {})
+        self.zeros = zeros
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, value, count=1):
+        if value <= MIN_SKETCH_VALUE:
+            self.zeros += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other):
+        if not math.isclose(other.alpha, self.alpha):
+            raise ValueError(f"Cannot merge sketches with accuracy {other.alpha} and {self.alpha}")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        return self
+
+    def quantile(self, q):
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint (in relative terms) of the bucket's range
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_json(self):
+        return {
+            "alpha": self.alpha,
+            "zeros": self.zeros,
+            "buckets": {str(key): count for key, count in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_json(cls, data, alpha=DEFAULT_RELATIVE_ACCURACY):
+        if not data:
+            return cls(alpha)
+        return cls(
+            data.get("alpha", alpha),
+            {int(key): count for key, count in data.get("buckets", {}).items()},
+            data.get("zeros", 0),
+        )
+
+
+class _Accumulator:
+    """Count/sum/min/max and a sketch for one (model, month)."""
+
+    def __init__(self, alpha):
+        self.sketch = QuantileSketch(alpha)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, price):
+        self.sketch.add(price)
+        self.count += 1
+        self.total += price
+        self.minimum = price if self.minimum is None else min(self.minimum, price)
+        self.maximum = price if self.maximum is None else max(self.maximum, price)
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.count += other.count
+        self.total += other.total
+        for value in (other.minimum, other.maximum):
+            if value is not None:
+                self.minimum = value if self.minimum is None else min(self.minimum, value)
+                self.maximum = value if self.maximum is None else max(self.maximum, value)
+        return self
+
+    @classmethod
+    def from_row(cls, row, alpha):
+        """Accumulator holding a MarketPriceAggregate's values (model or ``values()`` dict)."""
+        get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+        acc = cls(alpha)
+        acc.sketch = QuantileSketch.from_json(get("sketch"), alpha)
+        acc.count = get("count")
+        acc.total = get("price_sum")
+        acc.minimum = get("price_min")
+        acc.maximum = get("price_max")
+        return acc
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.minimum,
+            "max": self.maximum,
+            **{name: self.sketch.quantile(q) for name, q in QUANTILES.items()},
+        }
+
+
+def _month(value):
+    return timezone.localtime(value).date().replace(day=1) if timezone.is_aware(value) else value.date().replace(day=1)
+
+
+def _fold(device_type, accumulators, alpha):
+    """Merge ``{(model_name, period): _Accumulator}`` into the aggregate rows."""
+    if not accumulators:
+        return
+    model_names = {model_name for model_name, _ in accumulators}
+    periods = {period for _, period in accumulators}
+    existing = {
+        (row.model_name, row.period): row
+        for row in _model("MarketPriceAggregate").objects.filter(
+            device_type=device_type, model_name__in=model_names, period__in=periods,
+        )
+    }
+    created, updated = [], []
+    for (model_name, period), new in accumulators.items():
+        row = existing.get((model_name, period))
+        merged = new if row is None else _Accumulator.from_row(row, alpha).merge(new)
+        if row is None:
+            row = _model("MarketPriceAggregate")(device_type=device_type, model_name=model_name, period=period)
+            created.append(row)
+        else:
+            updated.append(row)
+        summary = merged.summary()
+        # bulk_update does not apply auto_now
+        row.updated_at = timezone.now()
+        row.count = merged.count
+        row.price_sum = merged.total
+        row.price_min = merged.minimum
+        row.price_max = merged.maximum
+        row.sketch = merged.sketch.to_json()
+        for name in QUANTILES:
+            setattr(row, name, summary[name])
+
+    aggregates = _model("MarketPriceAggregate").objects
+    aggregates.bulk_create(created)
+    if updated:
+        aggregates.bulk_update(
+            updated, ["count", "price_sum", "price_min", "price_max", "sketch", *QUANTILES, "updated_at"],
+        )
+
+
+def update(device_type, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Fold predictions and sold listings recorded since the cursors into the index.
+
+    Runs in one transaction holding the cursor rows, so concurrent callers
+    queue up instead of counting the same rows twice. Returns the number
+    of prices added.
+    """
+    source = SOURCES[device_type]
+    relation = source["listing_relation"]
+    alpha = ml_setting("MARKET_INDEX", {}).get("RELATIVE_ACCURACY", DEFAULT_RELATIVE_ACCURACY)
+    accumulators = defaultdict(lambda: _Accumulator(alpha))
+    added = 0
+
+    with transaction.atomic():
+        predictions_cursor = _cursor(f"{device_type}:predictions")
+        sold_cursor = _cursor(f"{device_type}:sold_listings")
+
+        predictions = _model(source["prediction_model"]).objects.filter(pk__gt=predictions_cursor.last_id)
+        rows = predictions.values("pk", "model", "predicted_price", "created_at").order_by("pk")
+        for row in rows.iterator(chunk_size=chunk_rows):
+            if row["model"] and row["predicted_price"] is not None:
+                accumulators[(row["model"], _month(row["created_at"]))].add(float(row["predicted_price"]))
+                added += 1
+            predictions_cursor.last_id = row["pk"]
+
+        # Sold listings count at their agreed price, in the month they sold.
+        # The cursor follows ``sold_at`` (then pk), which later edits of the
+        # listing don't move, so each sale is counted once
+        sold = _model("Listing").objects.filter(
+            device_type=device_type, status="sold", sold_at__isnull=False, **{f"{relation}__isnull": False},
+        )
+        if sold_cursor.last_updated is not None:
+            sold = sold.filter(
+                Q(sold_at__gt=sold_cursor.last_updated)
+                | Q(sold_at=sold_cursor.last_updated, pk__gt=sold_cursor.last_id)
+            )
+        rows = sold.values("pk", f"{relation}__model", "expected_price", "sold_at").order_by("sold_at", "pk")
+        for row in rows.iterator(chunk_size=chunk_rows):
+            model_name = row[f"{relation}__model"]
+            if model_name and row["expected_price"] is not None:
+                accumulators[(model_name, _month(row["sold_at"]))].add(float(row["expected_price"]))
+                added += 1
+            sold_cursor.last_updated = row["sold_at"]
+            sold_cursor.last_id = row["pk"]
+
+        _fold(device_type, accumulators, alpha)
+        predictions_cursor.save()
+        sold_cursor.save()
+    return added
+
+
+def _cursor(source):
+    cursor, _ = _model("MarketIndexCursor").objects.select_for_update().get_or_create(source=source)
+    return cursor
+
+
+def _window_start(months):
+    start = timezone.localdate().replace(day=1)
+    for _ in range(max(months, 1) - 1):
+        start = (start - timedelta(days=1)).replace(day=1)
+    return start
+
+
+class MarketSnapshot:
+    """Immutable per-model summaries of the rolling window."""
+
+    def __init__(self, device_type, models, window_start):
+        self.device_type = device_type
+        self.models = models
+        self.window_start = window_start
+        self.total_count = sum(summary["count"] for summary in models.values())
+        self._overlays = {}
+        self._versions = {}
+
+    @classmethod
+    def load(cls, device_type, window_months=None):
+        config = ml_setting("MARKET_INDEX", {})
+        alpha = config.get("RELATIVE_ACCURACY", DEFAULT_RELATIVE_ACCURACY)
+        start = _window_start(window_months or config.get("WINDOW_MONTHS", DEFAULT_WINDOW_MONTHS))
+        accumulators = defaultdict(lambda: _Accumulator(alpha))
+        rows = _model("MarketPriceAggregate").objects.filter(device_type=device_type, period__gte=start).values(
+            "model_name", "count", "price_sum", "price_min", "price_max", "sketch",
+        )
+        for row in rows.iterator():
+            accumulators[row["model_name"]].merge(_Accumulator.from_row(row, alpha))
+        return cls(device_type, {name: acc.summary() for name, acc in accumulators.items()}, start)
+
+    def _overlaid(self, min_observations):
+        return {
+            name: summary for name, summary in self.models.items() if summary["count"] >= min_observations
+        }
+
+    def overlay_version(self, min_observations=DEFAULT_MIN_OBSERVATIONS):
+        """Hash of the entries ``overlay`` replaces, None when it replaces none.
+
+        Prices of models below ``min_observations`` don't reach the overlay,
+        so they don't change the version (or invalidate cached predictions).
+        """
+        version = self._versions.get(min_observations, False)
+        if version is False:
+            entries = sorted(
+                (name, summary["count"], summary["mean"])
+                for name, summary in self._overlaid(min_observations).items()
+            )
+            version = hashlib.sha256(json.dumps(entries).encode()).hexdigest()[:12] if entries else None
+            self._versions[min_observations] = version
+        return version
+
+    def overlay(self, stats, min_observations=DEFAULT_MIN_OBSERVATIONS, stats_version=None):
+        """Training ``model_popularity``/``model_avg_resale`` updated with live prices.
+
+        Only models with at least ``min_observations`` prices in the window
+        are replaced. Their live counts are rescaled to the training sample
+        size so popularity keeps the scale the model was trained on.
+        The result is cached per ``stats_version`` (the version of the
+        model ``stats`` belong to); without one it is recomputed.
+        """
+        key = (stats_version, min_observations)
+        cached = self._overlays.get(key) if stats_version is not None else None
+        if cached is not None:
+            return cached
+        popularity = dict(stats.get("model_popularity", {}))
+        avg_resale = dict(stats.get("model_avg_resale", {}))
+        overlaid = self._overlaid(min_observations)
+        # Only the overlaid counts go into the scale, so the result depends
+        # on nothing overlay_version doesn't hash
+        training_total = sum(popularity.values())
+        live_total = sum(summary["count"] for summary in overlaid.values())
+        scale = training_total / live_total if training_total and live_total else 1.0
+        for name, summary in overlaid.items():
+            popularity[name] = summary["count"] * scale
+            avg_resale[name] = summary["mean"]
+        cached = (popularity, avg_resale)
+        if stats_version is not None:
+            self._overlays[key] = cached
+        return cached
+
+
+class MarketIndexService:
+    """Process-wide market snapshots, refreshed in the background.
+
+    ``snapshot`` returns the current snapshot immediately (None until the
+    first load) and, at most every ``REFRESH_SECONDS``, starts a thread
+    that reloads it. The table itself is written by the
+    ``update_market_index`` command; ``AUTO_UPDATE`` makes the refresh
+    update it first, for single-process deployments only.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refreshed_at = {}
+
+    def snapshot(self, device_type):
+        config = ml_setting("MARKET_INDEX", {})
+        if not config.get("ENABLED", True):
+            return None
+        interval = config.get("REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)
+        now = time.monotonic()
+        with self._lock:
+            due = device_type not in self._refreshing and (
+                device_type not in self._refreshed_at or now - self._refreshed_at[device_type] >= interval
+            )
+            if due:
+                self._refreshing.add(device_type)
+                self._refreshed_at[device_type] = now
+        if due:
+            threading.Thread(
+                target=self._refresh_in_background, args=(device_type,),
+                name=f"market-index-{device_type}", daemon=True,
+            ).start()
+        return self._snapshots.get(device_type)
+
+    def _refresh_in_background(self, device_type):
+        try:
+            self.refresh(device_type)
+        except Exception as exc:
+            print(f"⚠️  Warning: {device_type} market index refresh failed: {exc}")
+        finally:
+            # The thread's own database connection (none outside Django)
+            if settings.configured:
+                connection.close()
+            with self._lock:
+                self._refreshing.discard(device_type)
+
+    def refresh(self, device_type):
+        """Update the table (if enabled) and reload the snapshot now."""
+        config = ml_setting("MARKET_INDEX", {})
+        if config.get("AUTO_UPDATE", False):
+            update(device_type)
+        snapshot = MarketSnapshot.load(device_type)
+        self._snapshots[device_type] = snapshot
+        return snapshot
+
+    def stats(self):
+        return {
+            device_type: {
+                "version": snapshot.overlay_version(min_observations()),
+                "window_start": snapshot.window_start.isoformat(),
+                "models": len(snapshot.models),
+                "prices": snapshot.total_count,
+            }
+            for device_type, snapshot in self._snapshots.items()
+        }
+
+
+market_index = MarketIndexService()
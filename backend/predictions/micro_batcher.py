@@ -0,0 +1,145 @@
+"""
+Micro Batcher
+Coalesces concurrent single-row predictions into one vectorized call
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from .ml_config import ml_setting
+
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 2.0
+DEFAULT_TIMEOUT_SECONDS = 5.0
+
+
+class PredictionTimeout(Exception):
+    """Raised when a queued prediction is not answered within its timeout."""
+
+
+class MicroBatcher:
+    """In-process prediction server for one model.
+
+    Callers enqueue a single input and block (or await) on a future. A
+    background thread takes the first waiting request, keeps collecting
+    until ``max_batch_size`` rows are queued or ``max_wait_ms`` has passed,
+    then answers the whole batch with one ``predict_many`` call.
+    """
+
+    def __init__(self, name, predict_many, max_batch_size=None, max_wait_ms=None, timeout_seconds=None):
+        config = ml_setting("PREDICTION_BATCHING", {})
+        self.name = name
+        self.predict_many = predict_many
+        self.max_batch_size = (
+            config.get("MAX_BATCH_SIZE", DEFAULT_MAX_BATCH_SIZE) if max_batch_size is None else max_batch_size
+        )
+        self.max_wait = (
+            config.get("MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS) if max_wait_ms is None else max_wait_ms
+        ) / 1000.0
+        self.timeout_seconds = (
+            config.get("TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS) if timeout_seconds is None else timeout_seconds
+        )
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # The worker thread does not survive a fork; start a fresh one lazily
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self.batches = 0
+        self.rows = 0
+        self.timeouts = 0
+        self.max_queue_depth = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-micro-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, data):
+        """Queue one input and return a Future for its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((data, future))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def predict(self, data, timeout=None):
+        """Predict one input, waiting at most ``timeout`` seconds."""
+        future = self.submit(data)
+        timeout = self.timeout_seconds if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Drop it from the batch if it has not been picked up yet
+            future.cancel()
+            self.timeouts += 1
+            raise PredictionTimeout(f"{self.name} prediction timed out after {timeout:g}s")
+
+    async def apredict(self, data, timeout=None):
+        """Async variant of ``predict`` for ASGI callers."""
+        future = self.submit(data)
+        timeout = self.timeout_seconds if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.timeouts += 1
+            raise PredictionTimeout(f"{self.name} prediction timed out after {timeout:g}s")
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Skip requests whose callers already gave up
+        return [(data, future) for data, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                results = self.predict_many([data for data, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            self.batches += 1
+            self.rows += len(batch)
+
+    def stats(self):
+        """Queue and batch counters for monitoring."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "timeouts": self.timeouts,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
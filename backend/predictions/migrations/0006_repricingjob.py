@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('predictions', '0005_listing_moderated_at_listing_moderated_by_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepricingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_type', models.CharField(choices=[('smartphone', 'Smartphone'), ('laptop', 'Laptop')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('original_filename', models.CharField(blank=True, max_length=255)),
+                ('input_path', models.CharField(max_length=500)),
+                ('output_path', models.CharField(blank=True, max_length=500)),
+                ('total_rows', models.IntegerField(default=0, help_text='Estimated from the line count')),
+                ('processed_rows', models.IntegerField(default=0)),
+                ('priced_rows', models.IntegerField(default=0)),
+                ('failed_rows', models.IntegerField(default=0)),
+                ('output_bytes', models.BigIntegerField(default=0, help_text='Output CSV size after the last recorded chunk')),
+                ('error_message', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='repricing_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Repricing Job',
+                'verbose_name_plural': 'Repricing Jobs',
+                'db_table': 'repricing_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='repricing_j_user_id_dd2936_idx'), models.Index(fields=['status'], name='repricing_j_status_151c99_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:51
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_sold_at(apps, schema_editor):
+    # Best available guess for listings sold before sold_at existed
+    Listing = apps.get_model('predictions', 'Listing')
+    Listing.objects.filter(status='sold', sold_at__isnull=True).update(sold_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0006_repricingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='sold_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the listing was first marked sold; later edits keep it', null=True),
+        ),
+        migrations.RunPython(backfill_sold_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0007_listing_sold_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketIndexCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'market_index_cursors',
+            },
+        ),
+        migrations.CreateModel(
+            name='MarketPriceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_type', models.CharField(choices=[('smartphone', 'Smartphone'), ('laptop', 'Laptop')], max_length=20)),
+                ('model_name', models.CharField(max_length=200)),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('count', models.IntegerField(default=0)),
+                ('price_sum', models.FloatField(default=0)),
+                ('price_min', models.FloatField(blank=True, null=True)),
+                ('price_max', models.FloatField(blank=True, null=True)),
+                ('median', models.FloatField(blank=True, null=True)),
+                ('p10', models.FloatField(blank=True, null=True)),
+                ('p25', models.FloatField(blank=True, null=True)),
+                ('p75', models.FloatField(blank=True, null=True)),
+                ('p90', models.FloatField(blank=True, null=True)),
+                ('sketch', models.JSONField(default=dict, help_text='Mergeable log-bucketed quantile sketch')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Market Price Aggregate',
+                'verbose_name_plural': 'Market Price Aggregates',
+                'db_table': 'market_price_aggregates',
+                'ordering': ['device_type', 'model_name', '-period'],
+                'indexes': [models.Index(fields=['device_type', 'period'], name='market_pric_device__32230f_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='marketpriceaggregate',
+            constraint=models.UniqueConstraint(fields=('device_type', 'model_name', 'period'), name='unique_market_aggregate'),
+        ),
+    ]
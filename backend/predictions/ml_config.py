@@ -0,0 +1,16 @@
+"""
+ML Settings
+Reads ML serving options from Django settings when they are available
+"""
+
+
+def ml_setting(name, default=None):
+    """Return ``settings.<name>``, or ``default`` outside a configured Django."""
+    try:
+        from django.conf import settings
+
+        if settings.configured:
+            return getattr(settings, name, default)
+    except ImportError:
+        pass
+    return default
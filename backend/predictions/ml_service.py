@@ -3,31 +3,115 @@ ML Prediction Service
 Handles loading models and making predictions
 """
 
+import gc
 import os
 import pickle
+import threading
+import time
 
 import numpy as np
 import pandas as pd
 
+from .feature_engineering import CONDITION_MAP, PREMIUM_BRANDS, SELLER_MAP, engineer_features
+from .feature_vectorizer import FeatureVectorizer
+from .inference_executor import InferenceExecutor
+from .inference_backends import build_backend
+from .market_index import market_index, min_observations
+from .micro_batcher import MicroBatcher
+from .ml_config import ml_setting
+from .model_bundle import (
+    COMPACT_LAPTOP_BUNDLE, BundleError, BundleNotFound, active_version, load_bundle, shadow_version,
+)
+from .prediction_cache import PredictionCache, artifact_fingerprint
+from .shadow_scoring import ShadowScorer
+
+
+DEFAULT_RELOAD_CHECK_SECONDS = 5.0
+
+
+def _open_bundle(models_dir, name, label, version=None):
+    """Load the active model bundle, or None to fall back to loose pickles.
+
+    A pinned ``version`` must load: its errors propagate instead of
+    silently serving the loose pickles.
+    """
+    try:
+        # The estimator is only unpickled if the reference backend needs it
+        return load_bundle(
+            models_dir, name, version=version, verify=ml_setting("ML_BUNDLE_VERIFY", False), load_model=False,
+        )
+    except BundleNotFound:
+        if version is not None:
+            raise
+        return None
+    except (BundleError, OSError, pickle.UnpicklingError) as exc:
+        if version is not None:
+            raise
+        print(f"⚠️  Warning: {label} model bundle unusable, using loose pickles: {exc}")
+        return None
+
 
 class LaptopPricePredictor:
     """Service class for laptop price predictions."""
 
-    def __init__(self):
-        self.model = None
+    # Input keys read by preprocessing and the price floor (cache key)
+    input_fields = (
+        "brand", "model", "launch_year", "launch_price", "original_price",
+        "processor", "ram", "storage_type", "storage_size", "gpu", "screen_size",
+        "battery_cycle_count", "condition", "warranty_remaining", "seller_location",
+        "months_ahead",
+    )
+    numeric_fields = (
+        "launch_year", "launch_price", "original_price", "ram", "storage_size", "screen_size",
+        "battery_cycle_count", "warranty_remaining", "months_ahead",
+    )
+    condition_choices = ("Excellent", "Good", "Average", "Poor")
+    artifact_files = (
+        "laptop_price_model.pkl", "laptop_scaler.pkl", "laptop_label_encoders.pkl",
+        "laptop_feature_names.pkl", "laptop_model_metadata.pkl",
+    )
+
+    def __init__(self, models_dir=None, version=None, variant=None):
+        self._model = None
         self.scaler = None
         self.label_encoders = None
         self.feature_names = None
         self.metadata = None
-        self.models_dir = os.path.join(os.path.dirname(__file__), "ml_models")
+        self.vectorizer = None
+        self.backend = None
+        self.bundle = None
+        self.models_dir = models_dir or os.path.join(os.path.dirname(__file__), "ml_models")
+        self.version = version
+        # 'full' forest or the 'compact' model derived from it at training time
+        self.variant = variant or ml_setting("ML_LAPTOP_VARIANT", "full")
+        self.cache = PredictionCache("laptop", self.input_fields, numeric_fields=self.numeric_fields)
         self.load_models()
 
     def load_models(self):
-        """Load trained models and artifacts."""
+        """Load trained models and artifacts (versioned bundle, else loose pickles)."""
+        self.bundle = None
+        if self.variant == "compact":
+            try:
+                self.bundle = _open_bundle(self.models_dir, COMPACT_LAPTOP_BUNDLE, "Compact laptop", self.version)
+            except BundleNotFound:
+                pass
+            if self.bundle is None:
+                print("⚠️  Warning: No compact laptop bundle, serving the full model")
+        if self.bundle is None:
+            self.bundle = _open_bundle(self.models_dir, "laptop", "Laptop", self.version)
+        if self.bundle is not None:
+            self.scaler = self.bundle.scaler
+            self.label_encoders = self.bundle.label_encoders
+            self.feature_names = self.bundle.feature_names
+            self.metadata = self.bundle.metadata
+            self._compile()
+            print(f"✅ Laptop model bundle {self.bundle.name} {self.bundle.version} loaded successfully")
+            return
+
         try:
             # Model + scaler
             with open(os.path.join(self.models_dir, "laptop_price_model.pkl"), "rb") as f:
-                self.model = pickle.load(f)
+                self._model = pickle.load(f)
             with open(os.path.join(self.models_dir, "laptop_scaler.pkl"), "rb") as f:
                 self.scaler = pickle.load(f)
 
@@ -39,14 +123,53 @@ class LaptopPricePredictor:
             with open(os.path.join(self.models_dir, "laptop_model_metadata.pkl"), "rb") as f:
                 self.metadata = pickle.load(f)
 
+            self._compile()
             print("✅ Laptop models loaded successfully")
         except FileNotFoundError as exc:
             print(f"⚠️  Warning: Laptop model not found: {exc}")
             print("   ML predictions will not be available until models are trained")
             # Don't raise - allow Django to start without models
 
+    def _compile(self):
+        """Build the serving-time structures for the loaded artifacts."""
+        arrays = self.bundle.arrays if self.bundle else {}
+        self.vectorizer = FeatureVectorizer(
+            self.feature_names, self.label_encoders, self.scaler,
+            mean=arrays.get("scaler_mean"), scale=arrays.get("scaler_scale"),
+        )
+        self.backend = build_backend(
+            self._model, len(self.feature_names),
+            preferred=ml_setting("ML_INFERENCE_BACKEND", "compiled"), bundle=self.bundle, label="Laptop",
+        )
+        self.cache.clear(version=self.artifact_version(), vocabulary=self._vocabulary())
+
+    def _vocabulary(self):
+        """Training spellings of the categorical inputs."""
+        vocabulary = {
+            col: list(encoder.classes_) for col, encoder in self.label_encoders.items() if col in self.input_fields
+        }
+        vocabulary["condition"] = [*vocabulary.get("condition", []), *self.condition_choices]
+        return vocabulary
+
+    @property
+    def model(self):
+        """The trained estimator; a bundle's is unpickled on first access."""
+        return self.bundle.model if self.bundle is not None else self._model
+
+    @property
+    def is_loaded(self):
+        return self.backend is not None
+
     def preprocess_input(self, data):
-        """Preprocess input data for prediction."""
+        """Preprocess one input into a scaled, model-ready feature row."""
+        return self.vectorizer.transform_one(self._features(data))
+
+    def preprocess_many(self, rows):
+        """Preprocess a batch of inputs into a scaled feature matrix."""
+        return self.vectorizer.transform([self._features(row) for row in rows])
+
+    def _features(self, data):
+        """Engineer the unencoded features for one input."""
         processed_data = {
             "launch_year": data.get("launch_year", 2020),
             "launch_price": data.get("launch_price", 50000),
@@ -58,7 +181,9 @@ class LaptopPricePredictor:
         }
 
         current_year = 2025
-        processed_data["device_age_years"] = current_year - processed_data["launch_year"]
+        # months_ahead > 0 values the device at a future age (depreciation curve)
+        months_ahead = data.get("months_ahead", 0)
+        processed_data["device_age_years"] = current_year - processed_data["launch_year"] + months_ahead / 12
         processed_data["depreciation_pct"] = 0
 
         brand = data.get("brand", "Unknown")
@@ -93,40 +218,53 @@ class LaptopPricePredictor:
         else:
             storage_category = "Ultra"
 
-        df = pd.DataFrame([processed_data])
-        df["brand"] = brand
-        df["processor"] = processor
-        df["storage_type"] = storage_type
-        df["gpu"] = gpu
-        df["condition"] = condition
-        df["seller_location"] = seller_location
-        df["model"] = model_name
-        df["ram_category"] = ram_category
-        df["storage_category"] = storage_category
-
-        for feature in self.feature_names:
-            if feature not in df.columns:
-                df[feature] = 0
-
-        for col in df.select_dtypes(include=["object"]).columns:
-            if col in self.label_encoders:
-                le = self.label_encoders[col]
-                df[col] = df[col].apply(lambda x: le.transform([x])[0] if x in le.classes_ else -1)
-            else:
-                df[col] = 0
-
-        df = df[self.feature_names]
-        return df
+        processed_data["brand"] = brand
+        processed_data["processor"] = processor
+        processed_data["storage_type"] = storage_type
+        processed_data["gpu"] = gpu
+        processed_data["condition"] = condition
+        processed_data["seller_location"] = seller_location
+        processed_data["model"] = model_name
+        processed_data["ram_category"] = ram_category
+        processed_data["storage_category"] = storage_category
+        return processed_data
 
     def predict(self, data):
         """Make a price prediction."""
-        if self.model is None:
+        return self.predict_many([data])[0]
+
+    def predict_many(self, rows, use_cache=True):
+        """Make price predictions for a batch of inputs.
+
+        Cached rows are answered from the prediction cache; the rest go
+        through one scaler transform and one model call. Each result is
+        identical to what ``predict`` returns for that row. Bulk jobs pass
+        ``use_cache=False`` so they don't evict interactive entries.
+        """
+        if not self.is_loaded:
             raise ValueError("Laptop model not loaded. Please train the model first.")
 
-        processed_data = self.preprocess_input(data)
-        scaled_data = self.scaler.transform(processed_data)
-        model_price = max(0, float(self.model.predict(scaled_data)[0]))
+        rows = [self.cache.normalize(row) for row in rows]
+        if not rows:
+            return []
+        if not use_cache:
+            return self._predict_uncached(rows)
+        return self.cache.resolve(rows, self._predict_uncached)
+
+    def _predict_uncached(self, rows):
+        if len(rows) == 1:
+            scaled_data = self.preprocess_input(rows[0])
+        else:
+            scaled_data = self.preprocess_many(rows)
+        model_prices = self.backend.predict(scaled_data)
+
+        return [
+            self._build_result(data, max(0, float(model_price)))
+            for data, model_price in zip(rows, model_prices)
+        ]
 
+    def _build_result(self, data, model_price):
+        """Apply the business-rule floor and format a single prediction."""
         # ------------------------------------------------------------------
         # Business-rule floor to avoid clearly unrealistic underpricing
         # ------------------------------------------------------------------
@@ -140,7 +278,7 @@ class LaptopPricePredictor:
             launch_year = int(launch_year)
         except (TypeError, ValueError):
             launch_year = current_year
-        device_age_years = max(0, current_year - launch_year)
+        device_age_years = max(0, current_year - launch_year) + data.get("months_ahead", 0) / 12
 
         # Base minimum resale percentage by age
         if device_age_years <= 1:
@@ -191,6 +329,14 @@ class LaptopPricePredictor:
             },
         }
 
+    def artifact_version(self):
+        """Bundle version and checksum, or a fingerprint of the loose artifact files."""
+        if self.bundle is not None:
+            return f"{self.bundle.version}-{self.bundle.checksum[:8]}"
+        return artifact_fingerprint(
+            [os.path.join(self.models_dir, name) for name in self.artifact_files]
+        )
+
     def get_model_info(self):
         if self.metadata is None:
             return None
@@ -201,34 +347,76 @@ class LaptopPricePredictor:
             "rmse": self.metadata.get("rmse"),
             "n_features": self.metadata.get("n_features"),
             "n_samples": self.metadata.get("n_samples"),
+            "inference_backend": self.backend.name if self.backend else None,
+            "compiled_max_rows": getattr(self.backend, "max_rows", None),
+            "variant": "compact" if self.bundle and self.bundle.name == COMPACT_LAPTOP_BUNDLE else "full",
+            "compaction": self.metadata.get("compaction"),
         }
 
 
 class SmartphonePricePredictor:
     """Service class for smartphone price predictions."""
 
-    condition_map = {
-        "Like New": 10, "Good": 8, "Fair": 6, "Average": 5,
-        "Used": 5, "Refurbished": 7, "Screen Damage": 2, "No Box": 6
-    }
-    premium_brands = {'Apple', 'Samsung', 'Google', 'Oneplus', 'Nothing'}
-    seller_map = {'Store': 3, 'Refurbisher': 2, 'Individual': 1}
-
-    def __init__(self):
-        self.model = None
+    # Input keys read by preprocessing and the price floor (cache key)
+    input_fields = (
+        "brand", "model", "model_name", "launch_year", "launch_price", "original_price",
+        "processor", "storage_gb", "ram_gb", "battery_percentage", "battery_health",
+        "camera_rear_mp", "camera_front_mp", "display_type", "display_size_inch",
+        "supports_5g", "condition", "warranty_months", "screen_cracked", "body_damage",
+        "accessories", "seller_type", "seller_location", "months_ahead",
+    )
+    numeric_fields = (
+        "launch_year", "launch_price", "original_price", "storage_gb", "ram_gb", "battery_percentage",
+        "battery_health", "camera_rear_mp", "camera_front_mp", "display_size_inch", "warranty_months",
+        "months_ahead",
+    )
+    artifact_files = (
+        "smartphone_price_model.pkl", "smartphone_feature_names.pkl",
+        "smartphone_label_encoders.pkl", "smartphone_model_metadata.pkl",
+        "smartphone_scaler.pkl", "smartphone_model_stats.pkl",
+    )
+
+    condition_map = CONDITION_MAP
+    condition_choices = tuple(condition_map)
+    premium_brands = PREMIUM_BRANDS
+    seller_map = SELLER_MAP
+
+    def __init__(self, models_dir=None, version=None, use_market_index=True):
+        self._model = None
         self.scaler = None
         self.feature_names = None
         self.label_encoders = {}
         self.metadata = {}
         self.stats = {"model_popularity": {}, "model_avg_resale": {}}
-        self.models_dir = os.path.join(os.path.dirname(__file__), "ml_models")
+        self.vectorizer = None
+        self.backend = None
+        self.bundle = None
+        self.models_dir = models_dir or os.path.join(os.path.dirname(__file__), "ml_models")
+        self.version = version
+        # Overlay live per-model market prices on the training-time stats
+        self.use_market_index = use_market_index
+        self._market_version = None
+        self._stats_version = None
+        self.cache = PredictionCache("smartphone", self.input_fields, numeric_fields=self.numeric_fields)
         self.load_models()
 
     def load_models(self):
-        """Load trained smartphone artifacts."""
+        """Load trained smartphone artifacts (versioned bundle, else loose pickles)."""
+        self.bundle = _open_bundle(self.models_dir, "smartphone", "Smartphone", self.version)
+        if self.bundle is not None:
+            self.scaler = self.bundle.scaler
+            self.feature_names = self.bundle.feature_names
+            self.label_encoders = self.bundle.label_encoders
+            self.metadata = self.bundle.metadata
+            if self.bundle.stats is not None:
+                self.stats = self.bundle.stats
+            self._compile()
+            print(f"✅ Smartphone model bundle {self.bundle.version} loaded successfully")
+            return
+
         try:
             with open(os.path.join(self.models_dir, "smartphone_price_model.pkl"), "rb") as f:
-                self.model = pickle.load(f)
+                self._model = pickle.load(f)
             with open(os.path.join(self.models_dir, "smartphone_feature_names.pkl"), "rb") as f:
                 self.feature_names = pickle.load(f)
             with open(os.path.join(self.models_dir, "smartphone_label_encoders.pkl"), "rb") as f:
@@ -244,176 +432,170 @@ class SmartphonePricePredictor:
             if os.path.exists(stats_path):
                 with open(stats_path, "rb") as f:
                     self.stats = pickle.load(f)
+            self._compile()
             print("✅ Smartphone model loaded successfully")
         except FileNotFoundError as exc:
             print(f"⚠️  Warning: Smartphone model not found: {exc}")
             print("   ML predictions will not be available until models are trained")
             # Don't raise - allow Django to start without models
 
-    def _score_accessories(self, accessories: str) -> int:
-        if not accessories:
-            return 0
-        acc = accessories.lower()
-        score = 0
-        if "charger" in acc:
-            score += 2
-        if "earphone" in acc or "headphone" in acc:
-            score += 2
-        if "box" in acc:
-            score += 2
-        if "bill" in acc:
-            score += 1
-        return score
-
-    def _encode_category(self, col, value):
-        encoder = self.label_encoders.get(col)
-        if not encoder:
-            return 0
-        value = str(value)
-        if value in encoder.classes_:
-            return int(encoder.transform([value])[0])
-        return -1
+    def _compile(self):
+        """Build the serving-time structures for the loaded artifacts."""
+        arrays = self.bundle.arrays if self.bundle else {}
+        self.vectorizer = FeatureVectorizer(
+            self.feature_names, self.label_encoders, self.scaler, sanitize=True,
+            mean=arrays.get("scaler_mean"), scale=arrays.get("scaler_scale"),
+        )
+        self.backend = build_backend(
+            self._model, len(self.feature_names),
+            preferred=ml_setting("ML_INFERENCE_BACKEND", "compiled"), bundle=self.bundle, label="Smartphone",
+        )
+        # Identifies self.stats for the market overlay cache
+        self._stats_version = self.artifact_version()
+        self.cache.clear(version=self._stats_version, vocabulary=self._vocabulary())
+
+    def _vocabulary(self):
+        """Training spellings of the categorical inputs."""
+        vocabulary = {
+            col: list(encoder.classes_) for col, encoder in self.label_encoders.items() if col in self.input_fields
+        }
+        vocabulary["condition"] = list(self.condition_map)
+        vocabulary["seller_type"] = [*vocabulary.get("seller_type", []), *self.seller_map]
+        model_names = [*self.stats.get("model_popularity", {}), *self.stats.get("model_avg_resale", {})]
+        vocabulary["model"] = vocabulary["model_name"] = model_names
+        return vocabulary
+
+    @property
+    def model(self):
+        """The trained estimator; a bundle's is unpickled on first access."""
+        return self.bundle.model if self.bundle is not None else self._model
+
+    @property
+    def is_loaded(self):
+        return self.backend is not None
 
     def preprocess_input(self, data):
-        """Apply the same feature engineering used during training."""
+        """Apply the training feature engineering and scaling to one input."""
+        return self.preprocess_many([data])
+
+    def preprocess_many(self, rows, snapshot=None):
+        """Feature-engineer and scale a batch of inputs.
+
+        ``snapshot`` is the market snapshot whose prices are overlaid
+        (default: the current one).
+        """
+        if snapshot is None:
+            snapshot = self._market_snapshot()
+        return self.vectorizer.transform_columns(self._columns(rows, snapshot), len(rows))
+
+    def _columns(self, rows, snapshot):
+        """Parse inputs into the dataset's columns and run the shared feature pipeline."""
         current_year = pd.Timestamp.now().year
 
-        storage = float(data.get("storage_gb", 128) or 128)
-        ram = float(data.get("ram_gb", 6) or 6)
-        battery_pct = float(data.get("battery_percentage", 85) or 85)
-        battery_health = float(data.get("battery_health", 85) or 85)
-        camera_rear = float(data.get("camera_rear_mp", 48) or 48)
-        camera_front = float(data.get("camera_front_mp", 16) or 16)
-        display_size = float(data.get("display_size_inch", 6.5) or 6.5)
-        supports_5g = 1 if data.get("supports_5g", False) else 0
-        launch_year = int(data.get("launch_year", current_year))
-        screen_cracked = 1 if data.get("screen_cracked", False) else 0
-        body_damage = 1 if data.get("body_damage", False) else 0
-        warranty = float(data.get("warranty_months", 0) or 0)
-        price_numeric = float(data.get("launch_price", data.get("original_price", 20000)) or 20000)
-        condition = data.get("condition", "Good")
-        accessories = data.get("accessories", "")
-        seller_type = data.get("seller_type", "Store")
-
-        device_age_years = max(0, current_year - launch_year)
-        log_price = np.log1p(price_numeric)
-        depreciation_rate = price_numeric / (device_age_years + 1)
-        expected_value = price_numeric * (0.85 ** device_age_years)
-
-        total_memory_score = storage + (ram * 8)
-        memory_ratio = storage / (ram + 1)
-        is_high_memory = int(storage >= 128 and ram >= 6)
-
-        total_camera = camera_rear + camera_front
-        camera_quality = camera_rear / (camera_front + 1)
-        is_good_camera = int(camera_rear >= 48)
-
-        battery_avg = (battery_pct + battery_health) / 2
-        battery_score = battery_avg * np.exp(-0.05 * device_age_years)
-
-        condition_score = self.condition_map.get(condition, 5)
-        damage_penalty = screen_cracked * 5 + body_damage * 2
-        device_quality = condition_score * 3 + battery_score / 10 + warranty / 2 - damage_penalty
-
-        brand = str(data.get("brand", "Unknown")).title()
-        is_premium_brand = int(brand in self.premium_brands)
-        is_modern = int(launch_year >= 2020)
-        year_squared = launch_year ** 2
-        is_large_display = int(display_size >= 6.5)
-        g5_premium = supports_5g * is_modern
-
-        accessories_value = self._score_accessories(accessories)
-        seller_reliability = self.seller_map.get(seller_type, 2)
-
-        model_name = data.get("model_name") or data.get("model") or "Unknown"
-        model_popularity = self.stats.get("model_popularity", {}).get(model_name, 1)
-        # If the model name is unknown, fall back to a value based on its own launch
-        # price, not the global median. This is critical for new/premium phones.
-        model_avg_resale = self.stats.get("model_avg_resale", {}).get(model_name, price_numeric * 0.6)
-
-        price_age_interaction = price_numeric * np.exp(-0.1 * device_age_years)
-        price_condition_interaction = price_numeric * (condition_score / 10)
-
-        processed = {
-            "storage_GB": storage,
-            "RAM_GB": ram,
-            "Battery %": battery_pct,
-            "battery_health": battery_health,
-            "camera_rear_mp": camera_rear,
-            "camera_front_mp": camera_front,
-            "display_size_inch": display_size,
-            "supports_5g": supports_5g,
+        def column(values):
+            return np.array(values, dtype=np.float64)
+
+        launch_year = np.array([int(data.get("launch_year", current_year)) for data in rows], dtype=np.int64)
+        price_numeric = column([
+            float(data.get("launch_price", data.get("original_price", 20000)) or 20000) for data in rows
+        ])
+        # months_ahead > 0 values the device at a future age (depreciation curve)
+        months_ahead = column([data.get("months_ahead", 0) for data in rows])
+        brand = [str(data.get("brand", "Unknown")).title() for data in rows]
+        seller_type = [data.get("seller_type", "Store") for data in rows]
+        model_names = [data.get("model_name") or data.get("model") or "Unknown" for data in rows]
+
+        popularity, avg_resale = self.model_stats(snapshot)
+        columns = {
+            "storage_GB": column([float(data.get("storage_gb", 128) or 128) for data in rows]),
+            "RAM_GB": column([float(data.get("ram_gb", 6) or 6) for data in rows]),
+            "Battery %": column([float(data.get("battery_percentage", 85) or 85) for data in rows]),
+            "battery_health": column([float(data.get("battery_health", 85) or 85) for data in rows]),
+            "camera_rear_mp": column([float(data.get("camera_rear_mp", 48) or 48) for data in rows]),
+            "camera_front_mp": column([float(data.get("camera_front_mp", 16) or 16) for data in rows]),
+            "display_size_inch": column([float(data.get("display_size_inch", 6.5) or 6.5) for data in rows]),
+            "supports_5g": column([1 if data.get("supports_5g", False) else 0 for data in rows]),
             "launch_year": launch_year,
-            "screen_cracked": screen_cracked,
-            "body_damage": body_damage,
-            "warranty": warranty,
+            "screen_cracked": column([1 if data.get("screen_cracked", False) else 0 for data in rows]),
+            "body_damage": column([1 if data.get("body_damage", False) else 0 for data in rows]),
+            "warranty": column([float(data.get("warranty_months", 0) or 0) for data in rows]),
             "price_numeric": price_numeric,
-            "log_price": log_price,
-            "device_age_years": device_age_years,
-            "depreciation_rate": depreciation_rate,
-            "expected_value": expected_value,
-            "total_memory_score": total_memory_score,
-            "memory_ratio": memory_ratio,
-            "is_high_memory": is_high_memory,
-            "total_camera": total_camera,
-            "camera_quality": camera_quality,
-            "is_good_camera": is_good_camera,
-            "battery_avg": battery_avg,
-            "battery_score": battery_score,
-            "condition_score": condition_score,
-            "damage_penalty": damage_penalty,
-            "device_quality": device_quality,
-            "is_premium_brand": is_premium_brand,
-            "is_modern": is_modern,
-            "year_squared": year_squared,
-            "is_large_display": is_large_display,
-            "5g_premium": g5_premium,
-            "accessories_value": accessories_value,
-            "seller_reliability": seller_reliability,
-            "model_popularity": model_popularity,
-            "model_avg_resale": model_avg_resale,
-            "price_age_interaction": price_age_interaction,
-            "price_condition_interaction": price_condition_interaction,
-            "brand_encoded": self._encode_category("brand", brand),
-            "processor_encoded": self._encode_category("processor", data.get("processor", "Unknown")),
-            "display_type_encoded": self._encode_category("display_type", data.get("display_type", "LCD")),
-            "seller_type_encoded": self._encode_category("seller_type", seller_type),
-            "seller_location_encoded": self._encode_category("seller_location", data.get("seller_location", "Unknown")),
+            "device_age_years": np.maximum(0, current_year - launch_year) + months_ahead / 12,
+            "condition": [data.get("condition", "Good") for data in rows],
+            "accessories": [data.get("accessories", "") or "" for data in rows],
+            "seller_type": seller_type,
+            "brand": brand,
+            "model_popularity": column([popularity.get(name, 1) for name in model_names]),
+            # If the model name is unknown, fall back to a value based on its own launch
+            # price, not the global median. This is critical for new/premium phones.
+            "model_avg_resale": column([
+                avg_resale.get(name, price) for name, price in zip(model_names, price_numeric * 0.6)
+            ]),
         }
+        engineer_features(columns)
 
-        df = pd.DataFrame([processed])
-        for feature in self.feature_names:
-            if feature not in df.columns:
-                df[feature] = 0
-        df = df[self.feature_names]
-        df = df.replace([np.inf, -np.inf], 0)
-        df = df.fillna(0)
-
-        # Scale the features if a scaler is available
-        if self.scaler:
-            df_scaled = self.scaler.transform(df)
-            df = pd.DataFrame(df_scaled, columns=df.columns, index=df.index)
-
-        return df
+        columns["brand_encoded"] = self.vectorizer.encode_column("brand", brand)
+        columns["seller_type_encoded"] = self.vectorizer.encode_column("seller_type", [str(v) for v in seller_type])
+        for col, default in (("processor", "Unknown"), ("display_type", "LCD"), ("seller_location", "Unknown")):
+            columns[f"{col}_encoded"] = self.vectorizer.encode_column(
+                col, [str(data.get(col, default)) for data in rows]
+            )
+        return columns
 
     def predict(self, data):
-        if self.model is None:
-            raise ValueError("Smartphone model not loaded. Please train the model first.")
-
-        processed = self.preprocess_input(data)
-        # Predict the log-transformed price
-        predicted_log_price = self.model.predict(processed)[0]
+        return self.predict_many([data])[0]
 
-        # Inverse transform to get the actual price from the model
-        model_price = float(max(0, np.expm1(predicted_log_price)))
+    def predict_many(self, rows, use_cache=True):
+        """Predict a batch of inputs; cache misses share one scaler and model call."""
+        if not self.is_loaded:
+            raise ValueError("Smartphone model not loaded. Please train the model first.")
 
+        rows = [self.cache.normalize(row) for row in rows]
+        if not rows:
+            return []
+        # One snapshot for the whole call: the cache version and the
+        # features of every miss come from the same market prices
+        snapshot = self._market_snapshot()
+        if not use_cache:
+            return self._predict_uncached(rows, snapshot)
+        market_version = snapshot.overlay_version(min_observations()) if snapshot else None
+        if market_version != self._market_version:
+            # Cached prices were computed with other model stats
+            self._market_version = market_version
+            version = self.artifact_version()
+            self.cache.clear(version=f"{version}-market-{market_version}" if market_version else version)
+        return self.cache.resolve(rows, lambda misses: self._predict_uncached(misses, snapshot))
+
+    def _market_snapshot(self):
+        return market_index.snapshot("smartphone") if self.use_market_index else None
+
+    def model_stats(self, snapshot=None):
+        """``(model_popularity, model_avg_resale)``: the training stats, updated
+        with the live market index where it has enough prices for a model."""
+        if snapshot is None:
+            return self.stats.get("model_popularity", {}), self.stats.get("model_avg_resale", {})
+        return snapshot.overlay(self.stats, min_observations(), stats_version=self._stats_version)
+
+    def _predict_uncached(self, rows, snapshot):
+        processed = self.vectorizer.transform_columns(self._columns(rows, snapshot), len(rows))
+        # Predict the log-transformed prices
+        predicted_log_prices = self.backend.predict(processed)
+
+        return [
+            # Inverse transform to get the actual price from the model
+            self._build_result(data, float(max(0, np.expm1(predicted_log_price))))
+            for data, predicted_log_price in zip(rows, predicted_log_prices)
+        ]
+
+    def _build_result(self, data, model_price):
+        """Apply the business-rule floor and format a single prediction."""
         # Business-rule floor to avoid clearly unrealistic underpricing
         price_numeric = float(data.get("launch_price") or data.get("original_price") or 0)
 
         # Derive approximate device age from launch_year
         current_year = pd.Timestamp.now().year
         launch_year = int(data.get("launch_year", current_year) or current_year)
-        device_age_years = max(0, current_year - launch_year)
+        device_age_years = max(0, current_year - launch_year) + data.get("months_ahead", 0) / 12
 
         # Base minimum resale percentage by age (very rough but safe bounds)
         if device_age_years <= 1:
@@ -468,6 +650,14 @@ class SmartphonePricePredictor:
             },
         }
 
+    def artifact_version(self):
+        """Bundle version and checksum, or a fingerprint of the loose artifact files."""
+        if self.bundle is not None:
+            return f"{self.bundle.version}-{self.bundle.checksum[:8]}"
+        return artifact_fingerprint(
+            [os.path.join(self.models_dir, name) for name in self.artifact_files]
+        )
+
     def get_model_info(self):
         if not self.metadata:
             return None
@@ -478,16 +668,338 @@ class SmartphonePricePredictor:
             "rmse": self.metadata.get("rmse"),
             "n_features": self.metadata.get("n_features"),
             "n_samples": self.metadata.get("n_samples"),
+            "inference_backend": self.backend.name if self.backend else None,
+            "compiled_max_rows": getattr(self.backend, "max_rows", None),
         }
 
 
-try:
-    laptop_predictor = LaptopPricePredictor()
-except FileNotFoundError:
-    laptop_predictor = None
+class ModelRegistry:
+    """Process-wide, lazily loaded predictor instances.
+
+    Nothing is unpickled at import time: a predictor is built on first
+    ``get`` or by an explicit ``warmup``. When ``warmup`` runs in a
+    pre-forking master (gunicorn ``preload_app``), the loaded models are
+    inherited by every worker and shared copy-on-write.
+
+    Versions are hot-swapped: at most every ``RELOAD_CHECK_SECONDS`` a
+    request compares the loaded bundles with the CURRENT and SHADOW
+    pointers. A moved pointer is loaded on a background thread and swapped
+    in once ready, so no request waits for unpickling and requests already
+    running finish on the instance they started with. A SHADOW version is
+    scored on a sample of live batches by the ShadowScorer.
+    """
+
+    def __init__(self, factories):
+        self._factories = dict(factories)
+        self._instances = {}
+        self._shadows = {}
+        self._batchers = {}
+        self._executor = None
+        self._scorer = None
+        self._checked_at = {}
+        self._failed = {}
+        self._loading = set()
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        # A lock held by another thread at fork time would never be released,
+        # and loader threads don't survive the fork either
+        self._lock = threading.Lock()
+        self._loading = set()
+
+    @property
+    def names(self):
+        return list(self._factories)
+
+    def get_instance(self, name):
+        """Return the predictor for ``name``, loading it on first use."""
+        predictor = self._instances.get(name)
+        if predictor is None:
+            with self._lock:
+                predictor = self._instances.get(name)
+                if predictor is None:
+                    try:
+                        predictor = self._factories[name]()
+                    except FileNotFoundError:
+                        return None
+                    self._instances[name] = predictor
+        self._check_versions(name, predictor)
+        return predictor
+
+    def _check_versions(self, name, predictor):
+        interval = ml_setting("MODEL_REGISTRY", {}).get("RELOAD_CHECK_SECONDS", DEFAULT_RELOAD_CHECK_SECONDS)
+        if not interval or interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._checked_at.get(name, 0.0) < interval:
+            return
+        self._checked_at[name] = now
+
+        models_dir = predictor.models_dir
+        # Follow the pointers of the bundle actually served (e.g. laptop_compact)
+        bundle_name = predictor.bundle.name if predictor.bundle else name
+        try:
+            target = active_version(models_dir, bundle_name)
+            candidate = shadow_version(models_dir, bundle_name)
+        except OSError as exc:
+            print(f"⚠️  Warning: could not read {name} bundle pointers: {exc}")
+            return
+
+        loaded = predictor.bundle.version if predictor.bundle else None
+        if target is not None and target != loaded:
+            self._load_async(name, "active", target, models_dir)
+
+        if candidate == target:
+            candidate = None
+        shadow = self._shadows.get(name)
+        if candidate is None:
+            if shadow is not None:
+                self._shadows.pop(name, None)
+                print(f"✅ {name} shadow scoring stopped")
+        elif shadow is None or shadow.bundle.version != candidate:
+            self._load_async(name, "shadow", candidate, models_dir)
+
+    def _load_async(self, name, role, version, models_dir):
+        key = (name, role, version)
+        with self._lock:
+            if key in self._loading or self._failed.get((name, role)) == version:
+                return
+            self._loading.add(key)
+        threading.Thread(
+            target=self._load_version, args=(name, role, version, models_dir),
+            name=f"model-loader-{name}", daemon=True,
+        ).start()
+
+    def _load_version(self, name, role, version, models_dir):
+        try:
+            predictor = self._factories[name](models_dir=models_dir, version=version)
+        except Exception as exc:
+            print(f"⚠️  Warning: could not load {name} bundle {version} ({role}): {exc}")
+            with self._lock:
+                self._failed[(name, role)] = version
+                self._loading.discard((name, role, version))
+            return
+        self._install(name, role, predictor)
+
+    def _install(self, name, role, predictor):
+        with self._lock:
+            self._loading.discard((name, role, predictor.version))
+            if role == "active":
+                self._instances[name] = predictor
+            else:
+                self._shadows[name] = predictor
+        print(f"✅ {name} model {predictor.artifact_version()} {'now serving' if role == 'active' else 'shadow scoring'}")
+
+    def reload(self, name, version=None):
+        """Load ``version`` (default: the active one) now and swap it in.
+
+        Raises if the version cannot be loaded; the serving instance is
+        left untouched in that case. Polling follows CURRENT, so a version
+        other than the active one is replaced again at the next check.
+        """
+        current = self._instances.get(name)
+        models_dir = current.models_dir if current is not None else None
+        predictor = self._factories[name](models_dir=models_dir, version=version)
+        self._install(name, "active", predictor)
+        return predictor
+
+    def get(self, name):
+        """Return the loaded predictor for ``name``, or None if its artifacts are missing."""
+        predictor = self.get_instance(name)
+        if predictor is None or not predictor.is_loaded:
+            return None
+        return predictor
+
+    def is_loaded(self, name):
+        predictor = self._instances.get(name)
+        return predictor is not None and predictor.is_loaded
+
+    def warmup(self, names=None):
+        """Load the given (default: all) predictors now. Returns name -> loaded."""
+        return {name: self.get(name) is not None for name in (names or self.names)}
+
+    def batcher(self, name):
+        """Return the micro-batcher for ``name``, or None when batching is disabled."""
+        if not ml_setting("PREDICTION_BATCHING", {}).get("ENABLED", False):
+            return None
+        batcher = self._batchers.get(name)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(name)
+                if batcher is None:
+                    batcher = MicroBatcher(name, lambda rows: self.executor().run(name, rows))
+                    self._batchers[name] = batcher
+        return batcher
+
+    def executor(self):
+        """Return the shared InferenceExecutor, creating it on first use."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = InferenceExecutor(_run_inference)
+        return self._executor
+
+    def predict_local(self, name, rows, use_cache=True):
+        """Predict ``rows`` with this process's ``name`` predictor."""
+        predictor = self.get(name)
+        if predictor is None:
+            raise ValueError(f"{name.capitalize()} model not loaded. Please train the model first.")
+        results = predictor.predict_many(rows, use_cache=use_cache)
+        shadow = self._shadows.get(name)
+        if shadow is not None and shadow.is_loaded:
+            self.scorer().submit(name, rows, predictor, shadow)
+        return results
+
+    def scorer(self):
+        """Return the ShadowScorer, creating it on first use."""
+        if self._scorer is None:
+            with self._lock:
+                if self._scorer is None:
+                    self._scorer = ShadowScorer()
+        return self._scorer
+
+    def batching_stats(self):
+        return {name: batcher.stats() for name, batcher in self._batchers.items()}
+
+    def executor_stats(self):
+        return self._executor.stats() if self._executor else None
+
+    def rollout_stats(self):
+        """Serving and shadow versions per model plus shadow-scoring results."""
+        models = {}
+        for name in self.names:
+            predictor = self._instances.get(name)
+            shadow = self._shadows.get(name)
+            models[name] = {
+                "active": predictor.artifact_version() if predictor is not None else None,
+                "shadow": shadow.artifact_version() if shadow is not None else None,
+                "loading": sorted(version for n, _, version in self._loading if n == name),
+            }
+        return {
+            "models": models,
+            "shadow_scoring": self._scorer.stats() if self._scorer else None,
+        }
+
+    def reset(self, name=None):
+        """Forget loaded predictors so the next ``get`` reloads them."""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+                self._shadows.clear()
+                self._checked_at.clear()
+            else:
+                self._instances.pop(name, None)
+                self._shadows.pop(name, None)
+                self._checked_at.pop(name, None)
+
+
+registry = ModelRegistry({
+    "laptop": LaptopPricePredictor,
+    "smartphone": SmartphonePricePredictor,
+})
 
-try:
-    smartphone_predictor = SmartphonePricePredictor()
-except FileNotFoundError:
-    smartphone_predictor = None
+
+def get_laptop_predictor():
+    return registry.get("laptop")
+
+
+def get_smartphone_predictor():
+    return registry.get("smartphone")
+
+
+def _run_inference(name, rows, use_cache=True):
+    # Executor task; module-level so process pools can pickle it
+    return registry.predict_local(name, rows, use_cache=use_cache)
+
+
+def predict_many(name, rows, use_cache=True):
+    """Predict a batch of inputs on the inference executor.
+
+    Raises InferenceOverloaded when the executor is saturated and
+    PredictionTimeout when the result does not arrive in time. Bulk
+    callers pass ``use_cache=False`` so they don't evict interactive
+    cache entries.
+    """
+    return registry.executor().run(name, list(rows), use_cache=use_cache)
+
+
+async def apredict_many(name, rows):
+    """Async variant of ``predict_many``."""
+    return await registry.executor().arun(name, list(rows))
+
+
+def depreciation_curve(name, data, months):
+    """Price ``data`` at each future age in ``months`` and in every condition.
+
+    The whole grid goes through ``predict_many`` as one batch. Returns a
+    list of ``{"months_ahead", "prices": {condition: result}}`` entries.
+    """
+    predictor = registry.get(name)
+    if predictor is None:
+        raise ValueError(f"{name.capitalize()} model not loaded. Please train the model first.")
+    conditions = predictor.condition_choices
+    rows = [
+        {**data, "condition": condition, "months_ahead": months_ahead}
+        for months_ahead in months
+        for condition in conditions
+    ]
+    results = iter(predict_many(name, rows))
+    return [
+        {
+            "months_ahead": months_ahead,
+            "prices": {condition: next(results) for condition in conditions},
+        }
+        for months_ahead in months
+    ]
+
+
+def predict(name, data):
+    """Predict one input with the ``name`` model.
+
+    With PREDICTION_BATCHING enabled the request is queued and answered
+    together with concurrent requests in one vectorized call; raises
+    PredictionTimeout if that takes longer than the configured timeout.
+    """
+    batcher = registry.batcher(name)
+    if batcher is not None:
+        return batcher.predict(data)
+    return predict_many(name, [data])[0]
+
+
+async def apredict(name, data):
+    """Async variant of ``predict``."""
+    batcher = registry.batcher(name)
+    if batcher is not None:
+        return await batcher.apredict(data)
+    return (await apredict_many(name, [data]))[0]
+
+
+def warmup(freeze=False):
+    """Eagerly load every predictor.
+
+    With ``freeze=True`` the loaded objects are moved to the GC's permanent
+    generation so collections in forked workers don't write to (and copy)
+    the shared model pages.
+
+    No estimator is run here, so xgboost/OpenMP and joblib thread pools are
+    first created in the workers: bundle tree tables were verified when the
+    bundle was built, and other compiled tables are verified on their first
+    prediction (see CompiledBackend).
+    """
+    loaded = registry.warmup()
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    return loaded
+
+
+def __getattr__(name):
+    # Backwards compatibility for ``from .ml_service import laptop_predictor``
+    if name == "laptop_predictor":
+        return get_laptop_predictor()
+    if name == "smartphone_predictor":
+        return get_smartphone_predictor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
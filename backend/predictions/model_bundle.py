@@ -0,0 +1,413 @@
+"""
+Model Bundle
+Versioned, checksummed on-disk format for a trained price predictor
+
+Layout (under ``ml_models/bundles/<name>/``)::
+
+    CURRENT                  name of the active version
+    SHADOW                   optional candidate version scored in shadow
+    <version>/manifest.json  schema version, file checksums, tree metadata
+                             (incl. the tables' verified max difference)
+    <version>/model.pkl      the trained estimator (reference inference path)
+    <version>/artifacts.pkl  label encoders, feature names, metadata, stats
+    <version>/arrays/*.npy   scaler vectors and flattened tree node tables,
+                             loaded memory-mapped so workers share one copy
+
+Usage:
+    python -m predictions.model_bundle list
+    python -m predictions.model_bundle convert laptop smartphone
+    python -m predictions.model_bundle shadow laptop <version>
+    python -m predictions.model_bundle verify smartphone
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from .inference_backends import ReferenceBackend, TreeTableBackend, verify_backend
+from .tree_tables import export_tree_tables
+
+
+BUNDLE_SCHEMA_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+SHADOW_FILE = "SHADOW"
+MODEL_FILE = "model.pkl"
+ARTIFACTS_FILE = "artifacts.pkl"
+ARRAYS_DIR = "arrays"
+
+# Compact laptop serving model, versioned alongside the full one
+COMPACT_LAPTOP_BUNDLE = "laptop_compact"
+# Appended to the full version a compact bundle was derived from, so the
+# two never share a version string
+COMPACT_VERSION_SUFFIX = "-compact"
+BUNDLE_NAMES = ("laptop", COMPACT_LAPTOP_BUNDLE, "smartphone")
+
+# Loose-pickle names used before bundles existed (prefix is the model name)
+LEGACY_FILES = {
+    "model": "{name}_price_model.pkl",
+    "scaler": "{name}_scaler.pkl",
+    "label_encoders": "{name}_label_encoders.pkl",
+    "feature_names": "{name}_feature_names.pkl",
+    "metadata": "{name}_model_metadata.pkl",
+    "stats": "{name}_model_stats.pkl",
+}
+
+
+class BundleError(Exception):
+    """Raised when a bundle exists but cannot be used."""
+
+
+class BundleNotFound(BundleError):
+    """Raised when no bundle (or no active version) exists."""
+
+
+class ModelBundle:
+    """A loaded bundle version."""
+
+    def __init__(self, name, version, path, manifest, model, artifacts, arrays):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.manifest = manifest
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.scaler = artifacts.get("scaler")
+        self.label_encoders = artifacts.get("label_encoders") or {}
+        self.feature_names = artifacts.get("feature_names")
+        self.metadata = artifacts.get("metadata") or {}
+        self.stats = artifacts.get("stats")
+        self.arrays = arrays
+
+    @property
+    def model(self):
+        """The trained estimator, unpickled on first access if loaded without it."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    with open(os.path.join(self.path, MODEL_FILE), "rb") as f:
+                        self._model = pickle.load(f)
+        return self._model
+
+    @property
+    def model_loaded(self):
+        return self._model is not None
+
+    @property
+    def checksum(self):
+        return self.manifest["checksum"]
+
+    @property
+    def tree_meta(self):
+        return self.manifest.get("tree_tables")
+
+    def tree_tables(self):
+        """Flattened node arrays for the estimator, or None if not exported."""
+        if not self.tree_meta:
+            return None
+        return {key[len("tree_"):]: value for key, value in self.arrays.items() if key.startswith("tree_")}
+
+
+def bundle_root(models_dir, name):
+    return os.path.join(models_dir, "bundles", name)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_safe(metadata):
+    safe = {}
+    for key, value in (metadata or {}).items():
+        if isinstance(value, (np.integer, np.floating)):
+            value = value.item()
+        if isinstance(value, (str, int, float, bool, type(None))):
+            safe[key] = value
+    return safe
+
+
+def _read_pointer(models_dir, name, filename):
+    path = os.path.join(bundle_root(models_dir, name), filename)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+def _write_pointer(models_dir, name, filename, version, verify=True):
+    root = bundle_root(models_dir, name)
+    if not os.path.exists(os.path.join(root, version, MANIFEST_FILE)):
+        raise BundleNotFound(f"No {name} bundle version {version}")
+    if verify:
+        # Checked once here instead of by every process that loads it
+        verify_bundle(models_dir, name, version)
+    tmp_path = os.path.join(root, f".{filename}.{os.getpid()}")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, filename))
+
+
+def active_version(models_dir, name):
+    """Return the active version name, or None."""
+    return _read_pointer(models_dir, name, CURRENT_FILE)
+
+
+def set_active_version(models_dir, name, version, verify=True):
+    """Atomically point CURRENT at ``version`` once its checksums match."""
+    _write_pointer(models_dir, name, CURRENT_FILE, version, verify=verify)
+
+
+def shadow_version(models_dir, name):
+    """Return the version being shadow-scored, or None."""
+    return _read_pointer(models_dir, name, SHADOW_FILE)
+
+
+def set_shadow_version(models_dir, name, version):
+    """Atomically point SHADOW at ``version`` once its checksums match;
+    ``None`` stops shadow scoring."""
+    if version is None:
+        try:
+            os.remove(os.path.join(bundle_root(models_dir, name), SHADOW_FILE))
+        except FileNotFoundError:
+            pass
+        return
+    _write_pointer(models_dir, name, SHADOW_FILE, version)
+
+
+def _read_manifest(models_dir, name, version):
+    path = os.path.join(bundle_root(models_dir, name), version)
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise BundleNotFound(f"{name} bundle version {version} not found")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("schema_version") != BUNDLE_SCHEMA_VERSION:
+        raise BundleError(
+            f"{name} bundle {version} has schema version {manifest.get('schema_version')}, "
+            f"expected {BUNDLE_SCHEMA_VERSION}"
+        )
+    return path, manifest
+
+
+def verify_bundle(models_dir, name, version):
+    """Check every file of a bundle version against its manifest checksums.
+
+    Raises BundleError on a missing or modified file.
+    """
+    path, manifest = _read_manifest(models_dir, name, version)
+    for rel_path, expected in manifest["files"].items():
+        full_path = os.path.join(path, *rel_path.split("/"))
+        if not os.path.exists(full_path) or _sha256(full_path) != expected:
+            raise BundleError(f"{name} bundle {version}: checksum mismatch for {rel_path}")
+
+
+def list_versions(models_dir, name):
+    """All complete versions of ``name``, oldest first."""
+    root = bundle_root(models_dir, name)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        entry for entry in os.listdir(root)
+        if not entry.startswith(".") and os.path.exists(os.path.join(root, entry, MANIFEST_FILE))
+    )
+
+
+def save_bundle(models_dir, name, model, scaler, label_encoders, feature_names, metadata,
+                stats=None, version=None, activate=True):
+    """Write a new bundle version and (by default) make it active.
+
+    The version directory is written under a temporary name and renamed
+    into place, so readers never see a partial bundle.
+    """
+    root = bundle_root(models_dir, name)
+    os.makedirs(root, exist_ok=True)
+    version = version or time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    final_path = os.path.join(root, version)
+    if os.path.exists(final_path):
+        raise BundleError(f"{name} bundle version {version} already exists")
+
+    tmp_path = os.path.join(root, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(os.path.join(tmp_path, ARRAYS_DIR))
+    try:
+        with open(os.path.join(tmp_path, MODEL_FILE), "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        artifacts = {
+            "scaler": scaler,
+            "label_encoders": label_encoders,
+            "feature_names": list(feature_names),
+            "metadata": metadata,
+            "stats": stats,
+        }
+        with open(os.path.join(tmp_path, ARTIFACTS_FILE), "wb") as f:
+            pickle.dump(artifacts, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        arrays = {}
+        n_features = len(feature_names)
+        if scaler is not None:
+            with_mean = getattr(scaler, "with_mean", True) and scaler.mean_ is not None
+            with_std = getattr(scaler, "with_std", True) and scaler.scale_ is not None
+            arrays["scaler_mean"] = np.asarray(scaler.mean_ if with_mean else np.zeros(n_features), dtype=np.float64)
+            arrays["scaler_scale"] = np.asarray(scaler.scale_ if with_std else np.ones(n_features), dtype=np.float64)
+
+        try:
+            tree_meta, tables = export_tree_tables(model)
+            # Checked against the estimator here, once, so serving processes
+            # can trust the tables without running the estimator at load
+            tree_meta["verified_max_diff"] = verify_backend(
+                TreeTableBackend(tree_meta, tables), ReferenceBackend(model), n_features,
+            )
+        except ValueError as exc:
+            print(f"⚠️  Warning: {name} bundle stored without tree tables: {exc}")
+            tree_meta, tables = None, {}
+        for key, value in tables.items():
+            arrays[f"tree_{key}"] = value
+
+        for key, value in arrays.items():
+            np.save(os.path.join(tmp_path, ARRAYS_DIR, f"{key}.npy"), np.ascontiguousarray(value))
+
+        files = {}
+        for dirpath, _, filenames in os.walk(tmp_path):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(full_path, tmp_path).replace(os.sep, "/")
+                files[rel_path] = _sha256(full_path)
+        checksum = hashlib.sha256(
+            "".join(f"{path}:{files[path]};" for path in sorted(files)).encode()
+        ).hexdigest()
+
+        manifest = {
+            "schema_version": BUNDLE_SCHEMA_VERSION,
+            "name": name,
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "estimator": type(model).__name__,
+            "n_features": n_features,
+            "metadata": _json_safe(metadata),
+            "tree_tables": tree_meta,
+            "files": files,
+            "checksum": checksum,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(tmp_path, final_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    if activate:
+        # Checksums were computed from the files just written
+        set_active_version(models_dir, name, version, verify=False)
+    return final_path
+
+
+def load_bundle(models_dir, name, version=None, verify=False, mmap=True, load_model=True):
+    """Load a bundle version (default: the active one).
+
+    Arrays are memory-mapped read-only unless ``mmap`` is False. With
+    ``load_model=False`` the estimator is only unpickled on first access
+    of ``bundle.model``. Checksums are verified when a version is made
+    active or shadowed; pass ``verify`` to check every file again here.
+    """
+    version = version or active_version(models_dir, name)
+    if version is None:
+        raise BundleNotFound(f"No active {name} bundle in {bundle_root(models_dir, name)}")
+    path, manifest = _read_manifest(models_dir, name, version)
+    if verify:
+        verify_bundle(models_dir, name, version)
+
+    model = None
+    if load_model:
+        with open(os.path.join(path, MODEL_FILE), "rb") as f:
+            model = pickle.load(f)
+    with open(os.path.join(path, ARTIFACTS_FILE), "rb") as f:
+        artifacts = pickle.load(f)
+
+    arrays = {}
+    arrays_dir = os.path.join(path, ARRAYS_DIR)
+    for filename in sorted(os.listdir(arrays_dir)):
+        if filename.endswith(".npy"):
+            arrays[filename[:-4]] = np.load(os.path.join(arrays_dir, filename), mmap_mode="r" if mmap else None)
+
+    return ModelBundle(name, version, path, manifest, model, artifacts, arrays)
+
+
+def bundle_from_legacy(models_dir, name, activate=True):
+    """Package the loose ``<name>_*.pkl`` artifacts as a new bundle version."""
+    loaded = {}
+    for key, pattern in LEGACY_FILES.items():
+        path = os.path.join(models_dir, pattern.format(name=name))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                loaded[key] = pickle.load(f)
+    missing = [key for key in ("model", "label_encoders", "feature_names", "metadata") if key not in loaded]
+    if missing:
+        raise BundleNotFound(f"Missing legacy {name} artifacts: {', '.join(missing)}")
+    return save_bundle(
+        models_dir, name,
+        model=loaded["model"],
+        scaler=loaded.get("scaler"),
+        label_encoders=loaded["label_encoders"],
+        feature_names=loaded["feature_names"],
+        metadata=loaded["metadata"],
+        stats=loaded.get("stats"),
+        activate=activate,
+    )
+
+
+def main(argv=None):
+    default_dir = os.path.join(os.path.dirname(__file__), "ml_models")
+    parser = argparse.ArgumentParser(description="Manage versioned model bundles")
+    parser.add_argument("--models-dir", default=default_dir)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List bundle versions")
+    convert = sub.add_parser("convert", help="Build bundles from loose pickles")
+    convert.add_argument("names", nargs="+", choices=["laptop", "smartphone"])
+    activate = sub.add_parser("activate", help="Make a version active")
+    activate.add_argument("name", choices=BUNDLE_NAMES)
+    activate.add_argument("version")
+    verify = sub.add_parser("verify", help="Check a version's files against its checksums")
+    verify.add_argument("name", choices=BUNDLE_NAMES)
+    verify.add_argument("version", nargs="?", help="Version to check (default: the active one)")
+    shadow = sub.add_parser("shadow", help="Shadow-score a candidate version on live traffic")
+    shadow.add_argument("name", choices=BUNDLE_NAMES)
+    shadow.add_argument("version", nargs="?", help="Version to score (omit to stop shadow scoring)")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name in BUNDLE_NAMES:
+            current = active_version(args.models_dir, name)
+            candidate = shadow_version(args.models_dir, name)
+            for version in list_versions(args.models_dir, name):
+                marker = "*" if version == current else "~" if version == candidate else " "
+                print(f"{marker} {name} {version}")
+    elif args.command == "convert":
+        for name in args.names:
+            print(f"[INFO] Wrote {bundle_from_legacy(args.models_dir, name)}")
+    elif args.command == "activate":
+        set_active_version(args.models_dir, args.name, args.version)
+        print(f"[INFO] {args.name} -> {args.version}")
+    elif args.command == "verify":
+        version = args.version or active_version(args.models_dir, args.name)
+        if version is None:
+            raise BundleNotFound(f"No active {args.name} bundle")
+        verify_bundle(args.models_dir, args.name, version)
+        print(f"[INFO] {args.name} {version}: checksums OK")
+    elif args.command == "shadow":
+        set_shadow_version(args.models_dir, args.name, args.version)
+        print(f"[INFO] {args.name} shadow -> {args.version or 'off'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Model Compaction
+Smaller serving variants of a trained forest within an accuracy budget
+
+Two kinds of candidate are built from a trained RandomForest:
+
+* pruned:    the first ``k`` trees of the forest. Forest trees are fit
+             independently, so any prefix is an unbiased smaller forest.
+* distilled: a shallow gradient-boosted model fit to the forest's own
+             predictions on the training rows (soft targets).
+
+The smallest candidate whose test MAE is within ``budget`` of the full
+model's is kept. Every candidate is timed through the serving backend.
+"""
+
+import copy
+import os
+import pickle
+import time
+import warnings
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+
+from .inference_backends import build_backend
+from .model_bundle import COMPACT_LAPTOP_BUNDLE, COMPACT_VERSION_SUFFIX, save_bundle
+
+
+DEFAULT_BUDGET = 0.05
+PRUNED_TREE_COUNTS = (10, 20, 30, 50, 70)
+# (n_estimators, max_depth) of the distilled gradient-boosted models
+DISTILLED_SHAPES = ((100, 4), (200, 6), (300, 8))
+LATENCY_BATCH_ROWS = 256
+LATENCY_REPEATS = 20
+
+
+def model_size_mb(model):
+    """Pickled size of ``model`` in MB."""
+    return round(len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / (1024 * 1024), 3)
+
+
+def measure_latency(model, X, repeats=LATENCY_REPEATS, batch_rows=LATENCY_BATCH_ROWS):
+    """Median single-row and per-batch latency (ms) on the serving backend."""
+    X = np.asarray(X)
+    backend = build_backend(model, X.shape[1], label="Candidate")
+    batch = X[:batch_rows]
+
+    def median_ms(rows):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            backend.predict(rows)
+            timings.append((time.perf_counter() - start) * 1000)
+        return round(float(np.median(timings)), 4)
+
+    return {
+        "backend": backend.name,
+        "single_ms": median_ms(X[:1]),
+        "batch_ms": median_ms(batch),
+        "batch_rows": len(batch),
+    }
+
+
+def prune_forest(model, n_trees):
+    """Copy of a fitted forest keeping only its first ``n_trees`` trees."""
+    pruned = copy.copy(model)
+    pruned.estimators_ = model.estimators_[:n_trees]
+    pruned.n_estimators = len(pruned.estimators_)
+    return pruned
+
+
+def distill(teacher, X_train, n_estimators, max_depth, random_state=42):
+    """Fit a gradient-boosted student on ``teacher``'s predictions for ``X_train``."""
+    from xgboost import XGBRegressor
+
+    student = XGBRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, learning_rate=0.1,
+        subsample=0.8, random_state=random_state, n_jobs=-1,
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        student.fit(X_train, teacher.predict(X_train))
+    return student
+
+
+def _candidates(model, X_train, tree_counts, distilled_shapes):
+    n_trees = len(getattr(model, "estimators_", []))
+    for count in tree_counts:
+        if count < n_trees:
+            yield f"pruned-{count}", "pruned", prune_forest(model, count)
+    for n_estimators, max_depth in distilled_shapes:
+        try:
+            student = distill(model, X_train, n_estimators, max_depth)
+        except ImportError:
+            print("⚠️  xgboost not installed, skipping distilled candidates")
+            return
+        yield f"distilled-{n_estimators}x{max_depth}", "distilled", student
+
+
+def _evaluate(label, kind, model, X_test, y_test, full_mae):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        predictions = np.asarray(model.predict(X_test), dtype=np.float64)
+    mae = float(mean_absolute_error(y_test, predictions))
+    return {
+        "candidate": label,
+        "kind": kind,
+        "size_mb": model_size_mb(model),
+        "mae": mae,
+        "mae_increase_pct": round((mae / full_mae - 1) * 100, 3) if full_mae else 0.0,
+        **measure_latency(model, X_test),
+    }
+
+
+def compact_model(model, X_train, X_test, y_test, budget=DEFAULT_BUDGET,
+                  tree_counts=PRUNED_TREE_COUNTS, distilled_shapes=DISTILLED_SHAPES):
+    """Pick the smallest candidate whose test MAE is at most ``budget`` worse.
+
+    Returns ``(compact_model or None, report)`` where ``report`` lists the
+    full model first, then every candidate, each marked ``within_budget``.
+    """
+    X_train = np.asarray(X_train)
+    X_test = np.asarray(X_test)
+    y_test = np.asarray(y_test, dtype=np.float64)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        full_mae = float(mean_absolute_error(y_test, model.predict(X_test)))
+    report = [{**_evaluate("full", "full", model, X_test, y_test, full_mae), "within_budget": True}]
+
+    best, best_entry = None, None
+    for label, kind, candidate in _candidates(model, X_train, tree_counts, distilled_shapes):
+        entry = _evaluate(label, kind, candidate, X_test, y_test, full_mae)
+        entry["within_budget"] = entry["mae"] <= full_mae * (1 + budget)
+        report.append(entry)
+        if entry["within_budget"] and (best_entry is None or entry["size_mb"] < best_entry["size_mb"]):
+            best, best_entry = candidate, entry
+
+    for entry in report:
+        entry["selected"] = entry is best_entry
+    return best, report
+
+
+def save_compact_bundle(models_dir, full_path, model, report, scaler, label_encoders, feature_names,
+                        metadata, budget):
+    """Save the selected compact ``model`` as the ``laptop_compact`` version
+    derived from the full bundle at ``full_path``; returns its path."""
+    full_version = os.path.basename(full_path)
+    selected = next(entry for entry in report if entry["selected"])
+    return save_bundle(
+        models_dir, COMPACT_LAPTOP_BUNDLE,
+        model=model,
+        scaler=scaler,
+        label_encoders=label_encoders,
+        feature_names=feature_names,
+        metadata={
+            **metadata,
+            "mae": selected["mae"],
+            "full_mae": report[0]["mae"],
+            "full_version": full_version,
+            "compaction": selected["candidate"],
+            "compaction_budget": budget,
+            "size_mb": selected["size_mb"],
+            "full_size_mb": report[0]["size_mb"],
+        },
+        version=f"{full_version}{COMPACT_VERSION_SUFFIX}",
+    )
+
+
+def print_report(report, budget):
+    print(f"\n{'Candidate':<20}{'Size':>11}{'1 row':>11}{'Batch':>11}{'MAE':>14}{'ΔMAE':>9}")
+    for entry in report:
+        marker = "*" if entry.get("selected") else " " if entry["within_budget"] else "x"
+        print(
+            f"{marker} {entry['candidate']:<18}{entry['size_mb']:>8.2f} MB"
+            f"{entry['single_ms']:>8.2f} ms{entry['batch_ms']:>8.2f} ms"
+            f"  ₹{entry['mae']:>10,.2f}{entry['mae_increase_pct']:>+8.2f}%"
+        )
+    print(f"  (* selected, x over the {budget * 100:g}% MAE budget; batch = {report[0]['batch_rows']} rows)")
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -232,12 +233,25 @@ class Listing(models.Model):
     
     # Metadata
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    sold_at = models.DateTimeField(
+        null=True, blank=True, db_index=True,
+        help_text="When the listing was first marked sold; later edits keep it"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Listing: {self.seller.email} - {self.device_type} - {self.expected_price}"
 
+    def save(self, *args, **kwargs):
+        # The market index and retraining read sales by sold_at, so it is
+        # set once and a re-saved sold listing isn't counted again
+        if self.status == 'sold' and self.sold_at is None:
+            self.sold_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'sold_at'}
+        super().save(*args, **kwargs)
+
 
 class Conversation(models.Model):
     """Model to store conversations between buyers and sellers"""
@@ -425,3 +439,127 @@ class ModerationAction(models.Model):
     def __str__(self):
         return f"{self.moderator.email if self.moderator else 'System'} - {self.get_action_type_display()} - Listing #{self.listing.id}"
 
+
+
+class RepricingJob(models.Model):
+    """Background job that prices an uploaded CSV of devices"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    DEVICE_TYPE_CHOICES = [
+        ('smartphone', 'Smartphone'),
+        ('laptop', 'Laptop'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='repricing_jobs'
+    )
+    device_type = models.CharField(max_length=20, choices=DEVICE_TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    
+    # Files live on local disk under settings.REPRICING_JOBS['DIR']
+    original_filename = models.CharField(max_length=255, blank=True)
+    input_path = models.CharField(max_length=500)
+    output_path = models.CharField(max_length=500, blank=True)
+    
+    # Progress
+    total_rows = models.IntegerField(default=0, help_text="Estimated from the line count")
+    processed_rows = models.IntegerField(default=0)
+    priced_rows = models.IntegerField(default=0)
+    failed_rows = models.IntegerField(default=0)
+    output_bytes = models.BigIntegerField(default=0, help_text="Output CSV size after the last recorded chunk")
+    error_message = models.TextField(blank=True)
+    
+    # Process ("host:pid") the job is queued on or running in, and its last sign of life
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'repricing_jobs'
+        verbose_name = 'Repricing Job'
+        verbose_name_plural = 'Repricing Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status']),
+        ]
+    
+    def __str__(self):
+        return f"Repricing #{self.id} ({self.device_type}) - {self.status}"
+    
+    @property
+    def progress_percent(self):
+        if self.status == 'completed':
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(100.0, self.processed_rows * 100 / self.total_rows), 1)
+
+
+class MarketPriceAggregate(models.Model):
+    """Resale prices seen for one device model in one calendar month (market index)"""
+
+    DEVICE_TYPE_CHOICES = Listing.DEVICE_TYPE_CHOICES
+
+    device_type = models.CharField(max_length=20, choices=DEVICE_TYPE_CHOICES)
+    model_name = models.CharField(max_length=200)
+    period = models.DateField(help_text="First day of the month")
+
+    count = models.IntegerField(default=0)
+    price_sum = models.FloatField(default=0)
+    price_min = models.FloatField(null=True, blank=True)
+    price_max = models.FloatField(null=True, blank=True)
+
+    # Quantiles read from the sketch, kept as columns for reporting
+    median = models.FloatField(null=True, blank=True)
+    p10 = models.FloatField(null=True, blank=True)
+    p25 = models.FloatField(null=True, blank=True)
+    p75 = models.FloatField(null=True, blank=True)
+    p90 = models.FloatField(null=True, blank=True)
+    sketch = models.JSONField(default=dict, help_text="Mergeable log-bucketed quantile sketch")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'market_price_aggregates'
+        verbose_name = 'Market Price Aggregate'
+        verbose_name_plural = 'Market Price Aggregates'
+        ordering = ['device_type', 'model_name', '-period']
+        constraints = [
+            models.UniqueConstraint(fields=['device_type', 'model_name', 'period'], name='unique_market_aggregate'),
+        ]
+        indexes = [
+            models.Index(fields=['device_type', 'period']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.period:%Y-%m}: {self.count} prices, median ₹{self.median}"
+
+    @property
+    def mean(self):
+        return self.price_sum / self.count if self.count else None
+
+
+class MarketIndexCursor(models.Model):
+    """How far the market index has consumed one source of prices"""
+    source = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'market_index_cursors'
+
+    def __str__(self):
+        return f"{self.source}: id {self.last_id}, updated {self.last_updated}"
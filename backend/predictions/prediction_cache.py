@@ -0,0 +1,224 @@
+"""
+Prediction Cache
+Memoizes price predictions keyed on the normalized device specs
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from .ml_config import ml_setting
+
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600
+
+
+def artifact_fingerprint(paths):
+    """Short hash of the name, size and mtime of each existing artifact."""
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def _json_default(value):
+    # Keep Decimal distinct from float: the predictors treat them differently
+    if isinstance(value, Decimal):
+        return f"Decimal:{value.normalize()}"
+    return f"{type(value).__name__}:{value}"
+
+
+def _key_value(value):
+    # 4, 4.0 and Decimal("4") of a normalized numeric field predict the same
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+class PredictionCache:
+    """Bounded LRU/TTL cache of prediction results.
+
+    Keys are a SHA-1 of the predictor's input fields (in a fixed order,
+    after ``normalize``) plus the fingerprint of the loaded artifacts, so
+    reloading a model never serves results from the previous one. An
+    optional shared tier in the Django cache lets workers reuse each
+    other's results.
+    """
+
+    def __init__(self, namespace, input_fields, max_entries=None, ttl_seconds=None, use_shared_cache=None,
+                 numeric_fields=()):
+        config = ml_setting("PREDICTION_CACHE", {})
+        self.namespace = namespace
+        self.input_fields = tuple(input_fields)
+        self.numeric_fields = frozenset(numeric_fields)
+        # field -> {case-folded spelling: training spelling}, set with the version
+        self.vocabulary = {}
+        self.max_entries = config.get("MAX_ENTRIES", DEFAULT_MAX_ENTRIES) if max_entries is None else max_entries
+        self.ttl_seconds = config.get("TTL_SECONDS", DEFAULT_TTL_SECONDS) if ttl_seconds is None else ttl_seconds
+        self.use_shared_cache = (
+            config.get("USE_SHARED_CACHE", False) if use_shared_cache is None else use_shared_cache
+        )
+        self.version = ""
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def normalize(self, data):
+        """Copy of one input in the form the predictor sees and the key hashes.
+
+        Strings are stripped and their whitespace collapsed; a category
+        spelled like a training value up to case becomes that value.
+        Numeric fields given as strings or Decimals become floats.
+        Predictors normalize every input, so inputs with the same key
+        always get the same prediction.
+        """
+        row = dict(data)
+        for field in self.input_fields:
+            value = row.get(field)
+            if isinstance(value, str):
+                value = " ".join(value.split())
+                if field in self.numeric_fields:
+                    try:
+                        value = float(value) if value else value
+                    except ValueError:
+                        pass
+                if isinstance(value, str):
+                    value = self.vocabulary.get(field, {}).get(value.casefold(), value)
+                row[field] = value
+            elif isinstance(value, Decimal) and field in self.numeric_fields:
+                row[field] = float(value)
+        return row
+
+    def make_key(self, data):
+        """Canonical cache key for one input."""
+        return self._key(self.normalize(data))
+
+    def _key(self, row):
+        payload = [[field, _key_value(row[field])] for field in self.input_fields if field in row]
+        raw = json.dumps(payload, separators=(",", ":"), default=_json_default)
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f"prediction:{self.namespace}:{self.version}:{digest}"
+
+    def clear(self, version=None, vocabulary=None):
+        """Drop all local entries, optionally switching to a new artifact
+        version (and the category ``vocabulary`` of its training data)."""
+        with self._lock:
+            self._entries.clear()
+            if version is not None:
+                self.version = version
+            if vocabulary is not None:
+                self.vocabulary = {
+                    field: {str(value).casefold(): value for value in values}
+                    for field, values in vocabulary.items()
+                }
+
+    def _get_local(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _set_local(self, key, result, now):
+        self._entries[key] = (now + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def resolve(self, rows, compute):
+        """Return results for ``rows``, calling ``compute`` once for the misses.
+
+        ``rows`` must already be normalized (see ``normalize``). ``compute``
+        receives the list of uncached rows and must return their results in
+        the same order.
+        """
+        if not self.enabled:
+            return compute(rows)
+
+        keys = [self._key(row) for row in rows]
+        results = [None] * len(rows)
+        now = time.monotonic()
+        with self._lock:
+            for idx, key in enumerate(keys):
+                results[idx] = self._get_local(key, now)
+
+        missing = [idx for idx, result in enumerate(results) if result is None]
+        shared_found = {}
+        shared_rows = 0
+        if missing and self.use_shared_cache:
+            shared_found = self._get_shared(list(dict.fromkeys(keys[idx] for idx in missing)))
+            for idx in missing:
+                results[idx] = shared_found.get(keys[idx])
+            still_missing = [idx for idx in missing if results[idx] is None]
+            # Counted per row served, duplicates included
+            shared_rows = len(missing) - len(still_missing)
+            missing = still_missing
+
+        computed = {}
+        if missing:
+            for idx, result in zip(missing, compute([rows[idx] for idx in missing])):
+                results[idx] = result
+                computed[keys[idx]] = result
+            if self.use_shared_cache:
+                self._set_shared(computed)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.shared_hits += shared_rows
+            self.hits += len(rows) - len(missing) - shared_rows
+            for key, result in {**shared_found, **computed}.items():
+                self._set_local(key, result, now)
+
+        return [copy.deepcopy(result) for result in results]
+
+    def _get_shared(self, keys):
+        from django.core.cache import cache
+
+        try:
+            return cache.get_many(keys)
+        except Exception:
+            # The shared tier is best-effort; fall back to computing
+            return {}
+
+    def _set_shared(self, results):
+        from django.core.cache import cache
+
+        try:
+            cache.set_many(results, timeout=self.ttl_seconds)
+        except Exception:
+            pass
+
+    def stats(self):
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "shared_cache": self.use_shared_cache,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            }
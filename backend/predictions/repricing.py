@@ -0,0 +1,336 @@
+"""
+Bulk Repricing Jobs
+Streams an uploaded device CSV through the price models in chunks
+
+Jobs run on a small per-process thread pool (MAX_WORKERS); the rest wait
+in 'queued'. Each job records the process it belongs to and, per chunk,
+its progress and the output size, so a job whose process died can be
+resumed after its last recorded chunk (``manage.py resume_repricing_jobs``).
+Chunks are priced on the shared inference executor, so bulk jobs and
+interactive requests share one bound on concurrent model calls.
+"""
+
+import csv
+import itertools
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .inference_executor import InferenceOverloaded
+from .ml_service import predict_many, registry
+from .models import RepricingJob
+from .serializers import LaptopPredictionInputSerializer, SmartphonePredictionInputSerializer
+
+
+INPUT_SERIALIZERS = {
+    'laptop': LaptopPredictionInputSerializer,
+    'smartphone': SmartphonePredictionInputSerializer,
+}
+RESULT_COLUMNS = ['predicted_price', 'price_min', 'price_max', 'confidence_score', 'error']
+ACTIVE_STATUSES = ('queued', 'running')
+# A chunk waits this long for a free inference slot before the job fails
+OVERLOAD_RETRY_SECONDS = 30.0
+OVERLOAD_BACKOFF_SECONDS = 0.5
+# Spreadsheet apps evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def job_settings():
+    config = getattr(settings, 'REPRICING_JOBS', {})
+    return {
+        'DIR': config.get('DIR', os.path.join(settings.MEDIA_ROOT, 'repricing')),
+        'CHUNK_ROWS': config.get('CHUNK_ROWS', 1000),
+        'MAX_UPLOAD_MB': config.get('MAX_UPLOAD_MB', 50),
+        'MAX_WORKERS': config.get('MAX_WORKERS', 1),
+        'MAX_ACTIVE_PER_USER': config.get('MAX_ACTIVE_PER_USER', 2),
+        'ORPHAN_SECONDS': config.get('ORPHAN_SECONDS', 900),
+    }
+
+
+def worker_id():
+    """Identifies this process in ``RepricingJob.worker``."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def active_jobs(user):
+    """Jobs of ``user`` that are queued or running."""
+    return RepricingJob.objects.filter(user=user, status__in=ACTIVE_STATUSES).count()
+
+
+def job_dir(job_id):
+    return os.path.join(job_settings()['DIR'], str(job_id))
+
+
+def save_upload(upload, path):
+    """Write an uploaded file to ``path`` chunk by chunk."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+
+
+def count_rows(path):
+    """Data rows in a CSV file, counted without loading it (quoted newlines overcount)."""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(0, lines - 1)
+
+
+def _clean_row(row):
+    # Empty cells mean "not provided" so optional fields fall back to their defaults
+    return {
+        key.strip(): value.strip()
+        for key, value in row.items()
+        if key and value is not None and value.strip() != ''
+    }
+
+
+def _format_errors(errors):
+    return '; '.join(
+        f"{field}: {' '.join(str(message) for message in messages)}"
+        for field, messages in errors.items()
+    )
+
+
+def _escape_cell(value):
+    # Quote formula-like text so the priced CSV is safe to open in a spreadsheet
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _output_row(row, result):
+    return {key: _escape_cell(value) for key, value in {**row, **result}.items()}
+
+
+def _chunks(reader, size):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _predict_chunk(name, rows):
+    """Price ``rows`` on the shared inference executor (bounded with the
+    interactive requests), waiting for a free slot while it is saturated."""
+    deadline = time.monotonic() + OVERLOAD_RETRY_SECONDS
+    while True:
+        try:
+            return predict_many(name, rows, use_cache=False)
+        except InferenceOverloaded:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(OVERLOAD_BACKOFF_SECONDS)
+
+
+def price_chunk(name, serializer_class, rows):
+    """Validate and price one chunk of ``name`` devices; returns one result
+    dict per input row."""
+    results = [None] * len(rows)
+    valid_indexes, valid_data = [], []
+    for idx, row in enumerate(rows):
+        serializer = serializer_class(data=_clean_row(row))
+        if serializer.is_valid():
+            valid_indexes.append(idx)
+            valid_data.append(serializer.validated_data)
+        else:
+            results[idx] = {'error': _format_errors(serializer.errors)}
+
+    if valid_data:
+        # One vectorized model call for every valid row of the chunk
+        for idx, prediction in zip(valid_indexes, _predict_chunk(name, valid_data)):
+            results[idx] = {
+                'predicted_price': prediction['predicted_price'],
+                'price_min': prediction['price_range']['min'],
+                'price_max': prediction['price_range']['max'],
+                'confidence_score': prediction['confidence_score'],
+            }
+    return results
+
+
+def run_job(job_id, worker):
+    """Price the job's input CSV from its last recorded chunk on, appending to the output CSV.
+
+    Runs only while the job belongs to ``worker``: a job taken over by
+    ``recover_jobs`` in the meantime is left to its new owner.
+    """
+    close_old_connections()
+    try:
+        claimed = RepricingJob.objects.filter(pk=job_id, status='queued', worker=worker).update(
+            status='running', heartbeat_at=timezone.now(),
+        )
+        if claimed:
+            _run(RepricingJob.objects.get(pk=job_id), worker)
+    finally:
+        connection.close()
+
+
+def _run(job, worker):
+    owned = RepricingJob.objects.filter(pk=job.id, worker=worker)
+    try:
+        if registry.get(job.device_type) is None:
+            raise ValueError(f'{job.get_device_type_display()} model not loaded')
+        serializer_class = INPUT_SERIALIZERS[job.device_type]
+        chunk_rows = job_settings()['CHUNK_ROWS']
+
+        output_path = job.output_path or os.path.join(job_dir(job.id), 'priced.csv')
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        resume = job.processed_rows > 0 and os.path.exists(output_path)
+        if not resume:
+            job.started_at = timezone.now()
+            job.total_rows = count_rows(job.input_path)
+            job.processed_rows = job.priced_rows = job.failed_rows = 0
+        job.output_path = output_path
+        job.save(update_fields=['started_at', 'output_path', 'total_rows', 'processed_rows', 'priced_rows', 'failed_rows'])
+
+        processed, priced, failed = job.processed_rows, job.priced_rows, job.failed_rows
+        with open(job.input_path, newline='', encoding='utf-8-sig') as src, \
+                open(output_path, 'r+' if resume else 'w', newline='', encoding='utf-8') as dst:
+            reader = csv.DictReader(src)
+            if not reader.fieldnames:
+                raise ValueError('The uploaded CSV has no header row')
+            fieldnames = list(reader.fieldnames) + [col for col in RESULT_COLUMNS if col not in reader.fieldnames]
+            writer = csv.DictWriter(dst, fieldnames=fieldnames, extrasaction='ignore')
+            if resume:
+                # Rows written after the last recorded chunk are priced again
+                dst.seek(job.output_bytes)
+                dst.truncate()
+                for _ in itertools.islice(reader, processed):
+                    pass
+            else:
+                writer.writeheader()
+
+            for chunk in _chunks(reader, chunk_rows):
+                results = price_chunk(job.device_type, serializer_class, chunk)
+                writer.writerows(_output_row(row, result) for row, result in zip(chunk, results))
+                dst.flush()
+                processed += len(chunk)
+                failed += sum(1 for result in results if 'error' in result)
+                priced = processed - failed
+                if not owned.update(
+                    processed_rows=processed, priced_rows=priced, failed_rows=failed,
+                    output_bytes=dst.tell(), heartbeat_at=timezone.now(),
+                ):
+                    # Taken over by recover_jobs; the new owner resumes it
+                    return
+
+        owned.update(
+            status='completed', processed_rows=processed, priced_rows=priced, failed_rows=failed,
+            total_rows=processed, finished_at=timezone.now(), heartbeat_at=timezone.now(),
+        )
+    except Exception as exc:
+        owned.update(status='failed', error_message=str(exc), finished_at=timezone.now())
+
+
+class JobRunner:
+    """Bounded pool of repricing threads in this process.
+
+    At most MAX_WORKERS jobs price at once, so uploads can't crowd out the
+    request threads; later jobs stay 'queued' until a thread frees up.
+    """
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # Pool threads do not survive a fork; start a fresh pool lazily
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=max(1, job_settings()['MAX_WORKERS']), thread_name_prefix='repricing',
+                    )
+        return self._pool
+
+    def submit(self, job_id):
+        """Queue ``job_id`` on this process and return its future."""
+        worker = worker_id()
+        RepricingJob.objects.filter(pk=job_id).update(status='queued', worker=worker, heartbeat_at=timezone.now())
+        return self._executor().submit(run_job, job_id, worker)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+runner = JobRunner()
+
+
+def start_job(job):
+    """Queue ``job`` on this process's repricing pool."""
+    return runner.submit(job.id)
+
+
+def _process_gone(worker):
+    host, _, pid = worker.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def orphaned_jobs(orphan_seconds=None):
+    """Queued or running jobs whose process is gone.
+
+    A job is orphaned when its process on this host no longer exists, or
+    when it recorded no progress for ORPHAN_SECONDS (e.g. its process ran
+    on another host).
+    """
+    if orphan_seconds is None:
+        orphan_seconds = job_settings()['ORPHAN_SECONDS']
+    cutoff = timezone.now() - timedelta(seconds=orphan_seconds)
+    return [
+        job for job in RepricingJob.objects.filter(status__in=ACTIVE_STATUSES).order_by('created_at')
+        if job.worker != worker_id() and (
+            _process_gone(job.worker) or job.heartbeat_at is None or job.heartbeat_at < cutoff
+        )
+    ]
+
+
+def recover_jobs(orphan_seconds=None, resume=True):
+    """Resume (or with ``resume=False`` fail) orphaned jobs on this process.
+
+    Returns ``(job, future)`` pairs; the future is None for failed jobs.
+    """
+    recovered = []
+    for job in orphaned_jobs(orphan_seconds):
+        # Only take over the job if nobody else did since it was read
+        unchanged = RepricingJob.objects.filter(pk=job.id, worker=job.worker, status=job.status)
+        if resume:
+            if unchanged.update(worker=worker_id()):
+                recovered.append((job, runner.submit(job.id)))
+        elif unchanged.update(
+            status='failed', error_message='Interrupted: its worker process stopped', finished_at=timezone.now(),
+        ):
+            recovered.append((job, None))
+    return recovered
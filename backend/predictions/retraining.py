@@ -0,0 +1,302 @@
+"""
+Incremental Retraining
+Continues training the active price models on ground truth collected since
+the last run: sold listings (their agreed price) and saved predictions
+
+The laptop forest is always extended from the full bundle; when a compact
+laptop bundle exists it is rebuilt from the new full version.
+"""
+
+import copy
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ml_service import LaptopPricePredictor, SmartphonePricePredictor
+from .model_bundle import COMPACT_LAPTOP_BUNDLE, active_version, load_bundle, save_bundle
+from .model_compaction import DEFAULT_BUDGET, compact_model, save_compact_bundle
+from .models import LaptopPrediction, Listing, SmartphonePrediction
+
+
+DEFAULT_ROUNDS = 100
+DEFAULT_HOLDOUT_FRACTION = 0.2
+DEFAULT_MIN_ROWS = 50
+DEFAULT_PREDICTION_WEIGHT = 0.25
+DEFAULT_MAX_REGRESSION = 0.02
+DEFAULT_CHUNK_ROWS = 2000
+
+# Predictor input key -> prediction model field
+LAPTOP_FIELDS = {
+    'brand': 'brand', 'model': 'model', 'launch_year': 'launch_year',
+    'launch_price': 'launch_price', 'processor': 'processor', 'ram': 'ram',
+    'storage_type': 'storage_type', 'storage_size': 'storage_size', 'gpu': 'gpu',
+    'screen_size': 'screen_size', 'battery_cycle_count': 'battery_cycle_count',
+    'condition': 'condition', 'warranty_remaining': 'warranty_remaining',
+    'seller_location': 'seller_location',
+}
+SMARTPHONE_FIELDS = {
+    'brand': 'brand', 'model': 'model', 'launch_year': 'launch_year',
+    'launch_price': 'launch_price', 'processor': 'processor', 'ram_gb': 'ram',
+    'storage_gb': 'storage', 'battery_percentage': 'battery_capacity',
+    'display_size_inch': 'screen_size', 'camera_rear_mp': 'camera_mp',
+    'camera_front_mp': 'camera_front_mp', 'display_type': 'display_type',
+    'supports_5g': 'supports_5g', 'condition': 'condition',
+    'warranty_months': 'warranty_remaining', 'battery_health': 'battery_health',
+    'seller_location': 'seller_location', 'seller_type': 'seller_type',
+    'accessories': 'accessories', 'screen_cracked': 'screen_cracked',
+    'body_damage': 'body_damage',
+}
+
+SOURCES = {
+    'laptop': {
+        'predictor': LaptopPricePredictor,
+        # Retrain the full forest even where the compact model is served
+        'predictor_options': {'variant': 'full'},
+        'compact_bundle': COMPACT_LAPTOP_BUNDLE,
+        'prediction_model': LaptopPrediction,
+        'listing_relation': 'laptop_prediction',
+        'fields': LAPTOP_FIELDS,
+        'log_target': False,
+    },
+    'smartphone': {
+        'predictor': SmartphonePricePredictor,
+        # The training-time stats the base model was fit with, not live prices
+        'predictor_options': {'use_market_index': False},
+        'compact_bundle': None,
+        'prediction_model': SmartphonePrediction,
+        'listing_relation': 'smartphone_prediction',
+        'fields': SMARTPHONE_FIELDS,
+        'log_target': True,
+    },
+}
+
+
+class RetrainingError(Exception):
+    """Raised when a model cannot be retrained (no bundle, too little data)."""
+
+
+def _iter_rows(queryset, fields, prefix, label_field, chunk_rows):
+    values = [f"{prefix}{field}" for field in fields.values()]
+    for row in queryset.values(label_field, *values).order_by('pk').iterator(chunk_size=chunk_rows):
+        data = {key: row[f"{prefix}{field}"] for key, field in fields.items()}
+        yield data, float(row[label_field])
+
+
+def ground_truth(name, since, until, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield ``(input, price, is_sold)`` for data recorded in ``(since, until]``.
+
+    Sold listings contribute their agreed price (``expected_price``) in the
+    window holding their ``sold_at``, so a listing edited after its sale is
+    not ingested again.
+    Predictions saved in the window contribute the price the model quoted,
+    unless their listing sold (that price is already covered above).
+    """
+    source = SOURCES[name]
+    relation = source['listing_relation']
+
+    sold = Listing.objects.filter(
+        device_type=name, status='sold', sold_at__lte=until, **{f"{relation}__isnull": False}
+    )
+    predictions = source['prediction_model'].objects.filter(created_at__lte=until).exclude(listing__status='sold')
+    if since is not None:
+        sold = sold.filter(sold_at__gt=since)
+        predictions = predictions.filter(created_at__gt=since)
+
+    for data, price in _iter_rows(sold, source['fields'], f"{relation}__", 'expected_price', chunk_rows):
+        yield data, price, True
+    for data, price in _iter_rows(predictions, source['fields'], '', 'predicted_price', chunk_rows):
+        yield data, price, False
+
+
+def build_training_set(predictor, rows, prediction_weight=DEFAULT_PREDICTION_WEIGHT,
+                       chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Encode ground-truth rows with the predictor's own preprocessing.
+
+    Returns ``(X, prices, weights, sold)``; the scaler and label encoders
+    stay those of the base model, so its trees remain valid.
+    """
+    blocks, prices, sold = [], [], []
+    chunk = []
+
+    def flush():
+        if chunk:
+            blocks.append(np.array(predictor.preprocess_many(chunk), dtype=np.float64))
+            chunk.clear()
+
+    for data, price, is_sold in rows:
+        if price <= 0:
+            continue
+        chunk.append(data)
+        prices.append(price)
+        sold.append(is_sold)
+        if len(chunk) == chunk_rows:
+            flush()
+    flush()
+
+    n_features = len(predictor.feature_names)
+    X = np.vstack(blocks) if blocks else np.empty((0, n_features))
+    sold = np.array(sold, dtype=bool)
+    weights = np.where(sold, 1.0, prediction_weight)
+    return X, np.array(prices, dtype=np.float64), weights, sold
+
+
+def split_holdout(sold, fraction, seed=42):
+    """Boolean holdout mask, drawn from sold listings when there are enough."""
+    rng = np.random.default_rng(seed)
+    n_rows = len(sold)
+    pool = np.flatnonzero(sold)
+    if len(pool) * fraction < 1:
+        pool = np.arange(n_rows)
+    n_holdout = max(1, int(round(len(pool) * fraction)))
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[rng.choice(pool, size=n_holdout, replace=False)] = True
+    return mask
+
+
+def continue_training(base_model, X, y, weights, rounds):
+    """Return a copy of ``base_model`` extended with ``rounds`` trees fit on ``X``."""
+    if hasattr(base_model, 'get_booster'):
+        # XGBoost: keep boosting from the existing ensemble
+        model = copy.deepcopy(base_model)
+        model.set_params(n_estimators=rounds)
+        model.fit(X, y, sample_weight=weights, xgb_model=base_model.get_booster())
+        return model
+
+    if hasattr(base_model, 'estimators_'):
+        # Random forest: warm start grows extra trees on the new data only
+        model = copy.deepcopy(base_model)
+        model.set_params(warm_start=True, n_estimators=len(base_model.estimators_) + rounds)
+        model.fit(X, y, sample_weight=weights)
+        model.set_params(warm_start=False)
+        return model
+
+    raise RetrainingError(f"Incremental training is not supported for {type(base_model).__name__}")
+
+
+def _predict_prices(model, X, log_target):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        predictions = np.asarray(model.predict(X), dtype=np.float64)
+    return np.expm1(predictions) if log_target else predictions
+
+
+def _holdout_metrics(model, X, prices, log_target):
+    predicted = _predict_prices(model, X, log_target)
+    errors = np.abs(predicted - prices)
+    return {
+        'mae': float(errors.mean()),
+        'mape': float(np.mean(errors / prices) * 100),
+        'within_10_pct': float(np.mean(errors <= prices * 0.10) * 100),
+    }
+
+
+def retrain(name, models_dir=None, rounds=DEFAULT_ROUNDS, holdout_fraction=DEFAULT_HOLDOUT_FRACTION,
+            min_rows=DEFAULT_MIN_ROWS, prediction_weight=DEFAULT_PREDICTION_WEIGHT,
+            max_regression=DEFAULT_MAX_REGRESSION, chunk_rows=DEFAULT_CHUNK_ROWS,
+            dry_run=False, force=False, compact_budget=DEFAULT_BUDGET):
+    """Continue training the active ``name`` bundle on new ground truth.
+
+    The candidate is compared with the base model on a holdout of the new
+    rows and written as a new (active) bundle version only if its MAE is
+    at most ``max_regression`` worse, unless ``force``. The new version
+    records ``data_until`` so the next run starts where this one ended.
+    If ``name`` has an active compact bundle, a new one within
+    ``compact_budget`` is derived from the published version.
+    """
+    source = SOURCES[name]
+    predictor = source['predictor'](models_dir=models_dir, **source['predictor_options'])
+    if predictor.bundle is None:
+        raise RetrainingError(
+            f"No {name} model bundle to continue from; "
+            f"run `python -m predictions.model_bundle convert {name}` first"
+        )
+    base_version = predictor.bundle.version
+    base_metadata = dict(predictor.metadata or {})
+    since = parse_datetime(base_metadata['data_until']) if base_metadata.get('data_until') else None
+    until = timezone.now()
+
+    X, prices, weights, sold = build_training_set(
+        predictor, ground_truth(name, since, until, chunk_rows), prediction_weight, chunk_rows,
+    )
+    result = {
+        'name': name,
+        'base_version': base_version,
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat(),
+        'rows': int(len(prices)),
+        'sold_rows': int(sold.sum()),
+        'published': False,
+    }
+    if len(prices) < min_rows:
+        raise RetrainingError(f"Only {len(prices)} new {name} rows since {result['since']} (need {min_rows})")
+
+    holdout = split_holdout(sold, holdout_fraction)
+    train = ~holdout
+    X_frame = pd.DataFrame(X, columns=predictor.feature_names)
+    y = np.log1p(prices) if source['log_target'] else prices
+
+    # Train from the bundle's pickled model, not the live serving instance
+    base_model = load_bundle(predictor.models_dir, name, version=base_version).model
+    candidate = continue_training(
+        base_model, X_frame[train], y[train], weights[train], rounds,
+    )
+
+    base_metrics = _holdout_metrics(base_model, X_frame[holdout], prices[holdout], source['log_target'])
+    candidate_metrics = _holdout_metrics(candidate, X_frame[holdout], prices[holdout], source['log_target'])
+    result.update({
+        'train_rows': int(train.sum()),
+        'holdout_rows': int(holdout.sum()),
+        'base_holdout': base_metrics,
+        'candidate_holdout': candidate_metrics,
+    })
+
+    accepted = candidate_metrics['mae'] <= base_metrics['mae'] * (1 + max_regression)
+    result['accepted'] = accepted
+    if dry_run or not (accepted or force):
+        return result
+
+    metadata = {
+        **base_metadata,
+        'data_until': until.isoformat(),
+        'base_version': base_version,
+        'incremental_rows': int(train.sum()),
+        'incremental_rounds': rounds,
+        'holdout_mae': candidate_metrics['mae'],
+        'holdout_base_mae': base_metrics['mae'],
+        'n_samples': int(base_metadata.get('n_samples', 0)) + int(train.sum()),
+    }
+    result['path'] = save_bundle(
+        predictor.models_dir, name,
+        model=candidate,
+        scaler=predictor.scaler,
+        label_encoders=predictor.label_encoders,
+        feature_names=predictor.feature_names,
+        metadata=metadata,
+        stats=getattr(predictor, 'stats', None),
+    )
+    result['published'] = True
+
+    compact_bundle = source['compact_bundle']
+    if compact_bundle and active_version(predictor.models_dir, compact_bundle) is not None:
+        result['compact_path'] = _rebuild_compact(
+            predictor, candidate, result['path'], metadata, X_frame[train], X_frame[holdout], y[holdout],
+            compact_budget,
+        )
+    return result
+
+
+def _rebuild_compact(predictor, model, full_path, metadata, X_train, X_test, y_test, budget):
+    """Derive a compact bundle from the retrained ``model``; returns its path,
+    or None (the previous compact version stays active) when no candidate
+    is within ``budget`` on the holdout rows."""
+    compact, report = compact_model(model, X_train, X_test, y_test, budget=budget)
+    if compact is None:
+        print(f"⚠️  No compact candidate within the MAE budget; {COMPACT_LAPTOP_BUNDLE} left unchanged")
+        return None
+    return save_compact_bundle(
+        predictor.models_dir, full_path, compact, report, predictor.scaler, predictor.label_encoders,
+        predictor.feature_names, metadata, budget,
+    )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.core.validators import RegexValidator
-from .models import LaptopPrediction, SmartphonePrediction, Listing, Conversation, Message
+from .models import LaptopPrediction, SmartphonePrediction, Listing, Conversation, Message, RepricingJob
 
 
 class LaptopPredictionInputSerializer(serializers.Serializer):
@@ -98,6 +98,30 @@ class PredictionHistorySerializer(serializers.Serializer):
     smartphone_predictions = SmartphonePredictionOutputSerializer(many=True, read_only=True)
 
 
+class DepreciationCurveSerializer(serializers.Serializer):
+    """Serializer for depreciation curve options"""
+    months = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=60),
+        required=False,
+        allow_empty=False,
+        max_length=12,
+    )
+
+
+class RepricingJobSerializer(serializers.ModelSerializer):
+    """Serializer for bulk repricing job status"""
+    progress_percent = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = RepricingJob
+        fields = [
+            'id', 'device_type', 'status', 'original_filename',
+            'total_rows', 'processed_rows', 'priced_rows', 'failed_rows',
+            'progress_percent', 'error_message', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
 class ListingSerializer(serializers.ModelSerializer):
     """Serializer for device lisitings"""
     seller_name = serializers.CharField(source='seller.username', read_only=True)
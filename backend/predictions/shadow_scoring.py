@@ -0,0 +1,184 @@
+"""
+Shadow Scoring
+Scores a candidate model version on live traffic off the response path
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .ml_config import ml_setting
+
+
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_QUEUE_SIZE = 64
+LATENCY_WINDOW = 1000
+
+
+class LatencyStats:
+    """Per-call latencies over a sliding window plus running totals."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+
+    def record(self, elapsed_ms, rows):
+        self.samples.append(elapsed_ms)
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += elapsed_ms
+
+    def summary(self):
+        if not self.calls:
+            return {"calls": 0}
+        samples = np.fromiter(self.samples, dtype=np.float64)
+        return {
+            "calls": self.calls,
+            "rows": self.rows,
+            "mean_ms": round(self.total_ms / self.calls, 4),
+            "per_row_ms": round(self.total_ms / self.rows, 4),
+            "p50_ms": round(float(np.percentile(samples, 50)), 4),
+            "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        }
+
+
+class ShadowComparison:
+    """Latency and prediction deltas of one (active, candidate) version pair.
+
+    Latencies are kept per role (``active``/``shadow``): the two versions
+    may share a version string.
+    """
+
+    def __init__(self, active_version, shadow_version):
+        self.active_version = active_version
+        self.shadow_version = shadow_version
+        self.latency = {"active": LatencyStats(), "shadow": LatencyStats()}
+        self.rows = 0
+        self.abs_delta_sum = 0.0
+        self.pct_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.within_1_pct = 0
+        self.errors = 0
+
+    def record_deltas(self, active, candidate):
+        active = np.asarray(active, dtype=np.float64)
+        delta = np.abs(np.asarray(candidate, dtype=np.float64) - active)
+        pct = delta / np.maximum(np.abs(active), 1.0) * 100
+        self.rows += len(delta)
+        self.abs_delta_sum += float(delta.sum())
+        self.pct_delta_sum += float(pct.sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(delta.max(initial=0.0)))
+        self.within_1_pct += int((pct <= 1.0).sum())
+
+    def summary(self):
+        return {
+            "active_version": self.active_version,
+            "shadow_version": self.shadow_version,
+            "rows": self.rows,
+            "errors": self.errors,
+            "latency": {role: stats.summary() for role, stats in self.latency.items()},
+            "delta": {
+                "mean_abs": round(self.abs_delta_sum / self.rows, 2) if self.rows else None,
+                "mean_pct": round(self.pct_delta_sum / self.rows, 4) if self.rows else None,
+                "max_abs": round(self.max_abs_delta, 2),
+                "within_1_pct": round(self.within_1_pct * 100 / self.rows, 2) if self.rows else None,
+            },
+        }
+
+
+class ShadowScorer:
+    """Background worker that replays sampled batches on a candidate model.
+
+    ``submit`` only enqueues (and drops the batch when the queue is full),
+    so the response is never delayed. The worker re-runs the active and the
+    candidate predictor uncached on the same rows, timing both, and compares
+    the candidate's prices with the active version's. (The served prices
+    may come from the cache, computed by a version swapped out since.)
+    """
+
+    def __init__(self, sample_rate=None, queue_size=None):
+        config = ml_setting("MODEL_REGISTRY", {})
+        self.sample_rate = config.get("SHADOW_SAMPLE_RATE", DEFAULT_SAMPLE_RATE) if sample_rate is None else sample_rate
+        self.queue_size = config.get("SHADOW_QUEUE_SIZE", DEFAULT_QUEUE_SIZE) if queue_size is None else queue_size
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # The worker thread does not survive a fork; start a fresh one lazily
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = None
+        self._comparisons = {}
+        self.submitted = 0
+        self.dropped = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+                self._thread.start()
+
+    def submit(self, name, rows, active, candidate):
+        """Queue a served batch for shadow scoring; returns False if skipped."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((name, list(rows), active, candidate))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _comparison(self, name, active, candidate):
+        active_version = active.artifact_version()
+        shadow_version = candidate.artifact_version()
+        comparison = self._comparisons.get(name)
+        if comparison is None or (comparison.active_version, comparison.shadow_version) != (
+            active_version, shadow_version
+        ):
+            comparison = self._comparisons[name] = ShadowComparison(active_version, shadow_version)
+        return comparison
+
+    def _timed(self, predictor, rows):
+        start = time.perf_counter()
+        results = predictor.predict_many(rows, use_cache=False)
+        return results, (time.perf_counter() - start) * 1000
+
+    def _run(self):
+        while True:
+            name, rows, active, candidate = self._queue.get()
+            comparison = self._comparison(name, active, candidate)
+            try:
+                active_results, active_ms = self._timed(active, rows)
+                shadow_results, shadow_ms = self._timed(candidate, rows)
+            except Exception as exc:
+                comparison.errors += 1
+                print(f"⚠️  Warning: {name} shadow scoring failed: {exc}")
+                continue
+            comparison.latency["active"].record(active_ms, len(rows))
+            comparison.latency["shadow"].record(shadow_ms, len(rows))
+            comparison.record_deltas(
+                [result["predicted_price"] for result in active_results],
+                [result["predicted_price"] for result in shadow_results],
+            )
+
+    def stats(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "queue_depth": self._queue.qsize(),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "comparisons": {name: comparison.summary() for name, comparison in self._comparisons.items()},
+        }
@@ -0,0 +1,62 @@
+"""Minimal model rows and model bundles for the prediction tests."""
+
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from predictions.benchmark import _fit_encoders, laptop_input
+from predictions.feature_vectorizer import FeatureVectorizer
+from predictions.ml_service import LaptopPricePredictor
+from predictions.model_bundle import save_bundle
+from predictions.models import Listing, SmartphonePrediction
+
+
+def make_user(email="seller@example.com"):
+    return get_user_model().objects.create_user(email=email, password="test-pass-123")
+
+
+def make_smartphone_prediction(**fields):
+    values = {
+        "brand": "Apple", "model": "iPhone 13", "launch_year": 2021, "launch_price": Decimal("69900"),
+        "processor": "A15 Bionic", "ram": 4, "storage": 128, "battery_capacity": 90,
+        "screen_size": Decimal("6.1"), "camera_mp": 12, "condition": "Good", "warranty_remaining": 0,
+        "battery_health": 90, "predicted_price": Decimal("40000"),
+    }
+    values.update(fields)
+    return SmartphonePrediction.objects.create(**values)
+
+
+def make_listing(seller, prediction, **fields):
+    values = {
+        "seller": seller, "smartphone_prediction": prediction, "device_type": "smartphone",
+        "imei_or_serial": "356938035643809", "screen_condition": "No scratches",
+        "body_condition": "Like new", "port_condition": "Working", "image_front": "f.jpg",
+        "image_back": "b.jpg", "image_side": "s.jpg", "image_screen_on": "o.jpg", "image_proof": "p.jpg",
+        "expected_price": Decimal("42000"), "delivery_option": "Pickup", "city": "Pune", "pincode": "411001",
+    }
+    values.update(fields)
+    return Listing.objects.create(**values)
+
+
+def laptop_price(row):
+    return row["launch_price"] * 0.85 ** (2025 - row["launch_year"]) * (1 + row["ram"] / 64)
+
+
+def save_laptop_bundle(models_dir, rng, n_rows=300, n_trees=20, version="v1", activate=True):
+    """Train a small laptop forest on ``laptop_price`` and save it as ``version``."""
+    with tempfile.TemporaryDirectory() as empty_dir:
+        features_of = LaptopPricePredictor(models_dir=empty_dir)._features
+    inputs = [laptop_input(rng) for _ in range(n_rows)]
+    features = [features_of(row) for row in inputs]
+    feature_names = list(features[0])
+    encoders = _fit_encoders(features, [col for col in feature_names if isinstance(features[0][col], str)])
+    X = FeatureVectorizer(feature_names, encoders).transform(features)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=n_trees, max_depth=8, random_state=0)
+    model.fit(scaler.transform(X), [laptop_price(row) for row in inputs])
+    save_bundle(models_dir, "laptop", model, scaler, encoders, feature_names, {"n_samples": n_rows},
+                version=version, activate=activate)
+    return model, scaler, encoders, feature_names
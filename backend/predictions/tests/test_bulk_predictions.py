@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from predictions import ml_service, views
+
+
+class FakePredictor:
+    """Prices each laptop at 100 x its RAM and records the batches it got."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_many(self, rows, use_cache=True):
+        self.batches.append(len(rows))
+        return [
+            {"predicted_price": row["ram"] * 100.0, "confidence_score": 90,
+             "price_range": {"min": 1.0, "max": 2.0}, "model_metrics": {"r2_score": 0.9}}
+            for row in rows
+        ]
+
+
+def laptop(ram, **fields):
+    values = {
+        "brand": "Dell", "model": "XPS 13", "launch_year": 2022, "launch_price": "90000", "processor": "i7",
+        "ram": ram, "storage_type": "SSD", "storage_size": 512, "gpu": "Integrated", "screen_size": "13.4",
+        "condition": "Good", "warranty_remaining": 0,
+    }
+    values.update(fields)
+    return values
+
+
+class BulkLaptopEndpointTests(SimpleTestCase):
+    def setUp(self):
+        self.predictor = FakePredictor()
+        patcher = mock.patch.object(ml_service.registry, "get", return_value=self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.url = reverse("predict_laptop_bulk")
+
+    def test_rows_are_priced_as_one_batch_in_order(self):
+        response = self.client.post(self.url, {"devices": [laptop(8), laptop(16), laptop(4)]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual([row["predicted_price"] for row in response.data["predictions"]], [800.0, 1600.0, 400.0])
+        self.assertEqual(response.data["model_info"], {"r2_score": 0.9})
+        self.assertEqual(self.predictor.batches, [3])
+
+    def test_invalid_rows_are_reported_by_position(self):
+        response = self.client.post(self.url, {"devices": [laptop(8), laptop(1)]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"][0], {})
+        self.assertIn("ram", response.data["errors"][1])
+        self.assertEqual(self.predictor.batches, [])
+
+    def test_empty_and_oversized_batches_are_rejected(self):
+        self.assertEqual(self.client.post(self.url, {"devices": []}, format="json").status_code, 400)
+        with mock.patch.object(views, "MAX_BULK_PREDICTIONS", 2):
+            response = self.client.post(self.url, {"devices": [laptop(8)] * 3}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.predictor.batches, [])
+
+    def test_missing_model_is_unavailable(self):
+        with mock.patch.object(ml_service.registry, "get", return_value=None):
+            response = self.client.post(self.url, {"devices": [laptop(8)]}, format="json")
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,163 @@
+import itertools
+import os
+import random
+import tempfile
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from predictions.comparables import LISTING, PREDICTION, ComparablesIndex, smartphone_vector
+
+from .factories import make_listing, make_smartphone_prediction, make_user
+
+
+BRANDS = ["Apple", "Samsung", "Xiaomi"]
+
+
+def random_row(rng):
+    return {
+        "brand": rng.choice(BRANDS),
+        "model": f"Model {rng.randint(1, 20)}",
+        "launch_year": rng.randint(2017, 2024),
+        "launch_price": rng.randint(8000, 150000),
+        "ram": rng.choice([2, 3, 4, 6, 8, 12]),
+        "storage": rng.choice([32, 64, 128, 256, 512]),
+        "condition": rng.choice(["Excellent", "Good", "Fair", "Poor"]),
+        "battery_health": rng.randint(60, 100),
+        "supports_5g": rng.random() < 0.5,
+        "screen_cracked": rng.random() < 0.1,
+        "body_damage": rng.random() < 0.2,
+    }
+
+
+class ComparablesIncrementalTests(SimpleTestCase):
+    """Incremental adds/removes (with tree rebuilds) must match a brute-force scan."""
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self._tmp = tempfile.TemporaryDirectory()
+        # Small merge threshold so the test goes through several rebuilds
+        self.index = ComparablesIndex("smartphone", path=self._tmp.name, merge_rows=8)
+        self.live = {}
+        self.ids = itertools.count(1)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def add(self, count, kind=PREDICTION):
+        added = []
+        for _ in range(count):
+            pk = next(self.ids)
+            row = random_row(self.rng)
+            vector = smartphone_vector(row)
+            entry = self.index._entry(kind, pk, row, self.rng.randint(5000, 90000), "2026-01-01T00:00:00")
+            added.append((vector, entry))
+            self.live[(kind, pk)] = (np.array(vector), entry)
+        self.index.apply(added)
+
+    def remove(self, count):
+        removed = self.rng.sample(sorted(self.live), count)
+        for key in removed:
+            del self.live[key]
+        self.index.apply([], removed)
+
+    def brute_force(self, row, k):
+        vector = np.array(smartphone_vector(row))
+        same_brand = sorted(
+            np.sqrt(((stored - vector) ** 2).sum())
+            for stored, entry in self.live.values() if entry["brand"] == row["brand"]
+        )
+        return [round(float(distance), 4) for distance in same_brand[:k]]
+
+    def assert_matches_brute_force(self, k=5):
+        for _ in range(25):
+            row = random_row(self.rng)
+            found = self.index.query(row, k)
+            self.assertEqual([item["distance"] for item in found], self.brute_force(row, k))
+            self.assertTrue(all(item["brand"] == row["brand"] for item in found))
+
+    def test_adds_and_removes_match_brute_force(self):
+        self.add(60)
+        self.assert_matches_brute_force()
+        for _ in range(5):
+            self.add(7)
+            self.remove(9)
+            self.assert_matches_brute_force()
+        self.assertEqual(len(self.index), len(self.live))
+
+    def test_re_adding_a_key_replaces_it(self):
+        self.add(30)
+        key = next(iter(self.live))
+        row = random_row(self.rng)
+        row["brand"] = "Samsung"
+        vector = smartphone_vector(row)
+        replacement = self.index._entry(key[0], key[1], row, 12345, "2026-02-01T00:00:00")
+        self.index.apply([(vector, replacement)])
+        self.live[key] = (np.array(vector), replacement)
+
+        self.assertEqual(len(self.index), 30)
+        self.assert_matches_brute_force()
+
+    def test_save_and_load_keep_live_rows(self):
+        self.add(40)
+        self.remove(10)
+        self.index.prediction_watermark = 99
+        version = self.index.save()
+        self.assertEqual(self.index.current_version(), version)
+
+        loaded = ComparablesIndex("smartphone", path=self.index.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(len(loaded), 30)
+        self.assertEqual(loaded.prediction_watermark, 99)
+        row = random_row(self.rng)
+        self.assertEqual(loaded.query(row, 5), self.index.query(row, 5))
+
+    def test_saves_keep_a_few_versions(self):
+        self.add(10)
+        for _ in range(5):
+            version = self.index.save()
+        loaded = ComparablesIndex("smartphone", path=self.index.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.current_version(), version)
+        versions = [name for name in os.listdir(self.index.path) if name[0].isdigit()]
+        self.assertEqual(len(versions), 3)
+
+    def test_other_brands_fill_missing_places(self):
+        self.add(20)
+        row = random_row(self.rng)
+        row["brand"] = "Nokia"
+        self.assertEqual(len(self.index.query(row, 5)), 5)
+
+
+class ComparablesSyncTests(TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.seller = make_user()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_sync_follows_new_predictions_and_listing_status(self):
+        first = make_smartphone_prediction()
+        second = make_smartphone_prediction(model="iPhone 12", predicted_price=Decimal("35000"))
+        listing = make_listing(self.seller, second)
+        index = ComparablesIndex("smartphone", path=self._tmp.name)
+
+        self.assertEqual(index.rebuild(), 3)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.sync(), 1)  # the watermark row is re-read, nothing new
+
+        third = make_smartphone_prediction(ram=6)
+        listing.status = "sold"
+        listing.save()
+        index.sync()
+        keys = set(index.positions)
+        self.assertIn((PREDICTION, third.pk), keys)
+        self.assertIn((PREDICTION, first.pk), keys)
+        self.assertNotIn((LISTING, listing.pk), keys)
+        self.assertEqual(len(index), 3)
+
+        rebuilt = ComparablesIndex("smartphone", path=self._tmp.name)
+        rebuilt.rebuild()
+        self.assertEqual(set(rebuilt.positions), keys)
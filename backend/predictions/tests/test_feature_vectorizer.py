@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from predictions.feature_vectorizer import FeatureVectorizer
+
+
+FEATURE_NAMES = ["ram", "brand", "screen_size", "condition", "seller_location", "not_in_input"]
+
+
+def pandas_preprocess(rows, feature_names, label_encoders, scaler):
+    """The DataFrame preprocessing the predictors used before the vectorizer."""
+    df = pd.DataFrame(rows)
+    for feature in feature_names:
+        if feature not in df.columns:
+            df[feature] = 0
+    for col in df.select_dtypes(include=["object"]).columns:
+        if col in label_encoders:
+            le = label_encoders[col]
+            df[col] = df[col].apply(lambda x: le.transform([x])[0] if x in le.classes_ else -1)
+        else:
+            df[col] = 0
+    return scaler.transform(df[feature_names].to_numpy(dtype=np.float64))
+
+
+class FeatureVectorizerParityTests(SimpleTestCase):
+    def setUp(self):
+        self.encoders = {
+            "brand": LabelEncoder().fit(["Apple", "Dell", "HP", "Lenovo"]),
+            "condition": LabelEncoder().fit(["Average", "Excellent", "Good", "Poor"]),
+        }
+        rng = np.random.default_rng(0)
+        self.scaler = StandardScaler().fit(rng.normal(3, 2, size=(50, len(FEATURE_NAMES))))
+        self.rows = [
+            {"ram": 8, "brand": "Dell", "screen_size": 15.6, "condition": "Good", "seller_location": "Pune"},
+            {"ram": 16, "brand": "Acer", "screen_size": 14.0, "condition": "Poor", "seller_location": "Delhi"},
+            {"ram": 4, "brand": "Apple", "screen_size": 13.3, "condition": "Excellent", "seller_location": "Goa"},
+        ]
+
+    def test_batch_and_single_rows_match_the_pandas_path(self):
+        expected = pandas_preprocess(self.rows, FEATURE_NAMES, self.encoders, self.scaler)
+        vectorizer = FeatureVectorizer(FEATURE_NAMES, self.encoders, self.scaler)
+
+        np.testing.assert_allclose(vectorizer.transform(self.rows), expected)
+        for row, expected_row in zip(self.rows, expected):
+            np.testing.assert_allclose(vectorizer.transform_one(row)[0], expected_row)
+
+    def test_encoded_columns_match_the_row_path(self):
+        vectorizer = FeatureVectorizer(FEATURE_NAMES, self.encoders, self.scaler)
+        columns = {
+            "ram": np.array([row["ram"] for row in self.rows], dtype=np.float64),
+            "brand": vectorizer.encode_column("brand", [row["brand"] for row in self.rows]),
+            "screen_size": np.array([row["screen_size"] for row in self.rows]),
+            "condition": vectorizer.encode_column("condition", [row["condition"] for row in self.rows]),
+            "seller_location": vectorizer.encode_column("seller_location", [row["seller_location"] for row in self.rows]),
+            "ignored": np.ones(len(self.rows)),
+        }
+        np.testing.assert_allclose(
+            vectorizer.transform_columns(columns, len(self.rows)), vectorizer.transform(self.rows),
+        )
+
+    def test_sanitize_zeroes_non_finite_values_before_scaling(self):
+        vectorizer = FeatureVectorizer(["ram", "screen_size"], sanitize=True)
+        matrix = vectorizer.transform([{"ram": np.inf, "screen_size": np.nan}, {"ram": 2.0}])
+        np.testing.assert_array_equal(matrix, [[0.0, 0.0], [2.0, 0.0]])
@@ -0,0 +1,99 @@
+import numpy as np
+from django.test import SimpleTestCase
+from sklearn.ensemble import RandomForestRegressor
+from xgboost import XGBRegressor
+
+from predictions.inference_backends import (
+    CompiledBackend, ReferenceBackend, TreeTableBackend, build_backend,
+)
+from predictions.tree_tables import export_tree_tables
+
+
+N_FEATURES = 6
+
+
+def training_rows(seed=0, n_rows=400):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES))
+    y = 3 * X[:, 0] - 2 * X[:, 1] * X[:, 2] + np.sin(X[:, 3]) + rng.normal(0, 0.1, n_rows)
+    return X, y
+
+
+def query_rows(n_rows=300, seed=1):
+    X = np.random.default_rng(seed).normal(0, 1.5, size=(n_rows, N_FEATURES))
+    # Values right on a few split thresholds and missing values
+    X[:5, 0] = 0.0
+    X[5:10, 2] = np.nan
+    return X
+
+
+class CountingReference(ReferenceBackend):
+    def __init__(self, model):
+        super().__init__(model)
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return super().predict(X)
+
+
+class TreeTablesMatchEstimatorTests(SimpleTestCase):
+    def assert_tables_match(self, model):
+        meta, tables = export_tree_tables(model)
+        X = query_rows()
+        expected = model.predict(X)
+        np.testing.assert_allclose(TreeTableBackend(meta, tables).predict(X), expected, rtol=1e-6, atol=1e-6)
+        # Row-at-a-time gives the batch results
+        single = [TreeTableBackend(meta, tables).predict(X[i:i + 1])[0] for i in range(20)]
+        np.testing.assert_allclose(single, expected[:20], rtol=1e-6, atol=1e-6)
+
+    def test_random_forest(self):
+        X, y = training_rows()
+        self.assert_tables_match(RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(X, y))
+
+    def test_xgboost(self):
+        X, y = training_rows()
+        X[::7, 2] = np.nan
+        model = XGBRegressor(n_estimators=40, max_depth=5, learning_rate=0.1, random_state=0).fit(X, y)
+        self.assert_tables_match(model)
+
+    def test_unsupported_model_is_rejected(self):
+        with self.assertRaises(ValueError):
+            export_tree_tables(object())
+
+
+class CompiledBackendTests(SimpleTestCase):
+    def setUp(self):
+        X, y = training_rows()
+        self.model = RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+        self.meta, self.tables = export_tree_tables(self.model)
+
+    def test_large_batches_go_to_the_estimator(self):
+        reference = CountingReference(self.model)
+        backend = CompiledBackend(TreeTableBackend(self.meta, self.tables), reference, N_FEATURES,
+                                  verified=True, max_rows=16)
+        X = query_rows()
+        np.testing.assert_allclose(backend.predict(X[:16]), self.model.predict(X[:16]), rtol=1e-6)
+        self.assertEqual(reference.calls, [])
+        backend.predict(X[:17])
+        self.assertEqual(reference.calls, [17])
+
+    def test_unverified_tables_are_checked_on_first_use(self):
+        reference = CountingReference(self.model)
+        backend = CompiledBackend(TreeTableBackend(self.meta, self.tables), reference, N_FEATURES)
+        self.assertEqual(reference.calls, [])
+        backend.predict(query_rows(1))
+        self.assertEqual(len(reference.calls), 1)
+        self.assertEqual(backend.name, "compiled")
+
+    def test_mismatching_tables_fall_back_to_the_estimator(self):
+        tables = {**self.tables, "value": self.tables["value"] + 1.0}
+        backend = CompiledBackend(TreeTableBackend(self.meta, tables), ReferenceBackend(self.model), N_FEATURES)
+        X = query_rows(4)
+        np.testing.assert_allclose(backend.predict(X), self.model.predict(X))
+        self.assertEqual(backend.name, "reference")
+
+    def test_reference_backend_when_requested(self):
+        backend = build_backend(self.model, N_FEATURES, preferred="reference")
+        self.assertEqual(backend.name, "reference")
+        self.assertEqual(build_backend(self.model, N_FEATURES).name, "compiled")
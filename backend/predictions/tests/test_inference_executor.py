@@ -0,0 +1,84 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from predictions import ml_service
+from predictions.inference_executor import InferenceExecutor, InferenceOverloaded
+from predictions.micro_batcher import PredictionTimeout
+
+from .test_bulk_predictions import FakePredictor, laptop
+
+
+class BlockingTask:
+    """Executor task that waits for ``release`` before answering."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def __call__(self, name, rows, **options):
+        self.release.wait(5)
+        return [(name, row, options) for row in rows]
+
+
+class InferenceExecutorTests(SimpleTestCase):
+    def make_executor(self, task, **options):
+        executor = InferenceExecutor(task, kind="thread", **options)
+        self.addCleanup(executor.shutdown, wait=False)
+        return executor
+
+    def test_options_reach_the_task(self):
+        executor = InferenceExecutor(lambda name, rows, **options: [(name, rows, options)], kind="inline")
+        self.assertEqual(executor.run("laptop", [1], use_cache=False), [("laptop", [1], {"use_cache": False})])
+
+    def test_jobs_beyond_max_pending_are_rejected(self):
+        task = BlockingTask()
+        executor = self.make_executor(task, max_workers=1, max_pending=2)
+        futures = [executor.submit("laptop", [1]), executor.submit("laptop", [2])]
+        with self.assertRaises(InferenceOverloaded):
+            executor.submit("laptop", [3])
+
+        task.release.set()
+        self.assertEqual([future.result(5)[0][1] for future in futures], [1, 2])
+        # Finished jobs free their slots
+        self.assertEqual(executor.run("laptop", [4])[0][1], 4)
+        self.assertEqual(executor.stats()["rejected"], 1)
+
+    def test_slow_job_times_out(self):
+        task = BlockingTask()
+        executor = self.make_executor(task, max_workers=1, timeout_seconds=0.05)
+        with self.assertRaises(PredictionTimeout):
+            executor.run("laptop", [1])
+        task.release.set()
+        self.assertEqual(executor.stats()["timeouts"], 1)
+
+
+class ExecutorResponseTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ml_service.registry, "get", return_value=FakePredictor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.task = BlockingTask()
+        self.addCleanup(self.task.release.set)
+        self.client = APIClient()
+
+    def post_with(self, executor):
+        with mock.patch.object(ml_service.registry, "executor", return_value=executor):
+            return self.client.post(reverse("predict_laptop_bulk"), {"devices": [laptop(8)]}, format="json")
+
+    def test_timeout_is_service_unavailable(self):
+        executor = InferenceExecutor(self.task, kind="thread", max_workers=1, timeout_seconds=0.05)
+        self.addCleanup(executor.shutdown, wait=False)
+        response = self.post_with(executor)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("timed out", response.data["message"])
+
+    def test_saturated_executor_is_service_unavailable(self):
+        executor = InferenceExecutor(self.task, kind="thread", max_workers=1, max_pending=1)
+        self.addCleanup(executor.shutdown, wait=False)
+        executor.submit("laptop", [{}])
+        response = self.post_with(executor)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("full", response.data["message"])
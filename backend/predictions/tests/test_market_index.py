@@ -0,0 +1,163 @@
+import random
+from datetime import date
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+
+from predictions import market_index
+from predictions.market_index import MarketSnapshot, QuantileSketch, _Accumulator
+from predictions.models import Listing, MarketPriceAggregate
+
+from .factories import make_listing, make_smartphone_prediction, make_user
+
+
+def exact_quantile(values, q):
+    # The rank the sketch targets: the element at floor(q * (n - 1))
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+class QuantileSketchTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.values = [rng.lognormvariate(10, 0.8) for _ in range(5000)]
+
+    def test_quantiles_within_relative_accuracy(self):
+        for alpha in (0.01, 0.05):
+            sketch = QuantileSketch(alpha)
+            for value in self.values:
+                sketch.add(value)
+            for q in (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0):
+                exact = exact_quantile(self.values, q)
+                self.assertLessEqual(abs(sketch.quantile(q) - exact), alpha * exact * (1 + 1e-9), (alpha, q))
+
+    def test_merge_equals_sketch_of_all_values(self):
+        left, right, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i, value in enumerate(self.values):
+            (left if i % 3 else right).add(value)
+            both.add(value)
+        left.merge(right)
+        self.assertEqual(left.buckets, both.buckets)
+        self.assertEqual(left.count, len(self.values))
+        for q in (0.1, 0.5, 0.9):
+            self.assertEqual(left.quantile(q), both.quantile(q))
+
+    def test_merge_rejects_other_accuracy(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+    def test_json_round_trip(self):
+        sketch = QuantileSketch()
+        for value in self.values[:100] + [0.0, 1.0]:
+            sketch.add(value)
+        restored = QuantileSketch.from_json(sketch.to_json())
+        self.assertEqual((restored.buckets, restored.zeros), (sketch.buckets, sketch.zeros))
+        self.assertEqual(restored.quantile(0.5), sketch.quantile(0.5))
+
+    def test_empty_sketch(self):
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+    def test_accumulators_merge(self):
+        left, right = _Accumulator(0.01), _Accumulator(0.01)
+        for price in (100.0, 300.0):
+            left.add(price)
+        right.add(50.0)
+        summary = left.merge(right).summary()
+        self.assertEqual((summary["count"], summary["min"], summary["max"]), (3, 50.0, 300.0))
+        self.assertAlmostEqual(summary["mean"], 150.0)
+
+
+class MarketSnapshotVersionTests(SimpleTestCase):
+    def snapshot(self, models):
+        return MarketSnapshot("smartphone", {
+            name: {"count": count, "mean": mean} for name, (count, mean) in models.items()
+        }, date(2026, 8, 1))
+
+    def test_version_ignores_models_below_min_observations(self):
+        before = self.snapshot({"iPhone 13": (30, 40000.0), "Pixel 7": (3, 30000.0)})
+        after = self.snapshot({"iPhone 13": (30, 40000.0), "Pixel 7": (4, 31000.0), "Nokia 1": (1, 3000.0)})
+        self.assertEqual(before.overlay_version(20), after.overlay_version(20))
+        self.assertNotEqual(before.overlay_version(3), after.overlay_version(3))
+
+    def test_version_follows_overlaid_models(self):
+        before = self.snapshot({"iPhone 13": (30, 40000.0)})
+        self.assertNotEqual(before.overlay_version(20), self.snapshot({"iPhone 13": (31, 40000.0)}).overlay_version(20))
+        self.assertNotEqual(before.overlay_version(20), self.snapshot({"iPhone 13": (30, 39000.0)}).overlay_version(20))
+
+    def test_no_overlay_no_version(self):
+        snapshot = self.snapshot({"Pixel 7": (3, 30000.0)})
+        self.assertIsNone(snapshot.overlay_version(20))
+        stats = {"model_popularity": {"Pixel 7": 10}, "model_avg_resale": {"Pixel 7": 25000.0}}
+        self.assertEqual(snapshot.overlay(stats, 20), (stats["model_popularity"], stats["model_avg_resale"]))
+
+    def test_overlay_replaces_only_overlaid_models(self):
+        snapshot = self.snapshot({"iPhone 13": (40, 41000.0), "Pixel 7": (3, 30000.0)})
+        stats = {
+            "model_popularity": {"iPhone 13": 10, "Pixel 7": 10},
+            "model_avg_resale": {"iPhone 13": 38000.0, "Pixel 7": 25000.0},
+        }
+        popularity, avg_resale = snapshot.overlay(stats, 20)
+        self.assertEqual(avg_resale, {"iPhone 13": 41000.0, "Pixel 7": 25000.0})
+        self.assertEqual(popularity, {"iPhone 13": 20.0, "Pixel 7": 10})
+
+    def test_overlay_is_cached_per_stats_version(self):
+        snapshot = self.snapshot({"iPhone 13": (40, 41000.0)})
+        before = {"model_popularity": {"iPhone 13": 10}, "model_avg_resale": {}}
+        after = {"model_popularity": {"iPhone 13": 30}, "model_avg_resale": {}}
+        self.assertEqual(snapshot.overlay(before, 20, stats_version="v1")[0], {"iPhone 13": 10.0})
+        # A hot-swapped model's stats never get the previous model's overlay
+        self.assertEqual(snapshot.overlay(after, 20, stats_version="v2")[0], {"iPhone 13": 30.0})
+        self.assertIs(snapshot.overlay(before, 20, stats_version="v1"), snapshot.overlay(before, 20, stats_version="v1"))
+
+
+class MarketIndexUpdateTests(TestCase):
+    def setUp(self):
+        self.seller = make_user()
+
+    def total_count(self):
+        return sum(MarketPriceAggregate.objects.values_list("count", flat=True))
+
+    def test_cursors_count_every_price_once(self):
+        for price in (30000, 32000, 34000):
+            make_smartphone_prediction(predicted_price=Decimal(price))
+        listing = make_listing(self.seller, make_smartphone_prediction(), expected_price=Decimal("36000"))
+
+        self.assertEqual(market_index.update("smartphone"), 4)
+        self.assertEqual(market_index.update("smartphone"), 0)
+
+        listing.status = "sold"
+        listing.save()
+        self.assertEqual(market_index.update("smartphone"), 1)
+        self.assertEqual(self.total_count(), 5)
+
+        # Edits after the sale don't count it again
+        listing.city = "Mumbai"
+        listing.save()
+        Listing.objects.get(pk=listing.pk).save()
+        self.assertEqual(market_index.update("smartphone"), 0)
+        self.assertEqual(self.total_count(), 5)
+
+        aggregate = MarketPriceAggregate.objects.get(model_name="iPhone 13")
+        self.assertEqual(aggregate.price_max, 40000.0)
+        self.assertAlmostEqual(aggregate.mean, (30000 + 32000 + 34000 + 40000 + 36000) / 5)
+
+    def test_sold_at_is_set_once(self):
+        listing = make_listing(self.seller, make_smartphone_prediction())
+        self.assertIsNone(listing.sold_at)
+        listing.status = "sold"
+        listing.save(update_fields=["status"])
+        sold_at = Listing.objects.get(pk=listing.pk).sold_at
+        self.assertIsNotNone(sold_at)
+        listing.status = "active"
+        listing.save()
+        listing.status = "sold"
+        listing.save()
+        self.assertEqual(Listing.objects.get(pk=listing.pk).sold_at, sold_at)
+
+    def test_snapshot_merges_monthly_rows(self):
+        for price in (30000, 32000):
+            make_smartphone_prediction(predicted_price=Decimal(price))
+        market_index.update("smartphone")
+        snapshot = MarketSnapshot.load("smartphone")
+        self.assertEqual(snapshot.total_count, 2)
+        self.assertEqual(snapshot.models["iPhone 13"]["count"], 2)
+        self.assertAlmostEqual(snapshot.models["iPhone 13"]["mean"], 31000.0)
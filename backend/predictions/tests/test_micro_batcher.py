@@ -0,0 +1,71 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from predictions.micro_batcher import MicroBatcher, PredictionTimeout
+
+
+class RecordingModel:
+    """``predict_many`` stand-in doubling each input; blocks while ``gate`` is clear."""
+
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, rows):
+        self.gate.wait(5)
+        self.batches.append(list(rows))
+        if "boom" in rows:
+            raise ValueError("bad row")
+        return [row * 2 for row in rows]
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_requests_share_one_call(self):
+        model = RecordingModel()
+        batcher = MicroBatcher("test", model, max_batch_size=8, max_wait_ms=200)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(batcher.predict, range(8)))
+
+        self.assertEqual(results, [value * 2 for value in range(8)])
+        self.assertEqual(sorted(sum(model.batches, [])), list(range(8)))
+        self.assertLess(len(model.batches), 8)
+        self.assertEqual(batcher.stats()["rows"], 8)
+
+    def test_batches_are_capped_at_max_batch_size(self):
+        model = RecordingModel()
+        model.gate.clear()
+        batcher = MicroBatcher("test", model, max_batch_size=3, max_wait_ms=50)
+        # The first row occupies the worker; the next seven queue up meanwhile
+        futures = [batcher.submit(value) for value in range(8)]
+        model.gate.set()
+        self.assertEqual([future.result(5) for future in futures], [value * 2 for value in range(8)])
+        self.assertTrue(all(len(batch) <= 3 for batch in model.batches))
+
+    def test_a_failed_batch_fails_every_caller(self):
+        model = RecordingModel()
+        model.gate.clear()
+        batcher = MicroBatcher("test", model, max_batch_size=4, max_wait_ms=200)
+        first, second = batcher.submit("boom"), batcher.submit(1)
+        model.gate.set()
+        for future in (first, second):
+            with self.assertRaises(ValueError):
+                future.result(5)
+
+    def test_timed_out_request_is_dropped_from_its_batch(self):
+        model = RecordingModel()
+        model.gate.clear()
+        batcher = MicroBatcher("test", model, max_batch_size=4, max_wait_ms=1)
+        blocker = batcher.submit(1)
+        while not blocker.running():
+            time.sleep(0.001)
+        with self.assertRaises(PredictionTimeout):
+            batcher.predict(2, timeout=0.05)
+        model.gate.set()
+        self.assertEqual(blocker.result(5), 2)
+        self.assertEqual(batcher.predict(3, timeout=5), 6)
+        self.assertNotIn(2, sum(model.batches, []))
+        self.assertEqual(batcher.stats()["timeouts"], 1)
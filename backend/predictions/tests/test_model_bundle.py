@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from predictions.model_bundle import (
+    ARTIFACTS_FILE, MANIFEST_FILE, BundleError, BundleNotFound, active_version, bundle_root,
+    list_versions, load_bundle, save_bundle, set_active_version, verify_bundle,
+)
+
+
+FEATURES = ["ram", "storage", "launch_year"]
+
+
+def train(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 10, size=(200, len(FEATURES)))
+    y = X @ np.array([3.0, 1.0, 0.5]) + rng.normal(0, 0.1, size=200)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=5, max_depth=4, random_state=seed).fit(scaler.transform(X), y)
+    return model, scaler, X
+
+
+class ModelBundleTests(SimpleTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.models_dir = self._tmp.name
+        self.model, self.scaler, self.X = train()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def save(self, version, **options):
+        return save_bundle(
+            self.models_dir, "smartphone", self.model, self.scaler, {}, FEATURES,
+            {"mae": 1.5}, stats={"model_popularity": {"iPhone 13": 3}}, version=version, **options,
+        )
+
+    def test_save_and_load_round_trip(self):
+        self.save("v1")
+        bundle = load_bundle(self.models_dir, "smartphone")
+
+        self.assertEqual(bundle.version, "v1")
+        self.assertEqual(bundle.feature_names, FEATURES)
+        self.assertEqual(bundle.metadata, {"mae": 1.5})
+        self.assertEqual(bundle.stats, {"model_popularity": {"iPhone 13": 3}})
+        X = self.scaler.transform(self.X)
+        np.testing.assert_allclose(bundle.model.predict(X), self.model.predict(X))
+        np.testing.assert_allclose(bundle.arrays["scaler_mean"], self.scaler.mean_)
+        self.assertIn("verified_max_diff", bundle.tree_meta)
+        self.assertIsNotNone(bundle.tree_tables())
+
+    def test_estimator_is_unpickled_lazily(self):
+        self.save("v1")
+        bundle = load_bundle(self.models_dir, "smartphone", load_model=False)
+        self.assertFalse(bundle.model_loaded)
+        self.assertIsInstance(bundle.model, RandomForestRegressor)
+        self.assertTrue(bundle.model_loaded)
+
+    def test_new_version_becomes_active_unless_asked_not_to(self):
+        self.save("v1")
+        self.save("v2", activate=False)
+        self.assertEqual(active_version(self.models_dir, "smartphone"), "v1")
+        set_active_version(self.models_dir, "smartphone", "v2")
+        self.assertEqual(load_bundle(self.models_dir, "smartphone").version, "v2")
+        self.assertEqual(list_versions(self.models_dir, "smartphone"), ["v1", "v2"])
+
+    def test_existing_version_is_not_overwritten(self):
+        self.save("v1")
+        with self.assertRaises(BundleError):
+            self.save("v1")
+
+    def test_missing_bundles(self):
+        with self.assertRaises(BundleNotFound):
+            load_bundle(self.models_dir, "smartphone")
+        self.save("v1")
+        with self.assertRaises(BundleNotFound):
+            load_bundle(self.models_dir, "smartphone", version="v9")
+        with self.assertRaises(BundleNotFound):
+            set_active_version(self.models_dir, "smartphone", "v9")
+
+    def test_modified_file_fails_checksum(self):
+        self.save("v1", activate=False)
+        verify_bundle(self.models_dir, "smartphone", "v1")
+        with open(os.path.join(bundle_root(self.models_dir, "smartphone"), "v1", ARTIFACTS_FILE), "ab") as f:
+            f.write(b"tampered")
+
+        with self.assertRaisesMessage(BundleError, "checksum mismatch for artifacts.pkl"):
+            verify_bundle(self.models_dir, "smartphone", "v1")
+        with self.assertRaises(BundleError):
+            set_active_version(self.models_dir, "smartphone", "v1")
+        self.assertIsNone(active_version(self.models_dir, "smartphone"))
+        with self.assertRaises(BundleError):
+            load_bundle(self.models_dir, "smartphone", version="v1", verify=True)
+
+    def test_deleted_file_fails_checksum(self):
+        self.save("v1")
+        arrays_dir = os.path.join(bundle_root(self.models_dir, "smartphone"), "v1", "arrays")
+        os.remove(os.path.join(arrays_dir, "scaler_mean.npy"))
+        with self.assertRaises(BundleError):
+            verify_bundle(self.models_dir, "smartphone", "v1")
+
+    def test_unknown_schema_version_is_rejected(self):
+        self.save("v1")
+        manifest_path = os.path.join(bundle_root(self.models_dir, "smartphone"), "v1", MANIFEST_FILE)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest["schema_version"] = 999
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+        with self.assertRaisesMessage(BundleError, "schema version 999"):
+            load_bundle(self.models_dir, "smartphone")
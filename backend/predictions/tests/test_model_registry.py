@@ -0,0 +1,71 @@
+import functools
+import random
+import tempfile
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from predictions.benchmark import laptop_input
+from predictions.ml_service import LaptopPricePredictor, ModelRegistry
+from predictions.model_bundle import set_active_version, set_shadow_version
+
+from .factories import save_laptop_bundle
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = condition()
+        if value:
+            return value
+        time.sleep(0.02)
+    raise AssertionError("condition not met in time")
+
+
+@override_settings(MODEL_REGISTRY={"RELOAD_CHECK_SECONDS": 0.01, "SHADOW_SAMPLE_RATE": 1.0, "SHADOW_QUEUE_SIZE": 64})
+class ModelRolloutTests(SimpleTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.models_dir = self._tmp.name
+        self.rng = random.Random(11)
+        save_laptop_bundle(self.models_dir, self.rng, n_rows=150, n_trees=5)
+        save_laptop_bundle(self.models_dir, self.rng, n_rows=150, n_trees=8, version="v2", activate=False)
+        self.registry = ModelRegistry({
+            "laptop": functools.partial(LaptopPricePredictor, models_dir=self.models_dir, variant="full"),
+        })
+        self.rows = [laptop_input(self.rng) for _ in range(4)]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def serving_version(self):
+        predictor = self.registry.get("laptop")
+        return predictor.bundle.version if predictor.bundle else None
+
+    def test_moved_current_pointer_is_swapped_in(self):
+        old = self.registry.get("laptop")
+        self.assertEqual(old.bundle.version, "v1")
+
+        set_active_version(self.models_dir, "laptop", "v2")
+        wait_for(lambda: self.serving_version() == "v2")
+        # Requests that still hold the old instance finish on it
+        self.assertEqual(len(old.predict_many(self.rows)), len(self.rows))
+        self.assertEqual(len(self.registry.get("laptop").bundle.model.estimators_), 8)
+
+    def test_shadow_version_is_scored_against_the_active_one(self):
+        self.registry.get("laptop")
+        set_shadow_version(self.models_dir, "laptop", "v2")
+        wait_for(lambda: self.registry.get("laptop") and self.registry._shadows.get("laptop"))
+
+        served = self.registry.predict_local("laptop", self.rows)
+        self.assertEqual(len(served), len(self.rows))
+        comparison = wait_for(lambda: self.registry.scorer()._comparisons.get("laptop"))
+        wait_for(lambda: comparison.rows == len(self.rows))
+
+        summary = self.registry.rollout_stats()["shadow_scoring"]["comparisons"]["laptop"]
+        self.assertEqual(set(summary["latency"]), {"active", "shadow"})
+        self.assertEqual(summary["latency"]["shadow"]["rows"], len(self.rows))
+        self.assertEqual((summary["active_version"], summary["shadow_version"]),
+                         (self.registry.get("laptop").artifact_version(), self.registry._shadows["laptop"].artifact_version()))
+        self.assertIsNotNone(summary["delta"]["mean_abs"])
+        self.assertEqual(summary["errors"], 0)
@@ -0,0 +1,147 @@
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from predictions.prediction_cache import PredictionCache, artifact_fingerprint
+
+
+FIELDS = ("brand", "model", "ram")
+
+
+def make_cache(**options):
+    options.setdefault("max_entries", 100)
+    options.setdefault("ttl_seconds", 60)
+    options.setdefault("use_shared_cache", False)
+    return PredictionCache("test", FIELDS, **options)
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows):
+        self.calls.append(list(rows))
+        return [{"price": row["ram"] * 1000} for row in rows]
+
+
+class PredictionCacheKeyTests(SimpleTestCase):
+    def test_key_ignores_field_order_and_extra_fields(self):
+        cache = make_cache()
+        self.assertEqual(
+            cache.make_key({"brand": "Apple", "model": "iPhone 13", "ram": 4}),
+            cache.make_key({"ram": 4, "model": "iPhone 13", "brand": "Apple", "note": "ignored"}),
+        )
+
+    def test_key_folds_spelling_and_numeric_types(self):
+        cache = make_cache(numeric_fields=("ram",))
+        cache.clear(vocabulary={"brand": ["Samsung", "Apple"]})
+        base = cache.make_key({"brand": "Samsung", "model": "Galaxy S21", "ram": 8})
+        for brand in ("samsung", " Samsung", "SAMSUNG "):
+            for ram in (8, 8.0, Decimal("8"), "8", " 8 "):
+                self.assertEqual(cache.make_key({"brand": brand, "model": "Galaxy  S21", "ram": ram}), base)
+        self.assertNotEqual(cache.make_key({"brand": "Samsung", "model": "Galaxy S21", "ram": 6}), base)
+        # Outside the vocabulary only whitespace is folded
+        self.assertNotEqual(cache.make_key({"brand": "Samsung", "model": "galaxy s21", "ram": 8}), base)
+
+    def test_normalize_returns_training_spellings(self):
+        cache = make_cache(numeric_fields=("ram",))
+        cache.clear(vocabulary={"brand": ["Apple"]})
+        row = cache.normalize({"brand": " apple", "model": "iPhone 13", "ram": "4", "note": " kept "})
+        self.assertEqual(row, {"brand": "Apple", "model": "iPhone 13", "ram": 4.0, "note": " kept "})
+
+    def test_non_numeric_fields_keep_their_type(self):
+        cache = make_cache()
+        base = {"brand": "Apple", "model": "iPhone 13"}
+        self.assertNotEqual(cache.make_key({**base, "ram": "4"}), cache.make_key({**base, "ram": 4}))
+        self.assertNotEqual(cache.make_key({**base, "ram": Decimal("4")}), cache.make_key({**base, "ram": 4}))
+
+    def test_key_includes_version(self):
+        cache = make_cache()
+        row = {"brand": "Apple", "model": "iPhone 13", "ram": 4}
+        before = cache.make_key(row)
+        cache.clear(version="v2")
+        self.assertNotEqual(cache.make_key(row), before)
+        self.assertIn(":v2:", cache.make_key(row))
+
+
+class PredictionCacheResolveTests(SimpleTestCase):
+    def test_only_misses_are_computed(self):
+        cache, model = make_cache(), CountingModel()
+        first = {"brand": "Apple", "model": "iPhone 13", "ram": 4}
+        second = {"brand": "Apple", "model": "iPhone 14", "ram": 6}
+
+        self.assertEqual(cache.resolve([first], model), [{"price": 4000}])
+        self.assertEqual(cache.resolve([first, second, first], model), [{"price": 4000}, {"price": 6000}, {"price": 4000}])
+        self.assertEqual(model.calls, [[first], [second]])
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_shared_hits_are_counted_per_row(self):
+        cache, model = make_cache(use_shared_cache=True), CountingModel()
+        row = {"brand": "Apple", "model": "iPhone 13", "ram": 4}
+        shared = {cache.make_key(row): {"price": 4000}}
+        with mock.patch.object(cache, "_get_shared", return_value=shared), \
+                mock.patch.object(cache, "_set_shared"):
+            self.assertEqual(cache.resolve([row, row, row], model), [{"price": 4000}] * 3)
+        self.assertEqual(model.calls, [])
+        self.assertEqual((cache.hits, cache.shared_hits, cache.misses), (0, 3, 0))
+
+    def test_results_are_copies(self):
+        cache, model = make_cache(), CountingModel()
+        row = {"brand": "Apple", "model": "iPhone 13", "ram": 4}
+        cache.resolve([row], model)[0]["price"] = -1
+        self.assertEqual(cache.resolve([row], model), [{"price": 4000}])
+
+    def test_version_change_drops_entries(self):
+        cache, model = make_cache(), CountingModel()
+        row = {"brand": "Apple", "model": "iPhone 13", "ram": 4}
+        cache.resolve([row], model)
+        cache.clear(version="v2")
+        cache.resolve([row], model)
+        self.assertEqual(len(model.calls), 2)
+        self.assertEqual(cache.stats()["version"], "v2")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache, model = make_cache(max_entries=2), CountingModel()
+        rows = [{"brand": "Apple", "model": "iPhone", "ram": ram} for ram in (4, 6, 8)]
+        cache.resolve(rows[:2], model)
+        cache.resolve(rows[:1], model)  # 4 GB is now the most recent
+        cache.resolve(rows[2:], model)  # evicts 6 GB
+        model.calls.clear()
+        cache.resolve(rows, model)
+        self.assertEqual(model.calls, [[rows[1]]])
+
+    def test_entries_expire_after_ttl(self):
+        cache, model = make_cache(ttl_seconds=10), CountingModel()
+        row = {"brand": "Apple", "model": "iPhone 13", "ram": 4}
+        with mock.patch("predictions.prediction_cache.time.monotonic", return_value=1000.0):
+            cache.resolve([row], model)
+        with mock.patch("predictions.prediction_cache.time.monotonic", return_value=1009.0):
+            cache.resolve([row], model)
+        self.assertEqual(len(model.calls), 1)
+        with mock.patch("predictions.prediction_cache.time.monotonic", return_value=1011.0):
+            cache.resolve([row], model)
+        self.assertEqual(len(model.calls), 2)
+
+    def test_disabled_cache_always_computes(self):
+        cache, model = make_cache(ttl_seconds=0), CountingModel()
+        row = {"brand": "Apple", "model": "iPhone 13", "ram": 4}
+        cache.resolve([row], model)
+        cache.resolve([row], model)
+        self.assertEqual(len(model.calls), 2)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class ArtifactFingerprintTests(SimpleTestCase):
+    def test_changes_with_file_contents(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.pkl")
+            with open(path, "wb") as f:
+                f.write(b"one")
+            before = artifact_fingerprint([path, os.path.join(tmp, "missing.pkl")])
+            self.assertEqual(artifact_fingerprint([path]), before)
+            with open(path, "wb") as f:
+                f.write(b"three")
+            self.assertNotEqual(artifact_fingerprint([path]), before)
@@ -0,0 +1,132 @@
+import csv
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from predictions import repricing
+from predictions.inference_executor import InferenceOverloaded
+from predictions.models import RepricingJob
+
+from .factories import make_user
+
+
+HEADER = [
+    "brand", "model", "launch_year", "launch_price", "processor", "storage_gb", "ram_gb",
+    "battery_percentage", "battery_health", "camera_rear_mp", "camera_front_mp", "display_size_inch",
+    "warranty_months", "seller_type", "seller_location",
+]
+
+
+class WorkerKilled(BaseException):
+    """Stands in for the worker process dying mid-job."""
+
+
+class FakeInference:
+    """``predict_many`` stand-in pricing each row at 100 x its RAM."""
+
+    def __init__(self, fail_on_call=None):
+        self.calls = []
+        self.fail_on_call = fail_on_call
+
+    def __call__(self, name, rows, use_cache=True):
+        self.calls.append((name, len(rows), use_cache))
+        if len(self.calls) == self.fail_on_call:
+            raise WorkerKilled()
+        return [
+            {"predicted_price": row["ram_gb"] * 100.0, "price_range": {"min": 1.0, "max": 2.0},
+             "confidence_score": 90}
+            for row in rows
+        ]
+
+
+def device_row(ram, model="Galaxy S21"):
+    return [
+        "Samsung", model, "2021", "69999", "Exynos 2100", "128", str(ram), "90", "90", "64", "10",
+        "6.2", "0", "Store", "Pune",
+    ]
+
+
+@override_settings(REPRICING_JOBS={"CHUNK_ROWS": 2, "MAX_WORKERS": 1})
+class RepricingJobTests(TransactionTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.user = make_user()
+        patcher = mock.patch.object(repricing.registry, "get", return_value=object())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(repricing.runner.shutdown)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def make_job(self, rows):
+        path = os.path.join(self._tmp.name, "input.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        return RepricingJob.objects.create(
+            user=self.user, device_type="smartphone", input_path=path,
+            output_path=os.path.join(self._tmp.name, "out", "priced.csv"),
+        )
+
+    def read_output(self, job):
+        with open(job.output_path, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def test_killed_job_resumes_after_its_last_recorded_chunk(self):
+        job = self.make_job([device_row(ram) for ram in (2, 3, 4, 6, 8, 12, 16)])
+        with mock.patch.object(repricing, "predict_many", FakeInference(fail_on_call=3)):
+            with self.assertRaises(WorkerKilled):
+                repricing.start_job(job).result(timeout=10)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows), ("running", 4))
+
+        # The process is gone: another one takes the job over
+        RepricingJob.objects.filter(pk=job.pk).update(
+            worker="elsewhere:1", heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+        inference = FakeInference()
+        with mock.patch.object(repricing, "predict_many", inference):
+            [(recovered, future)] = repricing.recover_jobs(orphan_seconds=60)
+            future.result(timeout=10)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.priced_rows), ("completed", 7, 7))
+        # Only the unrecorded rows were priced again, on the executor, uncached
+        self.assertEqual(inference.calls, [("smartphone", 2, False), ("smartphone", 1, False)])
+        output = self.read_output(job)
+        self.assertEqual([row["ram_gb"] for row in output], ["2", "3", "4", "6", "8", "12", "16"])
+        self.assertEqual(output[-1]["predicted_price"], "1600.0")
+
+    def test_invalid_rows_are_reported_and_formulas_escaped(self):
+        job = self.make_job([device_row(4, model="=HYPERLINK(\"http://x\")"), device_row(99)])
+        with mock.patch.object(repricing, "predict_many", FakeInference()):
+            repricing.start_job(job).result(timeout=10)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.priced_rows, job.failed_rows), ("completed", 1, 1))
+        priced, failed = self.read_output(job)
+        self.assertEqual(priced["model"], "'=HYPERLINK(\"http://x\")")
+        self.assertIn("ram_gb", failed["error"])
+
+    def test_saturated_executor_is_retried(self):
+        inference = FakeInference()
+        responses = [InferenceOverloaded("full"), inference]
+
+        def predict_many(*args, **kwargs):
+            response = responses.pop(0) if len(responses) > 1 else responses[0]
+            if isinstance(response, Exception):
+                raise response
+            return response(*args, **kwargs)
+
+        job = self.make_job([device_row(4)])
+        with mock.patch.object(repricing, "predict_many", predict_many), \
+                mock.patch.object(repricing, "OVERLOAD_BACKOFF_SECONDS", 0.01):
+            repricing.start_job(job).result(timeout=10)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.priced_rows), ("completed", 1))
@@ -0,0 +1,90 @@
+import random
+import tempfile
+from decimal import Decimal
+
+from django.test import TestCase
+
+from predictions import retraining
+from predictions.benchmark import laptop_input
+from predictions.ml_service import LaptopPricePredictor
+from predictions.model_bundle import COMPACT_LAPTOP_BUNDLE, active_version, load_bundle, save_bundle
+from predictions.model_compaction import prune_forest
+from predictions.models import LaptopPrediction
+
+from .factories import laptop_price, save_laptop_bundle
+
+
+class IncrementalRetrainTests(TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.models_dir = self._tmp.name
+        self.rng = random.Random(5)
+        self.base = save_laptop_bundle(self.models_dir, self.rng)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def record_predictions(self, count):
+        for _ in range(count):
+            row = laptop_input(self.rng)
+            LaptopPrediction.objects.create(**row, predicted_price=Decimal(round(laptop_price(row), 2)))
+
+    def retrain(self, **options):
+        options.setdefault("rounds", 5)
+        options.setdefault("min_rows", 20)
+        return retraining.retrain("laptop", models_dir=self.models_dir, force=True, **options)
+
+    def test_new_version_extends_the_forest_and_records_its_window(self):
+        self.record_predictions(60)
+        result = self.retrain()
+
+        self.assertTrue(result["published"])
+        self.assertEqual((result["base_version"], result["rows"], result["since"]), ("v1", 60, None))
+        bundle = load_bundle(self.models_dir, "laptop")
+        self.assertNotEqual(bundle.version, "v1")
+        self.assertEqual(len(bundle.model.estimators_), 25)
+        self.assertEqual(bundle.metadata["base_version"], "v1")
+        self.assertEqual(bundle.metadata["data_until"], result["until"])
+        self.assertEqual(bundle.metadata["n_samples"], 300 + result["train_rows"])
+
+    def test_next_run_reads_only_rows_after_data_until(self):
+        self.record_predictions(60)
+        self.retrain()
+        with self.assertRaises(retraining.RetrainingError):
+            self.retrain(dry_run=True)
+
+        self.record_predictions(25)
+        result = self.retrain(dry_run=True)
+        self.assertEqual(result["rows"], 25)
+        self.assertFalse(result["published"])
+
+    def test_regressed_candidate_is_not_published(self):
+        self.record_predictions(60)
+        result = retraining.retrain(
+            "laptop", models_dir=self.models_dir, rounds=5, min_rows=20, max_regression=-1.0,
+        )
+        self.assertFalse(result["accepted"])
+        self.assertFalse(result["published"])
+        self.assertEqual(active_version(self.models_dir, "laptop"), "v1")
+
+    def test_active_compact_bundle_is_rebuilt_from_the_full_forest(self):
+        model, scaler, encoders, feature_names = self.base
+        save_bundle(
+            self.models_dir, COMPACT_LAPTOP_BUNDLE, prune_forest(model, 10), scaler, encoders, feature_names,
+            {"full_version": "v1"}, version="v1-compact",
+        )
+        self.record_predictions(60)
+        with self.settings(ML_LAPTOP_VARIANT="compact"):
+            result = self.retrain(compact_budget=1.0)
+
+        full = load_bundle(self.models_dir, "laptop")
+        # Extended from the 20-tree full forest, not the 10-tree compact one
+        self.assertEqual(len(full.model.estimators_), 25)
+        compact = load_bundle(self.models_dir, COMPACT_LAPTOP_BUNDLE)
+        self.assertEqual(compact.version, f"{full.version}-compact")
+        self.assertEqual(compact.metadata["full_version"], full.version)
+        self.assertTrue(result["compact_path"].endswith(compact.version))
+        self.assertNotEqual(
+            LaptopPricePredictor(models_dir=self.models_dir, variant="compact").artifact_version(),
+            LaptopPricePredictor(models_dir=self.models_dir, variant="full").artifact_version(),
+        )
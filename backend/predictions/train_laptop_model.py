@@ -3,36 +3,57 @@ Laptop Resale Price Prediction - Random Forest Model Trainer
 This script trains the ML model and saves it for production use
 """
 
+import argparse
 import pandas as pd
 import numpy as np
-import pickle
 import os
+import sys
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import warnings
 warnings.filterwarnings('ignore')
 
-def train_laptop_model():
-    """Train the laptop price prediction model"""
+if __package__ in (None, ''):
+    # Allow running as a plain script from backend/predictions/
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from predictions.model_bundle import save_bundle
+from predictions.model_compaction import DEFAULT_BUDGET, compact_model, print_report, save_compact_bundle
+from predictions.training_data import (
+    DEFAULT_CHUNK_ROWS, LAPTOP_SCHEMA, PhaseReport, fill_missing, fit_label_encoder,
+    load_training_frame, memory_usage_mb,
+)
+
+def train_laptop_model(chunk_rows=DEFAULT_CHUNK_ROWS, use_cache=True, compact=True,
+                       compact_budget=DEFAULT_BUDGET):
+    """Train the laptop price prediction model
+
+    The dataset is read ``chunk_rows`` at a time into compact dtypes and
+    cached as columns next to the CSV unless ``use_cache`` is False. With
+    ``compact`` a smaller serving model within ``compact_budget`` relative
+    MAE of the forest is saved as the ``laptop_compact`` bundle.
+    """
     print("=" * 80)
     print("LAPTOP RESALE PRICE PREDICTION - MODEL TRAINING")
     print("=" * 80)
+    report = PhaseReport()
     
     # Load dataset
     print("\n📁 Loading dataset...")
+    report.begin("load")
     dataset_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'dataset', 'laptop.csv')
     
     if not os.path.exists(dataset_path):
         raise FileNotFoundError(f"Dataset not found at {dataset_path}")
     
-    df = pd.read_csv(dataset_path)
-    print(f"✅ Dataset loaded: {df.shape[0]:,} samples, {df.shape[1]} features")
+    df_processed = load_training_frame(dataset_path, LAPTOP_SCHEMA, chunk_rows=chunk_rows, use_cache=use_cache)
+    print(f"✅ Dataset loaded: {df_processed.shape[0]:,} samples, {df_processed.shape[1]} features "
+          f"({memory_usage_mb(df_processed)} MB)")
     
     # Data preprocessing
     print("\n🔧 Preprocessing data...")
-    df_processed = df.copy()
+    report.begin("preprocess")
     
     # Check if resale_price exists
     if 'resale_price' not in df_processed.columns:
@@ -40,7 +61,7 @@ def train_laptop_model():
     
     # Identify column types
     numeric_cols = df_processed.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df_processed.select_dtypes(include=['object']).columns.tolist()
+    categorical_cols = df_processed.select_dtypes(include=['object', 'category']).columns.tolist()
     
     # Remove target from numeric columns
     if 'resale_price' in numeric_cols:
@@ -51,16 +72,16 @@ def train_laptop_model():
     for col in numeric_cols:
         if df_processed[col].isnull().sum() > 0:
             median_value = df_processed[col].median()
-            df_processed[col].fillna(median_value if not pd.isna(median_value) else 0, inplace=True)
+            df_processed[col] = df_processed[col].fillna(median_value if not pd.isna(median_value) else 0)
     
     for col in categorical_cols:
         if df_processed[col].isnull().sum() > 0:
             mode_value = df_processed[col].mode()
-            df_processed[col].fillna(mode_value[0] if len(mode_value) > 0 else 'Unknown', inplace=True)
+            df_processed[col] = fill_missing(df_processed[col], mode_value[0] if len(mode_value) > 0 else 'Unknown')
     
     # Handle target variable missing values
     if df_processed['resale_price'].isnull().sum() > 0:
-        df_processed['resale_price'].fillna(df_processed['resale_price'].median(), inplace=True)
+        df_processed['resale_price'] = df_processed['resale_price'].fillna(df_processed['resale_price'].median())
     
     # Feature Engineering
     print("  - Feature engineering...")
@@ -69,7 +90,7 @@ def train_laptop_model():
     if 'device_age_years' not in df_processed.columns and 'launch_year' in df_processed.columns:
         current_year = 2025
         df_processed['device_age_years'] = current_year - df_processed['launch_year']
-        df_processed['device_age_years'].fillna(0, inplace=True)
+        df_processed['device_age_years'] = df_processed['device_age_years'].fillna(0)
     
     # Depreciation percentage
     if 'launch_price' in df_processed.columns:
@@ -85,20 +106,19 @@ def train_laptop_model():
         df_processed['ram_category'] = pd.cut(df_processed['ram'],
                                                bins=[0, 4, 8, 16, 32, 100],
                                                labels=['Low', 'Medium', 'High', 'Very_High', 'Ultra'])
-        df_processed['ram_category'] = df_processed['ram_category'].cat.add_categories(['Unknown'])
-        df_processed['ram_category'].fillna('Unknown', inplace=True)
+        df_processed['ram_category'] = df_processed['ram_category'].cat.add_categories(['Unknown']).fillna('Unknown')
     
     # Storage category
     if 'storage_size' in df_processed.columns:
         df_processed['storage_category'] = pd.cut(df_processed['storage_size'],
                                                    bins=[0, 256, 512, 1024, 2048, 10000],
                                                    labels=['Small', 'Medium', 'Large', 'Very_Large', 'Ultra'])
-        df_processed['storage_category'] = df_processed['storage_category'].cat.add_categories(['Unknown'])
-        df_processed['storage_category'].fillna('Unknown', inplace=True)
+        df_processed['storage_category'] = df_processed['storage_category'].cat.add_categories(['Unknown']).fillna('Unknown')
     
     # Separate features and target
-    y = df_processed['resale_price'].copy()
+    y = df_processed['resale_price']
     X = df_processed.drop('resale_price', axis=1)
+    del df_processed
     
     # Encode categorical variables
     print("  - Encoding categorical variables...")
@@ -106,10 +126,10 @@ def train_laptop_model():
     categorical_features = X.select_dtypes(include=['object', 'category']).columns
     
     for col in categorical_features:
-        le = LabelEncoder()
-        X[col] = X[col].astype(str).replace('nan', 'Unknown')
-        X[col] = le.fit_transform(X[col])
-        label_encoders[col] = le
+        column = X[col]
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(str).replace('nan', 'Unknown')
+        X[col], label_encoders[col] = fit_label_encoder(column)
     
     # Final data cleaning
     X = X.apply(pd.to_numeric, errors='coerce')
@@ -118,7 +138,7 @@ def train_laptop_model():
     for col in X.columns:
         if X[col].isnull().sum() > 0:
             median_val = X[col].median()
-            X[col].fillna(median_val if not pd.isna(median_val) else 0, inplace=True)
+            X[col] = X[col].fillna(median_val if not pd.isna(median_val) else 0)
     
     # Handle outliers by capping
     print("  - Handling outliers...")
@@ -137,6 +157,9 @@ def train_laptop_model():
     
     # Feature Scaling
     print("\n📏 Scaling features...")
+    report.begin("scale + split")
+    # The forest trains on float32 anyway; halves the scaled matrix
+    X = X.astype(np.float32)
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
     X_scaled = pd.DataFrame(X_scaled, columns=X.columns, index=X.index)
@@ -150,6 +173,7 @@ def train_laptop_model():
     
     # Train Random Forest model
     print("\n🤖 Training Random Forest model...")
+    report.begin("train")
     rf_model = RandomForestRegressor(
         n_estimators=100,
         max_depth=15,
@@ -163,6 +187,7 @@ def train_laptop_model():
     
     # Evaluate model
     print("\n📊 Evaluating model...")
+    report.begin("evaluate")
     y_pred = rf_model.predict(X_test)
     
     mae = mean_absolute_error(y_test, y_pred)
@@ -177,31 +202,11 @@ def train_laptop_model():
     print(f"  RMSE:              ₹{rmse:,.2f}")
     
     # Save model and artifacts
-    print("\n💾 Saving model and artifacts...")
+    print("\n💾 Saving model bundle...")
+    report.begin("save")
     models_dir = os.path.join(os.path.dirname(__file__), 'ml_models')
     os.makedirs(models_dir, exist_ok=True)
     
-    # Save model
-    model_path = os.path.join(models_dir, 'laptop_price_model.pkl')
-    with open(model_path, 'wb') as f:
-        pickle.dump(rf_model, f)
-    
-    # Save scaler
-    scaler_path = os.path.join(models_dir, 'laptop_scaler.pkl')
-    with open(scaler_path, 'wb') as f:
-        pickle.dump(scaler, f)
-    
-    # Save label encoders
-    encoders_path = os.path.join(models_dir, 'laptop_label_encoders.pkl')
-    with open(encoders_path, 'wb') as f:
-        pickle.dump(label_encoders, f)
-    
-    # Save feature names
-    features_path = os.path.join(models_dir, 'laptop_feature_names.pkl')
-    with open(features_path, 'wb') as f:
-        pickle.dump(list(X.columns), f)
-    
-    # Save metadata
     metadata = {
         'r2_score': r2,
         'accuracy': accuracy,
@@ -211,15 +216,30 @@ def train_laptop_model():
         'n_samples': X.shape[0],
         'feature_names': list(X.columns)
     }
-    metadata_path = os.path.join(models_dir, 'laptop_model_metadata.pkl')
-    with open(metadata_path, 'wb') as f:
-        pickle.dump(metadata, f)
-    
-    print(f"✅ Model saved to: {model_path}")
-    print(f"✅ Scaler saved to: {scaler_path}")
-    print(f"✅ Encoders saved to: {encoders_path}")
-    print(f"✅ Features saved to: {features_path}")
-    print(f"✅ Metadata saved to: {metadata_path}")
+    bundle_path = save_bundle(
+        models_dir, 'laptop',
+        model=rf_model,
+        scaler=scaler,
+        label_encoders=label_encoders,
+        feature_names=list(X.columns),
+        metadata=metadata,
+    )
+    print(f"✅ Bundle saved to: {bundle_path}")
+
+    if compact:
+        print(f"\n🗜️ Building compact serving model (MAE budget {compact_budget * 100:g}%)...")
+        report.begin("compact")
+        compact_rf, compaction = compact_model(rf_model, X_train, X_test, y_test, budget=compact_budget)
+        print_report(compaction, compact_budget)
+        if compact_rf is None:
+            print("⚠️  No candidate within the MAE budget; serving stays on the full model")
+        else:
+            compact_path = save_compact_bundle(
+                models_dir, bundle_path, compact_rf, compaction, scaler, label_encoders,
+                list(X.columns), metadata, compact_budget,
+            )
+            print(f"✅ Compact bundle saved to: {compact_path}")
+    report.print_summary()
     
     print("\n" + "=" * 80)
     print("🎉 MODEL TRAINING COMPLETE!")
@@ -229,5 +249,16 @@ def train_laptop_model():
 
 
 if __name__ == '__main__':
-    train_laptop_model()
+    parser = argparse.ArgumentParser(description='Train the laptop price model')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='CSV rows parsed per chunk')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse the CSV even if a cached columnar copy exists')
+    parser.add_argument('--compact-budget', type=float, default=DEFAULT_BUDGET,
+                        help='Largest relative MAE increase allowed for the compact model')
+    parser.add_argument('--no-compact', action='store_true',
+                        help='Skip building the compact serving model')
+    args = parser.parse_args()
+    train_laptop_model(chunk_rows=args.chunk_rows, use_cache=not args.no_cache,
+                       compact=not args.no_compact, compact_budget=args.compact_budget)
 
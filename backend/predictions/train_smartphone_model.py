@@ -3,25 +3,43 @@ Smartphone Resale Price Prediction - XGBoost Model Trainer
 Adapts the provided Colab notebook so it can run inside this project.
 """
 
+import argparse
 from pathlib import Path
-import pickle
+import sys
 import warnings
 
 import numpy as np
 import pandas as pd
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.preprocessing import StandardScaler
 from xgboost import XGBRegressor
 
 warnings.filterwarnings("ignore")
 
-
-def train_smartphone_model():
-    """Train the smartphone price prediction model and persist artifacts."""
+if __package__ in (None, ""):
+    # Allow running as a plain script from backend/predictions/
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from predictions.feature_engineering import (
+    CATEGORICAL_TO_ENCODE, SMARTPHONE_FEATURES, convert_warranty, engineer_features,
+)
+from predictions.model_bundle import save_bundle
+from predictions.training_data import (
+    DEFAULT_CHUNK_ROWS, SMARTPHONE_SCHEMA, PhaseReport, fill_missing, fit_label_encoder,
+    load_training_frame, memory_usage_mb,
+)
+
+
+def train_smartphone_model(chunk_rows=DEFAULT_CHUNK_ROWS, use_cache=True):
+    """Train the smartphone price prediction model and persist artifacts.
+
+    The dataset is read ``chunk_rows`` at a time into compact dtypes and
+    cached as columns next to the CSV unless ``use_cache`` is False.
+    """
     print("=" * 90)
     print("SMARTPHONE RESALE PRICE PREDICTION - MODEL TRAINING")
     print("=" * 90)
+    report = PhaseReport()
 
     # ------------------------------------------------------------------
     # Load dataset
@@ -31,8 +49,11 @@ def train_smartphone_model():
         raise FileNotFoundError(f"Dataset not found at {dataset_path}")
 
     print(f"\n[INFO] Loading dataset from {dataset_path}")
-    df = pd.read_csv(dataset_path)
-    print(f"[INFO] Dataset loaded: {df.shape[0]:,} rows × {df.shape[1]} columns")
+    report.begin("load")
+    df_clean = load_training_frame(dataset_path, SMARTPHONE_SCHEMA, chunk_rows=chunk_rows, use_cache=use_cache)
+    raw_columns = set(df_clean.columns)
+    print(f"[INFO] Dataset loaded: {df_clean.shape[0]:,} rows × {df_clean.shape[1]} columns "
+          f"({memory_usage_mb(df_clean)} MB)")
 
     # ------------------------------------------------------------------
     # Data cleaning
@@ -40,8 +61,7 @@ def train_smartphone_model():
     print("\n" + "=" * 90)
     print("DATA CLEANING")
     print("=" * 90)
-
-    df_clean = df.copy()
+    report.begin("clean")
 
     columns_to_drop = ['Title', 'price_raw', 'garbage', 'condition_note', 'Price(INR)']
     df_clean.drop(columns=[c for c in columns_to_drop if c in df_clean.columns], inplace=True, errors='ignore')
@@ -54,58 +74,22 @@ def train_smartphone_model():
     q1 = df_clean['resale_price'].quantile(0.01)
     q99 = df_clean['resale_price'].quantile(0.99)
     df_clean = df_clean[(df_clean['resale_price'] >= q1) & (df_clean['resale_price'] <= q99)]
+    # Categories only seen in dropped rows must not reach the model stats
+    for col in df_clean.select_dtypes(include='category').columns:
+        df_clean[col] = df_clean[col].cat.remove_unused_categories()
     print(f"[INFO] Removed {initial_count - len(df_clean):,} outlier rows")
     print(f"[INFO] Dataset after cleaning: {len(df_clean):,} rows")
 
-    # ------------------------------------------------------------------
-    # Feature engineering helpers
-    # ------------------------------------------------------------------
-    condition_map = {
-        'Like New': 10, 'Good': 8, 'Fair': 6, 'Average': 5,
-        'Used': 5, 'Refurbished': 7, 'Screen Damage': 2, 'No Box': 6
-    }
-    premium_brands = ['Apple', 'Samsung', 'Google', 'Oneplus', 'Nothing']
-    seller_map = {'Store': 3, 'Refurbisher': 2, 'Individual': 1}
-
-    def convert_warranty(val):
-        if pd.isna(val):
-            return 0
-        if isinstance(val, (int, float)):
-            return float(val)
-        val_str = str(val).strip().lower()
-        if 'under warranty' in val_str or 'yes' in val_str:
-            return 12
-        if val_str in ['0', 'no', 'none', '']:
-            return 0
-        try:
-            return float(val_str)
-        except ValueError:
-            return 0
-
-    def score_accessories(acc):
-        if pd.isna(acc):
-            return 0
-        acc_str = str(acc).lower()
-        score = 0
-        if 'charger' in acc_str:
-            score += 2
-        if 'earphone' in acc_str or 'headphone' in acc_str:
-            score += 2
-        if 'box' in acc_str:
-            score += 2
-        if 'bill' in acc_str:
-            score += 1
-        return score
-
     # ------------------------------------------------------------------
     # Feature engineering
     # ------------------------------------------------------------------
     print("\n" + "=" * 90)
     print("FEATURE ENGINEERING")
     print("=" * 90)
+    report.begin("feature engineering")
 
     if 'brand' in df_clean.columns:
-        df_clean['brand'] = df_clean['brand'].astype(str).str.strip().str.title()
+        df_clean['brand'] = df_clean['brand'].astype(str).str.strip().str.title().astype('category')
 
     numerical_cols = [
         'storage_GB', 'RAM_GB', 'Battery %', 'battery_health', 'camera_rear_mp',
@@ -115,11 +99,11 @@ def train_smartphone_model():
 
     for col in numerical_cols:
         if col in df_clean.columns:
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
-            df_clean[col].fillna(df_clean[col].median(), inplace=True)
+            column = pd.to_numeric(df_clean[col], errors='coerce')
+            df_clean[col] = column.fillna(column.median())
 
     if 'warranty' in df_clean.columns:
-        df_clean['warranty'] = df_clean['warranty'].apply(convert_warranty)
+        df_clean['warranty'] = convert_warranty(df_clean['warranty'])
 
     binary_cols = ['supports_5g', 'screen_cracked', 'body_damage']
     for col in binary_cols:
@@ -132,13 +116,13 @@ def train_smartphone_model():
     ]
     for col in categorical_cols:
         if col in df_clean.columns:
-            df_clean[col].fillna('Unknown', inplace=True)
+            df_clean[col] = fill_missing(df_clean[col], 'Unknown')
 
     current_year = pd.Timestamp.now().year
     if 'purchase_date' in df_clean.columns:
         df_clean['purchase_date'] = pd.to_datetime(df_clean['purchase_date'], errors='coerce')
         df_clean['device_age_years'] = (pd.Timestamp.now() - df_clean['purchase_date']).dt.days / 365.25
-        df_clean['device_age_years'].fillna(df_clean['device_age_years'].median(), inplace=True)
+        df_clean['device_age_years'] = df_clean['device_age_years'].fillna(df_clean['device_age_years'].median())
     elif 'launch_year' in df_clean.columns:
         df_clean['device_age_years'] = current_year - df_clean['launch_year']
         # Clip the age to be between 0 and 15. This is crucial to prevent the scaler
@@ -146,77 +130,22 @@ def train_smartphone_model():
         # of the underprediction bug.
         df_clean['device_age_years'] = df_clean['device_age_years'].clip(0, 15)
 
-    if 'price_numeric' in df_clean.columns:
-        df_clean['price_numeric'].fillna(df_clean['price_numeric'].median(), inplace=True)
-        df_clean['log_price'] = np.log1p(df_clean['price_numeric'])
-        df_clean['depreciation_rate'] = df_clean['price_numeric'] / (df_clean['device_age_years'] + 1)
-        df_clean['expected_value'] = df_clean['price_numeric'] * (0.85 ** df_clean['device_age_years'])
-
-    if {'storage_GB', 'RAM_GB'}.issubset(df_clean.columns):
-        df_clean['total_memory_score'] = df_clean['storage_GB'] + (df_clean['RAM_GB'] * 8)
-        df_clean['memory_ratio'] = df_clean['storage_GB'] / (df_clean['RAM_GB'] + 1)
-        df_clean['is_high_memory'] = ((df_clean['storage_GB'] >= 128) & (df_clean['RAM_GB'] >= 6)).astype(int)
-
-    if {'camera_rear_mp', 'camera_front_mp'}.issubset(df_clean.columns):
-        df_clean['total_camera'] = df_clean['camera_rear_mp'] + df_clean['camera_front_mp']
-        df_clean['camera_quality'] = df_clean['camera_rear_mp'] / (df_clean['camera_front_mp'] + 1)
-        df_clean['is_good_camera'] = (df_clean['camera_rear_mp'] >= 48).astype(int)
-
-    if {'Battery %', 'battery_health'}.issubset(df_clean.columns):
-        df_clean['battery_avg'] = (df_clean['Battery %'] + df_clean['battery_health']) / 2
-        df_clean['battery_score'] = df_clean['battery_avg'] * np.exp(-0.05 * df_clean['device_age_years'])
-
-    if 'condition' in df_clean.columns:
-        df_clean['condition_score'] = df_clean['condition'].map(condition_map).fillna(5)
-
-    df_clean['damage_penalty'] = 0
-    if 'screen_cracked' in df_clean.columns:
-        df_clean['damage_penalty'] += df_clean['screen_cracked'] * 5
-    if 'body_damage' in df_clean.columns:
-        df_clean['damage_penalty'] += df_clean['body_damage'] * 2
-
-    df_clean['device_quality'] = (
-        df_clean.get('condition_score', 5) * 3 +
-        df_clean.get('battery_score', 80) / 10 +
-        df_clean.get('warranty', 0) / 2 -
-        df_clean.get('damage_penalty', 0)
-    )
-
-    if 'brand' in df_clean.columns:
-        df_clean['is_premium_brand'] = df_clean['brand'].isin(premium_brands).astype(int)
-
-    if 'launch_year' in df_clean.columns:
-        df_clean['is_modern'] = (df_clean['launch_year'] >= 2020).astype(int)
-        df_clean['year_squared'] = df_clean['launch_year'] ** 2
-
-    if 'display_size_inch' in df_clean.columns:
-        df_clean['is_large_display'] = (df_clean['display_size_inch'] >= 6.5).astype(int)
-
-    if 'supports_5g' in df_clean.columns:
-        df_clean['5g_premium'] = df_clean['supports_5g'] * df_clean.get('is_modern', 1)
-
-    if 'accessories' in df_clean.columns:
-        df_clean['accessories_value'] = df_clean['accessories'].apply(score_accessories)
-
-    if 'seller_type' in df_clean.columns:
-        df_clean['seller_reliability'] = df_clean['seller_type'].map(seller_map).fillna(2)
-
     df_clean['model_popularity'] = 1
     df_clean['model_avg_resale'] = df_clean['resale_price'].median()
     if 'ModelName' in df_clean.columns:
         model_counts = df_clean['ModelName'].value_counts()
-        df_clean['model_popularity'] = df_clean['ModelName'].map(model_counts).fillna(1)
-        model_mean_price = df_clean.groupby('ModelName')['resale_price'].mean()
-        df_clean['model_avg_resale'] = df_clean['ModelName'].map(model_mean_price).fillna(df_clean['resale_price'].median())
+        df_clean['model_popularity'] = df_clean['ModelName'].map(model_counts).astype(float).fillna(1)
+        model_mean_price = df_clean.groupby('ModelName', observed=True)['resale_price'].mean()
+        df_clean['model_avg_resale'] = (
+            df_clean['ModelName'].map(model_mean_price).astype(float).fillna(df_clean['resale_price'].median())
+        )
     else:
         model_counts = pd.Series(dtype=int)
         model_mean_price = pd.Series(dtype=float)
 
-    if 'price_numeric' in df_clean.columns:
-        df_clean['price_age_interaction'] = df_clean['price_numeric'] * np.exp(-0.1 * df_clean['device_age_years'])
-        df_clean['price_condition_interaction'] = df_clean['price_numeric'] * (df_clean.get('condition_score', 5) / 10)
+    engineer_features(df_clean)
 
-    created_features = len([c for c in df_clean.columns if c not in df.columns])
+    created_features = len([c for c in df_clean.columns if c not in raw_columns])
     print(f"[INFO] Created {created_features} engineered features")
 
     # ------------------------------------------------------------------
@@ -225,43 +154,28 @@ def train_smartphone_model():
     print("\n" + "=" * 90)
     print("ENCODING CATEGORICAL FEATURES")
     print("=" * 90)
+    report.begin("encode + scale")
 
-    categorical_to_encode = ['brand', 'processor', 'display_type', 'seller_type', 'seller_location']
     label_encoders = {}
-    for col in categorical_to_encode:
+    for col in CATEGORICAL_TO_ENCODE:
         if col in df_clean.columns:
-            le = LabelEncoder()
-            df_clean[f'{col}_encoded'] = le.fit_transform(df_clean[col].astype(str))
+            df_clean[f'{col}_encoded'], le = fit_label_encoder(df_clean[col])
             label_encoders[col] = le
             print(f"[INFO] Encoded {col} ({len(le.classes_)} categories)")
 
     # ------------------------------------------------------------------
     # Feature selection
     # ------------------------------------------------------------------
-    features_to_use = [
-        'storage_GB', 'RAM_GB', 'Battery %', 'battery_health',
-        'camera_rear_mp', 'camera_front_mp', 'display_size_inch',
-        'supports_5g', 'launch_year', 'screen_cracked', 'body_damage', 'warranty',
-        'price_numeric', 'log_price', 'device_age_years', 'depreciation_rate',
-        'expected_value', 'total_memory_score', 'memory_ratio', 'is_high_memory',
-        'total_camera', 'camera_quality', 'is_good_camera', 'battery_avg',
-        'battery_score', 'condition_score', 'damage_penalty', 'device_quality',
-        'is_premium_brand', 'is_modern', 'year_squared', 'is_large_display',
-        '5g_premium', 'accessories_value', 'seller_reliability',
-        'model_popularity', 'model_avg_resale', 'price_age_interaction',
-        'price_condition_interaction', 'brand_encoded', 'processor_encoded',
-        'display_type_encoded', 'seller_type_encoded', 'seller_location_encoded'
-    ]
-
-    features_to_use = [f for f in features_to_use if f in df_clean.columns]
+    features_to_use = [f for f in SMARTPHONE_FEATURES if f in df_clean.columns]
     print(f"[INFO] Total features selected: {len(features_to_use)}")
 
-    X = df_clean[features_to_use].copy()
-    y = np.log1p(df_clean['resale_price'].copy())
+    X = df_clean[features_to_use].apply(pd.to_numeric, errors='coerce')
+    y = np.log1p(df_clean['resale_price'])
 
-    X = X.apply(pd.to_numeric, errors='coerce')
     X = X.replace([np.inf, -np.inf], np.nan)
     X = X.fillna(X.median())
+    # XGBoost trains on float32 anyway; halves the scaled matrix
+    X = X.astype(np.float32)
 
     # ------------------------------------------------------------------
     # Scale features
@@ -297,6 +211,7 @@ def train_smartphone_model():
     print("\n" + "=" * 90)
     print("5-FOLD CROSS-VALIDATION")
     print("=" * 90)
+    report.begin("cross-validation")
 
     cv_model = XGBRegressor(
         n_estimators=800,
@@ -323,6 +238,7 @@ def train_smartphone_model():
     print("\n" + "=" * 90)
     print("TRAINING FINAL XGBOOST MODEL")
     print("=" * 90)
+    report.begin("train")
 
     final_model = XGBRegressor(
         n_estimators=1000,
@@ -348,6 +264,7 @@ def train_smartphone_model():
     print("\n" + "=" * 90)
     print("MODEL EVALUATION")
     print("=" * 90)
+    report.begin("evaluate")
 
     # Get log-predictions
     y_pred_train_log = final_model.predict(X_train)
@@ -396,22 +313,11 @@ def train_smartphone_model():
     print("\n" + "=" * 90)
     print("SAVING MODEL ARTIFACTS")
     print("=" * 90)
+    report.begin("save")
 
     models_dir = Path(__file__).resolve().parent / "ml_models"
     models_dir.mkdir(parents=True, exist_ok=True)
 
-    with open(models_dir / "smartphone_price_model.pkl", "wb") as f:
-        pickle.dump(final_model, f)
-
-    with open(models_dir / "smartphone_feature_names.pkl", "wb") as f:
-        pickle.dump(features_to_use, f)
-
-    with open(models_dir / "smartphone_label_encoders.pkl", "wb") as f:
-        pickle.dump(label_encoders, f)
-
-    with open(models_dir / "smartphone_scaler.pkl", "wb") as f:
-        pickle.dump(scaler, f)
-
     metadata = {
         'r2_score': float(test_r2),
         'accuracy': float(test_r2 * 100),
@@ -424,17 +330,21 @@ def train_smartphone_model():
         'n_samples': len(df_clean),
         'median_resale_price': float(df_clean['resale_price'].median())
     }
-    with open(models_dir / "smartphone_model_metadata.pkl", "wb") as f:
-        pickle.dump(metadata, f)
-
     stats_payload = {
         'model_popularity': model_counts.to_dict() if 'model_counts' in locals() else {},
         'model_avg_resale': model_mean_price.to_dict() if 'model_mean_price' in locals() else {},
     }
-    with open(models_dir / "smartphone_model_stats.pkl", "wb") as f:
-        pickle.dump(stats_payload, f)
-
-    print("[INFO] Artifacts saved to backend/predictions/ml_models/")
+    bundle_path = save_bundle(
+        str(models_dir), "smartphone",
+        model=final_model,
+        scaler=scaler,
+        label_encoders=label_encoders,
+        feature_names=features_to_use,
+        metadata=metadata,
+        stats=stats_payload,
+    )
+    print(f"[INFO] Model bundle saved to {bundle_path}")
+    report.print_summary()
     print("\n" + "=" * 90)
     print("SMARTPHONE MODEL TRAINING COMPLETE!")
     print("=" * 90)
@@ -443,5 +353,11 @@ def train_smartphone_model():
 
 
 if __name__ == "__main__":
-    train_smartphone_model()
+    parser = argparse.ArgumentParser(description="Train the smartphone price model")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="CSV rows parsed per chunk")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse the CSV even if a cached columnar copy exists")
+    args = parser.parse_args()
+    train_smartphone_model(chunk_rows=args.chunk_rows, use_cache=not args.no_cache)
 
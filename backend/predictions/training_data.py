@@ -0,0 +1,331 @@
+"""
+Training Data
+Chunked, compactly typed CSV ingestion with a cached columnar copy
+
+The trainers load their datasets through ``load_training_frame``: the CSV
+is parsed ``chunk_rows`` at a time straight into compact dtypes (categoricals
+for text, float32 for measurements), so loading peaks at the compact frame
+plus one chunk instead of a full frame of Python strings. The result is
+cached as one ``.npy`` file per column next to the dataset, and later runs
+load that instead of parsing the CSV again.
+
+Only ingestion is chunked: the compact frame of the whole dataset is held
+in memory, and the forest / XGBoost models are fit on all of it at once, so
+training memory still grows with the dataset size.
+"""
+
+import hashlib
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sklearn.preprocessing import LabelEncoder
+
+
+DEFAULT_CHUNK_ROWS = 100_000
+CACHE_FORMAT_VERSION = 2
+
+# Raw columns may contain blanks, so numbers are float32 (NaN-capable) and
+# text is categorical (int8/int16 codes). Targets keep float64. The dtype of
+# a column not listed is inferred from the first chunk (see read_csv_chunked).
+LAPTOP_SCHEMA = {
+    'brand': 'category', 'model': 'category', 'launch_year': 'float32',
+    'launch_price': 'float32', 'processor': 'category', 'ram': 'float32',
+    'storage_type': 'category', 'storage_size': 'float32', 'gpu': 'category',
+    'screen_size': 'float32', 'battery_cycle_count': 'float32', 'condition': 'category',
+    'warranty_remaining': 'float32', 'seller_location': 'category',
+    'device_age_years': 'float32', 'resale_price': 'float64',
+}
+SMARTPHONE_SCHEMA = {
+    'brand': 'category', 'ModelName': 'category', 'processor': 'category',
+    'display_type': 'category', 'condition': 'category', 'seller_type': 'category',
+    'seller_location': 'category', 'accessories': 'category', 'warranty': 'category',
+    'purchase_date': 'category', 'storage_GB': 'float32', 'RAM_GB': 'float32',
+    'Battery %': 'float32', 'battery_health': 'float32', 'camera_rear_mp': 'float32',
+    'camera_front_mp': 'float32', 'display_size_inch': 'float32', 'launch_year': 'float32',
+    'price_numeric': 'float32', 'screen_cracked': 'float32', 'body_damage': 'float32',
+    'supports_5g': 'float32', 'resale_price': 'float64',
+}
+
+
+# ----------------------------------------------------------------------
+# Memory and phase reporting
+# ----------------------------------------------------------------------
+def _proc_status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """High-water RSS since the last ``reset_peak_rss`` (process lifetime elsewhere)."""
+    peak = _proc_status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def current_rss_mb():
+    rss = _proc_status_mb('VmRSS')
+    return rss if rss is not None else peak_rss_mb()
+
+
+def reset_peak_rss():
+    """Restart the RSS high-water mark (Linux only; a no-op elsewhere)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class PhaseReport:
+    """Records wall time and memory for each phase of a training run.
+
+    ``begin(name)`` closes the running phase (if any) and starts the next
+    one; the peak RSS of a phase is its own high-water mark where the
+    platform allows resetting it, else the process peak so far.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._current = None
+
+    def begin(self, name):
+        self.end()
+        reset_peak_rss()
+        self._current = (name, time.perf_counter())
+
+    def end(self):
+        if self._current is None:
+            return
+        name, start = self._current
+        self._current = None
+        self.phases.append({
+            'phase': name,
+            'seconds': round(time.perf_counter() - start, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'rss_mb': current_rss_mb(),
+        })
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def print_summary(self):
+        self.end()
+        print(f"\n{'Phase':<24}{'Wall time':>12}{'Peak RSS':>14}{'End RSS':>14}")
+        for entry in self.phases:
+            print(
+                f"{entry['phase']:<24}{entry['seconds']:>11.2f}s"
+                f"{entry['peak_rss_mb']:>11.1f} MB{entry['rss_mb']:>11.1f} MB"
+            )
+        total = sum(entry['seconds'] for entry in self.phases)
+        print(f"{'Total':<24}{total:>11.2f}s")
+
+
+# ----------------------------------------------------------------------
+# Chunked CSV ingestion
+# ----------------------------------------------------------------------
+def _infer_dtype(values):
+    """float32 when every non-blank text value parses as a number, else category."""
+    present = values.dropna()
+    if pd.to_numeric(present, errors='coerce').notna().all():
+        return 'float32'
+    return 'category'
+
+
+def _convert_chunk(chunk, schema, inferred=()):
+    for col in chunk.columns:
+        dtype = schema[col]
+        if dtype == 'category':
+            chunk[col] = chunk[col].astype('category')
+            continue
+        values = pd.to_numeric(chunk[col], errors='coerce')
+        if col in inferred:
+            bad = values.isna() & chunk[col].notna()
+            if bad.any():
+                raise ValueError(
+                    f"Column {col!r} is not in the schema and was read as numbers, but row "
+                    f"{bad.idxmax() + 1} is {chunk[col][bad].iloc[0]!r}; add it to the schema"
+                )
+        # Junk in listed numeric columns becomes NaN, as the trainers' to_numeric did
+        chunk[col] = values.astype(dtype)
+    return chunk
+
+
+def read_csv_chunked(csv_path, schema, chunk_rows=DEFAULT_CHUNK_ROWS, usecols=None):
+    """Parse ``csv_path`` chunk by chunk into a DataFrame with ``schema`` dtypes.
+
+    A column missing from ``schema`` is read as float32 when all of its
+    values in the first chunk are numbers (raising ValueError if a later
+    chunk has text in it), else as a categorical.
+
+    Returns the complete frame: chunking bounds the parsing overhead, not
+    the size of the result.
+    """
+    parts = {}
+    columns = None
+    schema = dict(schema)
+    inferred = {}
+    # Every cell is parsed as text and converted per chunk, so a column never
+    # changes dtype between chunks
+    reader = pd.read_csv(csv_path, dtype=str, chunksize=chunk_rows, usecols=usecols)
+    for chunk in reader:
+        if columns is None:
+            columns = list(chunk.columns)
+            for col in columns:
+                if col not in schema:
+                    inferred[col] = schema[col] = _infer_dtype(chunk[col])
+            if inferred:
+                print("⚠️  Columns not in the schema (dtype inferred): " + ", ".join(
+                    f"{col}={dtype}" for col, dtype in inferred.items()
+                ))
+        chunk = _convert_chunk(chunk, schema, inferred)
+        for col in columns:
+            parts.setdefault(col, []).append(chunk[col].array)
+        del chunk
+
+    if columns is None:
+        return pd.DataFrame()
+
+    data = {}
+    for col in columns:
+        arrays = parts.pop(col)
+        if isinstance(arrays[0], pd.Categorical):
+            data[col] = union_categoricals(arrays)
+        else:
+            data[col] = np.concatenate([np.asarray(arr) for arr in arrays])
+        del arrays
+    return pd.DataFrame(data, columns=columns)
+
+
+# ----------------------------------------------------------------------
+# Columnar cache
+# ----------------------------------------------------------------------
+def _fingerprint(csv_path, schema, usecols):
+    stat = os.stat(csv_path)
+    payload = json.dumps({
+        'path': os.path.abspath(csv_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'schema': schema,
+        'usecols': sorted(usecols) if usecols else None,
+        'format': CACHE_FORMAT_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _cache_path(csv_path, schema, usecols, cache_dir):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(csv_path)), '.cache')
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{_fingerprint(csv_path, schema, usecols)}")
+
+
+def save_columns(frame, path):
+    """Write ``frame`` as one .npy file per column plus a manifest (atomically)."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    manifest = {'rows': len(frame), 'columns': []}
+    for idx, col in enumerate(frame.columns):
+        series = frame[col]
+        entry = {'name': col, 'file': f"{idx}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry['categories'] = f"{idx}.categories.npy"
+            np.save(os.path.join(tmp_path, entry['file']), series.cat.codes.to_numpy())
+            np.save(os.path.join(tmp_path, entry['categories']), np.asarray(series.cat.categories, dtype=str))
+        else:
+            np.save(os.path.join(tmp_path, entry['file']), series.to_numpy())
+        manifest['columns'].append(entry)
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_columns(path):
+    """Load a frame written by ``save_columns``."""
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    data = {}
+    for entry in manifest['columns']:
+        values = np.load(os.path.join(path, entry['file']))
+        if 'categories' in entry:
+            categories = np.load(os.path.join(path, entry['categories']))
+            values = pd.Categorical.from_codes(values, categories.astype(object))
+        data[entry['name']] = values
+    return pd.DataFrame(data, columns=[entry['name'] for entry in manifest['columns']])
+
+
+def load_training_frame(csv_path, schema, chunk_rows=DEFAULT_CHUNK_ROWS, use_cache=True,
+                        cache_dir=None, usecols=None):
+    """Load a training dataset with compact dtypes, reusing the columnar cache.
+
+    The cache is keyed on the CSV's path, size and modification time and on
+    the schema, so editing either rebuilds it.
+    """
+    cache_path = _cache_path(csv_path, schema, usecols, cache_dir) if use_cache else None
+    if cache_path and os.path.exists(os.path.join(cache_path, 'manifest.json')):
+        try:
+            frame = load_columns(cache_path)
+            print(f"✅ Loaded cached columns from {cache_path}")
+            return frame
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"⚠️  Ignoring unreadable dataset cache {cache_path}: {exc}")
+
+    frame = read_csv_chunked(csv_path, schema, chunk_rows=chunk_rows, usecols=usecols)
+    if cache_path:
+        try:
+            save_columns(frame, cache_path)
+            print(f"✅ Cached parsed columns to {cache_path}")
+        except OSError as exc:
+            print(f"⚠️  Could not write dataset cache {cache_path}: {exc}")
+    return frame
+
+
+def memory_usage_mb(frame):
+    return round(frame.memory_usage(deep=True).sum() / (1024 * 1024), 1)
+
+
+def fill_missing(series, value):
+    """``series.fillna(value)`` that also works for categoricals lacking ``value``."""
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        if not series.isna().any():
+            return series
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+def fit_label_encoder(series):
+    """Fit a LabelEncoder on ``series`` as strings; returns ``(codes, encoder)``.
+
+    Categorical columns are encoded once per category and broadcast by
+    code instead of sorting every row's string.
+    """
+    encoder = LabelEncoder()
+    if isinstance(series.dtype, pd.CategoricalDtype) and not series.isna().any():
+        series = series.cat.remove_unused_categories()
+        categories = series.cat.categories.astype(str)
+        encoder.fit(categories)
+        codes = encoder.transform(categories)[series.cat.codes.to_numpy()]
+        return codes, encoder
+    return encoder.fit_transform(series.astype(str)), encoder
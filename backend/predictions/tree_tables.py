@@ -0,0 +1,119 @@
+"""
+Tree Tables
+Flattens trained tree ensembles into plain NumPy node arrays
+"""
+
+import json
+
+import numpy as np
+
+
+# Names of the per-node arrays produced by export_tree_tables
+TABLE_ARRAYS = ("roots", "left", "right", "feature", "threshold", "value", "default_left")
+
+
+def _concat_trees(trees):
+    """Concatenate per-tree node lists into global arrays with shifted child ids."""
+    roots, left, right, feature, threshold, value, default_left = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        n_nodes = len(tree["left"])
+        roots.append(offset)
+        tree_left = np.asarray(tree["left"], dtype=np.int64)
+        tree_right = np.asarray(tree["right"], dtype=np.int64)
+        # Leaves keep -1, internal nodes point into the global arrays
+        left.append(np.where(tree_left >= 0, tree_left + offset, -1))
+        right.append(np.where(tree_right >= 0, tree_right + offset, -1))
+        feature.append(np.asarray(tree["feature"], dtype=np.int64))
+        threshold.append(np.asarray(tree["threshold"], dtype=np.float64))
+        value.append(np.asarray(tree["value"], dtype=np.float64))
+        default_left.append(np.asarray(tree["default_left"], dtype=np.uint8))
+        offset += n_nodes
+
+    return {
+        "roots": np.asarray(roots, dtype=np.int64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold),
+        "value": np.concatenate(value),
+        "default_left": np.concatenate(default_left),
+    }
+
+
+def _export_sklearn_forest(model):
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        trees.append({
+            "left": np.where(is_leaf, -1, tree.children_left),
+            "right": np.where(is_leaf, -1, tree.children_right),
+            "feature": np.where(is_leaf, 0, tree.feature),
+            "threshold": tree.threshold,
+            "value": tree.value[:, 0, 0],
+            # sklearn >= 1.3 records where NaN goes at each split
+            "default_left": getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8)),
+        })
+    tables = _concat_trees(trees)
+    meta = {
+        "kind": "sklearn_forest",
+        # sklearn: go left when float32(x) <= threshold, average the trees;
+        # NaN follows default_left
+        "comparison": "le",
+        "aggregation": "mean",
+        "base_score": 0.0,
+        "n_features": int(model.n_features_in_),
+    }
+    return meta, tables
+
+
+def _export_xgboost(model):
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    gbtree = learner["gradient_booster"]
+    if gbtree.get("name") != "gbtree":
+        raise ValueError(f"Unsupported XGBoost booster: {gbtree.get('name')}")
+
+    trees = []
+    for tree in gbtree["model"]["trees"]:
+        if tree.get("categories_nodes"):
+            raise ValueError("Categorical XGBoost splits are not supported")
+        left = np.asarray(tree["left_children"])
+        is_leaf = left < 0
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        trees.append({
+            "left": left,
+            "right": np.asarray(tree["right_children"]),
+            "feature": np.where(is_leaf, 0, tree["split_indices"]),
+            "threshold": conditions,
+            # Leaf weights are stored in split_conditions
+            "value": np.where(is_leaf, conditions, 0.0),
+            "default_left": tree["default_left"],
+        })
+    tables = _concat_trees(trees)
+
+    base_score = learner["learner_model_param"]["base_score"].strip("[]")
+    meta = {
+        "kind": "xgboost",
+        # xgboost: go left when float32(x) < threshold, NaN follows default_left
+        "comparison": "lt",
+        "aggregation": "sum",
+        "base_score": float(np.float32(base_score)),
+        "n_features": int(learner["learner_model_param"]["num_feature"]),
+    }
+    return meta, tables
+
+
+def export_tree_tables(model):
+    """Return ``(meta, arrays)`` describing every tree of ``model``.
+
+    Supports sklearn forests (anything exposing ``estimators_`` with a
+    ``tree_``) and XGBoost regressors/boosters. Raises ValueError for other
+    model types.
+    """
+    if hasattr(model, "estimators_") and all(hasattr(est, "tree_") for est in model.estimators_):
+        return _export_sklearn_forest(model)
+    if hasattr(model, "get_booster") or type(model).__name__ == "Booster":
+        return _export_xgboost(model)
+    raise ValueError(f"Cannot export tree tables for {type(model).__name__}")
@@ -5,6 +5,13 @@ urlpatterns = [
     # Prediction endpoints
     path('laptop/', views.predict_laptop_price, name='predict_laptop'),
     path('smartphone/', views.predict_smartphone_price, name='predict_smartphone'),
+    path('laptop/bulk/', views.predict_laptop_price_bulk, name='predict_laptop_bulk'),
+    path('smartphone/bulk/', views.predict_smartphone_price_bulk, name='predict_smartphone_bulk'),
+    path('laptop/depreciation/', views.laptop_depreciation_curve, name='laptop_depreciation_curve'),
+    path('smartphone/depreciation/', views.smartphone_depreciation_curve, name='smartphone_depreciation_curve'),
+    path('repricing/', views.create_repricing_job, name='create_repricing_job'),
+    path('repricing/<int:job_id>/', views.get_repricing_job, name='get_repricing_job'),
+    path('repricing/<int:job_id>/download/', views.download_repricing_result, name='download_repricing_result'),
     
     # History and info endpoints
     path('history/', views.get_prediction_history, name='prediction_history'),
@@ -1,28 +1,61 @@
+import hashlib
+import os
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import FileResponse
 from .serializers import (
     LaptopPredictionInputSerializer,
     LaptopPredictionOutputSerializer,
     SmartphonePredictionInputSerializer,
     SmartphonePredictionOutputSerializer,
+    DepreciationCurveSerializer,
+    RepricingJobSerializer,
     ListingSerializer,
     ConversationSerializer,
     MessageSerializer,
 )
-from .models import LaptopPrediction, SmartphonePrediction, Listing, Conversation, Message
-from .ml_service import laptop_predictor, smartphone_predictor
+from .models import LaptopPrediction, SmartphonePrediction, Listing, Conversation, Message, RepricingJob
+from .ml_service import (
+    get_laptop_predictor, get_smartphone_predictor, predict, predict_many, depreciation_curve, registry,
+)
+from .micro_batcher import PredictionTimeout
+from .inference_executor import InferenceOverloaded
 from .imei_service import get_specs_from_imei
+from .comparables import PREDICTION, comparables, prediction_row
+from .market_index import market_index
+from . import repricing
 
 User = get_user_model()
 
+# Upper bound on rows accepted by the bulk prediction endpoints
+MAX_BULK_PREDICTIONS = 5000
+
+# Future ages priced by the depreciation curve endpoints when none are given
+DEFAULT_CURVE_MONTHS = [0, 6, 12, 24]
+
+
+def _comparables(device_type, prediction):
+    """Nearest past predictions/active listings backing up a saved prediction."""
+    try:
+        return comparables.find(
+            device_type, prediction_row(prediction), exclude=[(PREDICTION, prediction.pk)],
+        )
+    except Exception as e:
+        # Comparables are supporting context; never fail the prediction over them
+        print(f"⚠️  Warning: {device_type} comparables unavailable: {e}")
+        return []
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def predict_laptop_price(request):
     """Predict laptop resale price"""
+    laptop_predictor = get_laptop_predictor()
     if laptop_predictor is None:
         return Response(
             {
@@ -50,7 +83,15 @@ def predict_laptop_price(request):
         
         # Make prediction
         try:
-            prediction_result = laptop_predictor.predict(data)
+            prediction_result = predict('laptop', data)
+        except (PredictionTimeout, InferenceOverloaded) as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': str(e),
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             return Response(
                 {
@@ -99,7 +140,8 @@ def predict_laptop_price(request):
                     'confidence_score': prediction_result['confidence_score'],
                     'price_range': prediction_result['price_range'],
                 },
-                'model_info': prediction_result['model_metrics']
+                'model_info': prediction_result['model_metrics'],
+                'comparables': _comparables('laptop', laptop_prediction),
             },
             status=status.HTTP_200_OK
         )
@@ -118,6 +160,7 @@ def predict_laptop_price(request):
 @permission_classes([AllowAny])
 def predict_smartphone_price(request):
     """Predict smartphone resale price"""
+    smartphone_predictor = get_smartphone_predictor()
     if smartphone_predictor is None:
         return Response(
             {
@@ -144,7 +187,15 @@ def predict_smartphone_price(request):
 
         # Make prediction
         try:
-            prediction_result = smartphone_predictor.predict(data)
+            prediction_result = predict('smartphone', data)
+        except (PredictionTimeout, InferenceOverloaded) as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': str(e),
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             return Response(
                 {
@@ -196,7 +247,8 @@ def predict_smartphone_price(request):
                 'message': 'Prediction successful',
                 'data': output_serializer.data,
                 'prediction': prediction_result,
-                'model_info': prediction_result['model_metrics']
+                'model_info': prediction_result['model_metrics'],
+                'comparables': _comparables('smartphone', smartphone_prediction),
             },
             status=status.HTTP_200_OK
         )
@@ -211,6 +263,373 @@ def predict_smartphone_price(request):
         )
 
 
+def _bulk_predict(request, predictor, input_serializer_class, device_label):
+    """Shared body of the bulk prediction endpoints."""
+    if predictor is None:
+        return Response(
+            {
+                'success': False,
+                'message': f'{device_label} model not loaded. Please run train_{device_label.lower()}_model.py and restart the server.'
+            },
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    try:
+        devices = request.data.get('devices') if hasattr(request.data, 'get') else None
+        if not isinstance(devices, list) or not devices:
+            return Response(
+                {
+                    'success': False,
+                    'message': "'devices' must be a non-empty list"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(devices) > MAX_BULK_PREDICTIONS:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'At most {MAX_BULK_PREDICTIONS} devices can be priced per request'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validate every row with the single-prediction rules
+        input_serializer = input_serializer_class(data=devices, many=True)
+        if not input_serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Invalid input data',
+                    'errors': input_serializer.errors
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            prediction_results = predict_many(device_label.lower(), input_serializer.validated_data)
+        except (PredictionTimeout, InferenceOverloaded) as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': str(e),
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except Exception as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'Prediction error: {str(e)}',
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return Response(
+            {
+                'success': True,
+                'message': 'Prediction successful',
+                'count': len(prediction_results),
+                'predictions': [
+                    {
+                        'predicted_price': result['predicted_price'],
+                        'confidence_score': result['confidence_score'],
+                        'price_range': result['price_range'],
+                    }
+                    for result in prediction_results
+                ],
+                'model_info': prediction_results[0]['model_metrics']
+            },
+            status=status.HTTP_200_OK
+        )
+
+    except Exception as e:
+        return Response(
+            {
+                'success': False,
+                'message': f'Server error: {str(e)}'
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def predict_laptop_price_bulk(request):
+    """Predict resale prices for a batch of laptops (not saved to history)"""
+    return _bulk_predict(request, get_laptop_predictor(), LaptopPredictionInputSerializer, 'Laptop')
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def predict_smartphone_price_bulk(request):
+    """Predict resale prices for a batch of smartphones (not saved to history)"""
+    return _bulk_predict(request, get_smartphone_predictor(), SmartphonePredictionInputSerializer, 'Smartphone')
+
+
+def _depreciation_curve(request, name, input_serializer_class, device_label):
+    """Shared body of the depreciation curve endpoints."""
+    predictor = registry.get(name)
+    if predictor is None:
+        return Response(
+            {
+                'success': False,
+                'message': f'{device_label} model not loaded. Please run train_{name}_model.py and restart the server.'
+            },
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    try:
+        if not hasattr(request.data, 'get'):
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Expected a JSON object with the device specs'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Every condition is priced, so the spec does not need one
+        spec_data = request.data.copy()
+        spec_data.setdefault('condition', predictor.condition_choices[0])
+        input_serializer = input_serializer_class(data=spec_data)
+        options_serializer = DepreciationCurveSerializer(data=request.data)
+        if not input_serializer.is_valid() or not options_serializer.is_valid():
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Invalid input data',
+                    'errors': {**input_serializer.errors, **options_serializer.errors}
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        spec = dict(input_serializer.validated_data)
+        spec.pop('condition', None)
+        months = sorted(set(options_serializer.validated_data.get('months', DEFAULT_CURVE_MONTHS)))
+
+        # Same spec + months + model version -> same grid
+        spec_hash = hashlib.sha1(f"{predictor.cache.make_key(spec)}:{months}".encode()).hexdigest()
+        etag = f'"{spec_hash}"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        cache_key = f'depreciation:{name}:{spec_hash}'
+        payload = cache.get(cache_key)
+        if payload is None:
+            try:
+                curve = depreciation_curve(name, spec, months)
+            except (PredictionTimeout, InferenceOverloaded) as e:
+                return Response(
+                    {
+                        'success': False,
+                        'message': str(e),
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            except Exception as e:
+                return Response(
+                    {
+                        'success': False,
+                        'message': f'Prediction error: {str(e)}',
+                    },
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+
+            payload = {
+                'success': True,
+                'message': 'Depreciation curve computed',
+                'spec_hash': spec_hash,
+                'months': months,
+                'conditions': list(predictor.condition_choices),
+                'curve': [
+                    {
+                        'months_ahead': point['months_ahead'],
+                        'prices': {
+                            condition: {
+                                'predicted_price': result['predicted_price'],
+                                'price_range': result['price_range'],
+                            }
+                            for condition, result in point['prices'].items()
+                        },
+                    }
+                    for point in curve
+                ],
+                'model_info': predictor.get_model_info(),
+            }
+            cache.set(cache_key, payload, timeout=predictor.cache.ttl_seconds)
+
+        return Response(
+            payload,
+            status=status.HTTP_200_OK,
+            headers={'ETag': etag, 'Cache-Control': f'private, max-age={predictor.cache.ttl_seconds}'}
+        )
+
+    except Exception as e:
+        return Response(
+            {
+                'success': False,
+                'message': f'Server error: {str(e)}'
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def laptop_depreciation_curve(request):
+    """Predicted laptop prices over future ages for every condition"""
+    return _depreciation_curve(request, 'laptop', LaptopPredictionInputSerializer, 'Laptop')
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def smartphone_depreciation_curve(request):
+    """Predicted smartphone prices over future ages for every condition"""
+    return _depreciation_curve(request, 'smartphone', SmartphonePredictionInputSerializer, 'Smartphone')
+
+
+@api_view(['POST'])
+def create_repricing_job(request):
+    """Upload a CSV of devices to be priced in the background"""
+    try:
+        if not request.user.is_authenticated:
+            return Response(
+                {
+                    'success': False,
+                    'message': 'Authentication required'
+                },
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        device_type = request.data.get('device_type')
+        upload = request.FILES.get('file')
+        if device_type not in repricing.INPUT_SERIALIZERS or upload is None:
+            return Response(
+                {
+                    'success': False,
+                    'message': "A CSV 'file' and a 'device_type' of laptop or smartphone are required"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_upload_mb = repricing.job_settings()['MAX_UPLOAD_MB']
+        if upload.size > max_upload_mb * 1024 * 1024:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'CSV files are limited to {max_upload_mb} MB'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if registry.get(device_type) is None:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'{device_type.capitalize()} model not loaded. Please run train_{device_type}_model.py and restart the server.'
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        max_active = repricing.job_settings()['MAX_ACTIVE_PER_USER']
+        if repricing.active_jobs(request.user) >= max_active:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'You already have {max_active} repricing jobs queued or running; wait for one to finish'
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        job = RepricingJob.objects.create(
+            user=request.user,
+            device_type=device_type,
+            original_filename=upload.name[:255],
+        )
+        job.input_path = os.path.join(repricing.job_dir(job.id), 'input.csv')
+        repricing.save_upload(upload, job.input_path)
+        job.save(update_fields=['input_path'])
+        repricing.start_job(job)
+
+        return Response(
+            {
+                'success': True,
+                'message': 'Repricing job queued',
+                'data': RepricingJobSerializer(job).data
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    except Exception as e:
+        return Response(
+            {
+                'success': False,
+                'message': f'Server error: {str(e)}'
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_repricing_job(request, job_id):
+    """Status and progress of a repricing job"""
+    if not request.user.is_authenticated:
+        return Response(
+            {
+                'success': False,
+                'message': 'Authentication required'
+            },
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    job = RepricingJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return Response(
+            {
+                'success': False,
+                'message': 'Repricing job not found'
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(
+        {
+            'success': True,
+            'data': RepricingJobSerializer(job).data
+        },
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['GET'])
+def download_repricing_result(request, job_id):
+    """Download the priced CSV of a completed repricing job"""
+    if not request.user.is_authenticated:
+        return Response(
+            {
+                'success': False,
+                'message': 'Authentication required'
+            },
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    job = RepricingJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return Response(
+            {
+                'success': False,
+                'message': 'Repricing job not found'
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if job.status != 'completed' or not os.path.exists(job.output_path):
+        return Response(
+            {
+                'success': False,
+                'message': f'Result is not available (job is {job.status})'
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+    base_name = os.path.splitext(job.original_filename or 'devices')[0]
+    return FileResponse(
+        open(job.output_path, 'rb'),
+        as_attachment=True,
+        filename=f'{base_name}_priced.csv',
+        content_type='text/csv'
+    )
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_prediction_history(request):
@@ -260,6 +679,8 @@ def get_prediction_history(request):
 def get_model_info(request):
     """Get ML model information"""
     try:
+        laptop_predictor = get_laptop_predictor()
+        smartphone_predictor = get_smartphone_predictor()
         laptop_info = laptop_predictor.get_model_info() if laptop_predictor else None
         smartphone_info = smartphone_predictor.get_model_info() if smartphone_predictor else None
         
@@ -277,7 +698,16 @@ def get_model_info(request):
                 'success': True,
                 'data': {
                     'laptop': laptop_info,
-                    'smartphone': smartphone_info
+                    'smartphone': smartphone_info,
+                    'prediction_cache': {
+                        'laptop': laptop_predictor.cache.stats() if laptop_predictor else None,
+                        'smartphone': smartphone_predictor.cache.stats() if smartphone_predictor else None,
+                    },
+                    'prediction_batching': registry.batching_stats(),
+                    'inference_executor': registry.executor_stats(),
+                    'model_registry': registry.rollout_stats(),
+                    'comparables': comparables.stats(),
+                    'market_index': market_index.stats(),
                 }
             },
             status=status.HTTP_200_OK
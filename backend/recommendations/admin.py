@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import RequirementQuery, ProductResult
+from .models import RequirementQuery, ProductResult, ScrapeCacheEntry
 
 @admin.register(RequirementQuery)
 class RequirementQueryAdmin(admin.ModelAdmin):
@@ -12,3 +12,9 @@ class ProductResultAdmin(admin.ModelAdmin):
     list_display = ['product_name', 'rank', 'price', 'match_score', 'rating']
     search_fields = ['product_name', 'brand']
     list_filter = ['rank', 'match_score', 'rating']
+
+@admin.register(ScrapeCacheEntry)
+class ScrapeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['retailer', 'query_key', 'fetched_at']
+    search_fields = ['query_key', 'query']
+    list_filter = ['retailer', 'fetched_at']
@@ -10,6 +10,9 @@ from datetime import timedelta
 
 from users.permissions import IsSuperAdmin, IsAdminUser
 from .models import RequirementQuery, ProductResult, SystemMetric, SystemConfiguration
+from .http_fetcher import fetch_log
+from .scrape_cache import scrape_cache
+from .scrapers import browser_pool
 
 
 @api_view(['GET'])
@@ -110,6 +113,10 @@ def admin_system_health(request):
                 'max_response_time_ms': api_metrics.get('max_response_time', 0),
             },
             'errors_24h': error_count,
+            # These for this worker process only
+            'browser_pool': browser_pool.stats(),
+            'scrape_strategies': fetch_log.stats(),
+            'scrape_cache': scrape_cache.stats(),
             'timestamp': now.isoformat(),
         }
         
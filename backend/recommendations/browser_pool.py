@@ -0,0 +1,218 @@
+"""
+Browser Pool
+Bounded pool of warm headless browser sessions shared by the scrapers
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+DEFAULT_POOL_CONFIG = {
+    'SIZE': 4,
+    'MAX_USES': 50,
+    'ACQUIRE_TIMEOUT_SECONDS': 15.0,
+    'PAGE_LOAD_TIMEOUT_SECONDS': 30.0,
+    'BLOCK_RESOURCES': True,
+}
+# Poll interval while waiting for a free session (cancellation checks)
+ACQUIRE_POLL_SECONDS = 0.5
+# Run after a lease: the storage of the page the search left off on
+CLEAR_STORAGE_SCRIPT = "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+
+
+def pool_setting(name):
+    return getattr(settings, 'BROWSER_POOL', {}).get(name, DEFAULT_POOL_CONFIG[name])
+
+
+class BrowserSession:
+    """One browser with its lease count."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class BrowserPool:
+    """Bounded set of reusable browser sessions.
+
+    ``lease`` hands out an idle session (health-checked first), starts a
+    new one while fewer than SIZE exist, or waits for one to be returned.
+    On return the session's cookies and storage are cleared and it is
+    parked on ``about:blank``; a session that crashed, failed to reset or
+    reached MAX_USES leases is quit and replaced on demand.
+    """
+
+    def __init__(self, driver_factory):
+        self.driver_factory = driver_factory
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # Browsers belong to the parent's chromedriver processes; a forked
+            # child starts with an empty pool
+            os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.close)
+
+    def _reset(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._open = 0
+        self.leases = 0
+        self.started = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.start_failures = 0
+        self.timeouts = 0
+        self.waited = 0
+        self.wait_ms = 0.0
+
+    @contextmanager
+    def lease(self, deadline=None, cancel=None):
+        """Context manager yielding a browser driver, or None if none could be had.
+
+        Waits for a free session until ``deadline`` (a ``time.monotonic()``
+        value, else ACQUIRE_TIMEOUT_SECONDS) or until ``cancel`` is set.
+        A browser that died during the lease fails its reset on return and
+        is replaced.
+        """
+        session = self._acquire(deadline, cancel)
+        if session is None:
+            yield None
+            return
+        try:
+            self._prepare(session, deadline)
+            yield session.driver
+        finally:
+            self._release(session)
+
+    def _acquire(self, deadline, cancel):
+        if deadline is None:
+            deadline = time.monotonic() + pool_setting('ACQUIRE_TIMEOUT_SECONDS')
+        size = max(1, pool_setting('SIZE'))
+        wait_started = None
+        while True:
+            with self._condition:
+                while True:
+                    session = self._idle.popleft() if self._idle else None
+                    if session is not None or self._open < size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                        self.timeouts += 1
+                        return None
+                    if wait_started is None:
+                        wait_started = time.monotonic()
+                        self.waited += 1
+                    self._condition.wait(min(remaining, ACQUIRE_POLL_SECONDS))
+                if session is None:
+                    # Reserve the slot before starting the browser outside the lock
+                    self._open += 1
+                if wait_started is not None:
+                    self.wait_ms += (time.monotonic() - wait_started) * 1000
+                    wait_started = None
+
+            if session is None:
+                session = self._start()
+                if session is None:
+                    return None
+            elif not self._healthy(session):
+                self.crashed += 1
+                self._discard(session)
+                continue
+
+            session.uses += 1
+            self.leases += 1
+            return session
+
+    def _start(self):
+        try:
+            driver = self.driver_factory()
+        except Exception as exc:
+            print(f"Error initializing Chrome driver: {exc}")
+            driver = None
+        if driver is None:
+            self.start_failures += 1
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            return None
+        self.started += 1
+        return BrowserSession(driver)
+
+    def _healthy(self, session):
+        try:
+            session.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _prepare(self, session, deadline):
+        timeout = pool_setting('PAGE_LOAD_TIMEOUT_SECONDS')
+        if deadline is not None:
+            # Page loads may not outlive the caller's deadline either
+            timeout = min(timeout, deadline - time.monotonic())
+        session.driver.set_page_load_timeout(max(1, timeout))
+
+    def _clean(self, session):
+        driver = session.driver
+        try:
+            driver.delete_all_cookies()
+            driver.execute_script(CLEAR_STORAGE_SCRIPT)
+            driver.get("about:blank")
+            return True
+        except Exception:
+            return False
+
+    def _release(self, session):
+        if session.uses >= pool_setting('MAX_USES'):
+            self.recycled += 1
+        elif self._clean(session):
+            with self._condition:
+                self._idle.append(session)
+                self._condition.notify()
+            return
+        else:
+            self.crashed += 1
+        self._discard(session)
+
+    def _discard(self, session):
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    def close(self):
+        """Quit every idle session (sessions on lease are quit on return)."""
+        with self._condition:
+            sessions = list(self._idle)
+            self._idle.clear()
+        for session in sessions:
+            self._discard(session)
+
+    def stats(self):
+        with self._condition:
+            open_sessions = self._open
+            idle = len(self._idle)
+        return {
+            "size": pool_setting('SIZE'),
+            "max_uses": pool_setting('MAX_USES'),
+            "open": open_sessions,
+            "idle": idle,
+            "in_use": open_sessions - idle,
+            "leases": self.leases,
+            "started": self.started,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "start_failures": self.start_failures,
+            "waited": self.waited,
+            "timeouts": self.timeouts,
+            "mean_wait_ms": round(self.wait_ms / self.waited, 2) if self.waited else 0.0,
+        }
+
@@ -0,0 +1,99 @@
+"""
+Recommendation Components
+Process-wide instances of the recommendation pipeline engines
+"""
+
+import os
+import threading
+
+from django.conf import settings
+
+from .availability_checker import AvailabilityChecker
+from .constraint_validator import ConstraintValidator
+from .llm_service import LLMService
+from .ml_ranker import DEFAULT_MODEL_FILE, EnhancedRanker, MLProductRanker
+from .partial_match_scorer import PartialMatchScorer
+from .scrapers import ProductSearcher
+from .semantic_matcher import SemanticMatcher
+from .sidba_engine import SIDBAEngine
+from .spec_verifier import SpecVerifier
+
+
+def ranker_model_path():
+    return getattr(settings, "RECOMMENDATIONS", {}).get("RANKER_MODEL_PATH") or DEFAULT_MODEL_FILE
+
+
+def _build_ranker():
+    return EnhancedRanker(MLProductRanker(model_file=ranker_model_path()))
+
+
+def _build_llm_service():
+    return LLMService(ranker=components.get("ranker"))
+
+
+class ComponentRegistry:
+    """Process-wide, lazily built recommendation engines.
+
+    The engines keep no per-request state, so one instance of each serves
+    every request of the process. (DynamicProductManager is not one of
+    them: it keeps price caches and history, so views build it per
+    request.) A component is built on first ``get`` or
+    by ``warmup``; a factory that raises (e.g. LLMService without an API
+    key) is retried on the next ``get``. The ranker only ever loads its
+    model artifact: without one it ranks rule-based.
+    """
+
+    def __init__(self, factories):
+        self._factories = dict(factories)
+        self._instances = {}
+        # Re-entrant: building the LLM service fetches the shared ranker
+        self._lock = threading.RLock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        # A lock held by another thread at fork time would never be released
+        self._lock = threading.RLock()
+
+    @property
+    def names(self):
+        return list(self._factories)
+
+    def get(self, name):
+        component = self._instances.get(name)
+        if component is None:
+            with self._lock:
+                component = self._instances.get(name)
+                if component is None:
+                    component = self._instances[name] = self._factories[name]()
+        return component
+
+    def warmup(self):
+        """Build every component; returns the names that could be built."""
+        loaded = []
+        for name in self._factories:
+            try:
+                self.get(name)
+            except Exception as exc:
+                print(f"⚠️  Warning: could not build recommendation component {name}: {exc}")
+                continue
+            loaded.append(name)
+        return loaded
+
+
+components = ComponentRegistry({
+    "ranker": _build_ranker,
+    "llm": _build_llm_service,
+    "product_searcher": ProductSearcher,
+    "sidba_engine": SIDBAEngine,
+    "semantic_matcher": SemanticMatcher,
+    "partial_scorer": PartialMatchScorer,
+    "constraint_validator": ConstraintValidator,
+    "spec_verifier": SpecVerifier,
+    "availability_checker": AvailabilityChecker,
+})
+
+
+def warmup():
+    """Build the recommendation engines and load the ranking model."""
+    return components.warmup()
@@ -0,0 +1,127 @@
+"""
+HTTP Fetcher
+Plain HTTP fast path for retailer search pages, with per-query strategy stats
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from bs4 import BeautifulSoup
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+DEFAULT_FETCH_CONFIG = {
+    'ENABLED': True,
+    'TIMEOUT_SECONDS': 5.0,
+    'POOL_SIZE': 8,
+}
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-IN,en;q=0.9',
+}
+RECENT_QUERIES = 200
+
+
+def fetch_setting(name):
+    return getattr(settings, 'HTTP_FETCH', {}).get(name, DEFAULT_FETCH_CONFIG[name])
+
+
+def parse_html(html, parse_only=None):
+    """Parse ``html``, keeping only the tags matched by ``parse_only`` (a SoupStrainer)."""
+    return BeautifulSoup(html, HTML_PARSER, parse_only=parse_only)
+
+
+class HttpFetcher:
+    """GETs pages over kept-alive connections.
+
+    requests sessions are not thread-safe, so each thread gets its own
+    session (with a POOL_SIZE connection pool) and reuses it across
+    searches instead of reconnecting to the retailer every time.
+    """
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # Don't share the parent's open sockets with a forked child
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            size = fetch_setting('POOL_SIZE')
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(HEADERS)
+            self._local.session = session
+        return session
+
+    def get(self, url, deadline=None):
+        """Return ``(html, None)``, or ``(None, reason)`` when the page could not be fetched."""
+        timeout = fetch_setting('TIMEOUT_SECONDS')
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                return None, 'deadline'
+        try:
+            response = self.session().get(url, timeout=timeout)
+        except requests.Timeout:
+            return None, 'timeout'
+        except requests.RequestException as exc:
+            return None, f'error: {exc.__class__.__name__}'
+        if response.status_code != 200:
+            return None, f'status {response.status_code}'
+        return response.text, None
+
+
+class FetchStrategyLog:
+    """Which strategy (http or browser) served each retailer query."""
+
+    def __init__(self, recent=RECENT_QUERIES):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=recent)
+        self.counts = {}
+
+    def record(self, retailer, query, strategy, products, elapsed_ms, fallback_reason=None):
+        with self._lock:
+            counts = self.counts.setdefault(retailer, {'http': 0, 'browser': 0})
+            counts[strategy] += 1
+            self.recent.append({
+                'retailer': retailer,
+                'query': query,
+                'strategy': strategy,
+                'fallback_reason': fallback_reason,
+                'products': products,
+                'elapsed_ms': round(elapsed_ms, 1),
+            })
+
+    def stats(self):
+        with self._lock:
+            retailers = {}
+            for retailer, counts in self.counts.items():
+                total = counts['http'] + counts['browser']
+                retailers[retailer] = {
+                    **counts,
+                    'http_hit_rate': round(counts['http'] / total, 4) if total else None,
+                }
+            return {'retailers': retailers, 'recent': list(self.recent)}
+
+
+http_fetcher = HttpFetcher()
+fetch_log = FetchStrategyLog()
@@ -5,7 +5,9 @@ from decouple import config as decouple_config
 
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, ranker=None):
+        # Shared EnhancedRanker; built per call when not given
+        self.ranker = ranker
         # Try to get API key from decouple config (reads from .env), fall back to os.getenv
         api_key = decouple_config('GROQ_API_KEY', default=None)
         if not api_key:
@@ -451,8 +453,10 @@ REMEMBER: budget_max is an ABSOLUTE CEILING. negative_constraints are VETO condi
         
         # Use enhanced ranker
         try:
-            from .ml_ranker import EnhancedRanker
-            ranker = EnhancedRanker()
+            ranker = self.ranker
+            if ranker is None:
+                from .ml_ranker import EnhancedRanker
+                ranker = EnhancedRanker()
             ranked_products = ranker.rank_products_enhanced(requirements, products)
             print(f"[ENHANCED RANKING] Successfully ranked {len(ranked_products)} products")
             return ranked_products
@@ -0,0 +1,18 @@
+"""
+Delete scrape cache entries too old to be served, even as stale.
+
+Usage:
+    python manage.py purge_scrape_cache
+"""
+
+from django.core.management.base import BaseCommand
+
+from recommendations.scrape_cache import scrape_cache
+
+
+class Command(BaseCommand):
+    help = "Delete scrape cache entries older than their TTL plus the stale window"
+
+    def handle(self, *args, **options):
+        deleted = scrape_cache.purge()
+        self.stdout.write(self.style.SUCCESS(f"✅ Deleted {deleted:,} expired scrape cache entries"))
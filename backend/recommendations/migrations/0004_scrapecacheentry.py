@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0003_systemmetric_systemconfiguration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('retailer', models.CharField(max_length=50)),
+                ('query_key', models.CharField(help_text='Normalized search query', max_length=255)),
+                ('query', models.TextField(help_text='Query as last scraped')),
+                ('products', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Scrape Cache Entry',
+                'verbose_name_plural': 'Scrape Cache Entries',
+                'db_table': 'scrape_cache_entries',
+                'indexes': [models.Index(fields=['-fetched_at'], name='scrape_cach_fetched_aef224_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='scrapecacheentry',
+            constraint=models.UniqueConstraint(fields=('retailer', 'query_key'), name='unique_scrape_cache_entry'),
+        ),
+    ]
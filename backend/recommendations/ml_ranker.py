@@ -6,30 +6,84 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
 import pickle
 import os
+import re
+import sys
 from datetime import datetime
 
+from predictions.inference_backends import build_backend
+from predictions.ml_config import ml_setting
+
+
+# Fixed artifact location (backend/product_ranker_model.pkl), independent
+# of the working directory the server was started from
+DEFAULT_MODEL_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'product_ranker_model.pkl'
+)
+
+FEATURES = [
+    'price', 'rating', 'ram_gb', 'storage_gb', 'screen_size',
+    'has_ssd', 'processor_tier', 'brand_premium', 'battery_hours',
+    'weight_kg', 'has_dedicated_gpu', 'refresh_rate'
+]
+# Score given to a product whose features can't be scored
+FALLBACK_SCORE = 50
+
+RAM_PATTERN = re.compile(r'(\d+)\s*gb\s*ram')
+STORAGE_PATTERN = re.compile(r'(\d+)\s*(?:gb|tb)')
+SCREEN_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*["\"]')
+
 
 class MLProductRanker:
-    """Machine Learning-based product ranking system"""
+    """Machine Learning-based product ranking system
+
+    Serving only loads ``model_file``; a missing or unreadable artifact
+    leaves the model unset so callers rank rule-based. Training happens
+    offline: ``python recommendations/ml_ranker.py [model_file]``.
+    """
 
-    def __init__(self):
+    def __init__(self, model_file=None, train_if_missing=False):
         self.model = None
         self.scaler = None
-        self.model_file = 'product_ranker_model.pkl'
-        self.load_or_train_model()
+        self.backend = None
+        self.model_file = model_file or DEFAULT_MODEL_FILE
+        if train_if_missing:
+            self.load_or_train_model()
+        else:
+            self.load_model()
+
+    @property
+    def is_loaded(self):
+        return self.model is not None and self.scaler is not None
+
+    def load_model(self):
+        """Load the model artifact; returns False if it is missing or unreadable"""
+        if not os.path.exists(self.model_file):
+            print(f"⚠️  Warning: ML ranking model not found at {self.model_file}, using rule-based ranking")
+            return False
+        try:
+            with open(self.model_file, 'rb') as f:
+                data = pickle.load(f)
+            self.model = data['model']
+            self.scaler = data['scaler']
+            # Same tree evaluation as the price models: one vectorized walk
+            # per batch instead of a Python call per tree
+            self.backend = build_backend(
+                self.model, len(FEATURES),
+                preferred=ml_setting("ML_INFERENCE_BACKEND", "compiled"), label="Ranking",
+            )
+            print(f"✅ Loaded ML ranking model from {self.model_file}")
+            return True
+        except Exception as e:
+            print(f"⚠️  Warning: ML ranking model loading failed: {e}")
+            self.model = None
+            self.scaler = None
+            self.backend = None
+            return False
 
     def load_or_train_model(self):
         """Load existing model or train new one"""
-        if os.path.exists(self.model_file):
-            try:
-                with open(self.model_file, 'rb') as f:
-                    data = pickle.load(f)
-                    self.model = data['model']
-                    self.scaler = data['scaler']
-                    print("Loaded existing ML ranking model")
-                    return
-            except Exception as e:
-                print(f"Model loading failed: {e}")
+        if self.load_model():
+            return
 
         print("Training new ML ranking model...")
         self.train_model()
@@ -83,11 +137,7 @@ class MLProductRanker:
         df = self.create_training_data()
 
         # Features for training
-        features = [
-            'price', 'rating', 'ram_gb', 'storage_gb', 'screen_size',
-            'has_ssd', 'processor_tier', 'brand_premium', 'battery_hours',
-            'weight_kg', 'has_dedicated_gpu', 'refresh_rate'
-        ]
+        features = FEATURES
 
         X = df[features]
         y = df['user_satisfaction']
@@ -129,40 +179,58 @@ class MLProductRanker:
 
         print("ML ranking model trained and saved")
 
-    def predict_product_score(self, product_features):
-        """Predict user satisfaction score for a product"""
+    def _feature_row(self, product_features):
+        """Model input row (in FEATURES order) for one product"""
+        return [
+            product_features.get('price', 50000),
+            product_features.get('rating', 4.0),
+            product_features.get('ram_gb', 8),
+            product_features.get('storage_gb', 512),
+            product_features.get('screen_size', 15.6),
+            1 if 'ssd' in product_features.get('storage_type', '').lower() else 0,
+            self._get_processor_tier(product_features.get('processor', '')),
+            self._get_brand_premium(product_features.get('brand', '')),
+            product_features.get('battery_hours', 6),
+            product_features.get('weight_kg', 2.0),
+            1 if product_features.get('has_gpu', False) else 0,
+            product_features.get('refresh_rate', 60)
+        ]
+
+    def predict_product_scores(self, products_features):
+        """Predict user satisfaction scores (0-100) for many products at once
+
+        One scaler transform and one model predict for the whole batch.
+        Products whose features aren't numeric get FALLBACK_SCORE.
+        """
+        count = len(products_features)
         if not self.model or not self.scaler:
-            return 0.5  # Default score
+            return np.full(count, 0.5)  # Default score
 
-        try:
-            # Convert product features to array
-            features = [
-                product_features.get('price', 50000),
-                product_features.get('rating', 4.0),
-                product_features.get('ram_gb', 8),
-                product_features.get('storage_gb', 512),
-                product_features.get('screen_size', 15.6),
-                1 if 'ssd' in product_features.get('storage_type', '').lower() else 0,
-                self._get_processor_tier(product_features.get('processor', '')),
-                self._get_brand_premium(product_features.get('brand', '')),
-                product_features.get('battery_hours', 6),
-                product_features.get('weight_kg', 2.0),
-                1 if product_features.get('has_gpu', False) else 0,
-                product_features.get('refresh_rate', 60)
-            ]
-
-            # Scale features
-            features_scaled = self.scaler.transform([features])
-
-            # Predict
-            score = self.model.predict(features_scaled)[0]
+        scores = np.full(count, float(FALLBACK_SCORE))
+        matrix = np.empty((count, len(FEATURES)), dtype=np.float64)
+        valid = np.zeros(count, dtype=bool)
+        for i, product_features in enumerate(products_features):
+            try:
+                matrix[i] = self._feature_row(product_features)
+                valid[i] = True
+            except Exception as e:
+                print(f"ML prediction error: {e}")
+        if not valid.any():
+            return scores
 
+        try:
+            # Named columns, as the scaler was fitted on a DataFrame
+            features_scaled = self.scaler.transform(pd.DataFrame(matrix[valid], columns=FEATURES))
             # Convert to 0-100 scale
-            return max(0, min(100, score * 100))
-
+            predict = self.backend.predict if self.backend is not None else self.model.predict
+            scores[valid] = np.clip(predict(features_scaled) * 100, 0, 100)
         except Exception as e:
             print(f"ML prediction error: {e}")
-            return 50  # Fallback score
+        return scores
+
+    def predict_product_score(self, product_features):
+        """Predict user satisfaction score for a product"""
+        return float(self.predict_product_scores([product_features])[0])
 
     def _get_processor_tier(self, processor):
         """Convert processor string to tier"""
@@ -197,26 +265,10 @@ class MLProductRanker:
 class EnhancedRanker:
     """Enhanced ranking system combining ML and rule-based scoring"""
 
-    def __init__(self):
-        self.ml_ranker = MLProductRanker()
-        self.model_loaded = False
-
-        # Try to load existing model
-        try:
-            if os.path.exists(self.ml_ranker.model_file):
-                with open(self.ml_ranker.model_file, 'rb') as f:
-                    model_data = pickle.load(f)
-                    self.ml_ranker.model = model_data['model']
-                    self.ml_ranker.scaler = data['scaler'] if 'scaler' in locals() else model_data['scaler']
-                    # self.ml_ranker.features = model_data['features'] # Might be missing in older models
-                    self.model_loaded = True
-                    # print('Loaded existing ML ranking model')
-            else:
-                pass
-                # print('No existing ML model found, will use rule-based ranking only')
-        except Exception as e:
-            # print(f'Could not load ML model: {e}, using rule-based ranking only')
-            self.model_loaded = False
+    def __init__(self, ml_ranker=None):
+        # Reuse an already loaded MLProductRanker (see recommendations.components)
+        self.ml_ranker = ml_ranker if ml_ranker is not None else MLProductRanker()
+        self.model_loaded = self.ml_ranker.is_loaded
 
     def rank_products_enhanced(self, requirements, products):
         """Rank products using ML + rule-based hybrid approach"""
@@ -232,43 +284,48 @@ class EnhancedRanker:
             return self._rule_based_ranking(requirements, products)
 
     def _ml_enhanced_ranking(self, requirements, products):
-        """Enhanced ranking using ML predictions with rule-based fallback"""
-        ranked_products = []
+        """Enhanced ranking using ML predictions with rule-based fallback
 
-        for product in products:
+        All candidates are scored by the model in one batch; products whose
+        features can't be extracted are ranked on their rule score alone.
+        """
+        features, scored = [], []
+        for index, product in enumerate(products):
             try:
-                # Get ML score
-                ml_score = self.ml_ranker.predict_product_score(self._extract_product_features(product))
-
-                # Get rule-based score
-                rule_score, reasons = self._calculate_rule_score(requirements, product)
+                features.append(self._extract_product_features(product))
+                scored.append(index)
+            except Exception as e:
+                print(f"Error ranking product {product.get('name', 'Unknown')}: {e}")
 
-                # Combine scores (70% ML, 30% rule-based)
-                combined_score = (ml_score * 0.7) + (rule_score * 0.3)
+        ml_scores = np.zeros(len(products))
+        has_ml = np.zeros(len(products), dtype=bool)
+        if scored:
+            ml_scores[scored] = self.ml_ranker.predict_product_scores(features)
+            has_ml[scored] = True
 
-                # Add to results
-                product_copy = product.copy()
-                product_copy['match_score'] = round(combined_score, 1)
-                product_copy['ranking_reasons'] = reasons
-                product_copy['ml_score'] = round(ml_score, 1)
-                product_copy['rule_score'] = round(rule_score, 1)
+        rule_scores = np.zeros(len(products))
+        reasons = [None] * len(products)
+        for index, product in enumerate(products):
+            try:
+                rule_scores[index], reasons[index] = self._calculate_rule_score(requirements, product)
+            except Exception as e:
+                print(f"Double fault ranking {product.get('name', 'Unknown')}: {e}")
 
-                ranked_products.append(product_copy)
+        # Combine scores (70% ML, 30% rule-based)
+        combined = np.where(has_ml, ml_scores * 0.7 + rule_scores * 0.3, rule_scores).round(1)
+        ml_scores = ml_scores.round(1)
+        rule_scores = rule_scores.round(1)
 
-            except Exception as e:
-                product_name = product.get('name', 'Unknown')
-                print(f'Error ranking product {product_name}: {e}')
-                # Fallback to rule-based only - call local method properly!
-                try:
-                    rule_score, reasons = self._calculate_rule_score(requirements, product)
-                    product_copy = product.copy()
-                    product_copy['match_score'] = round(rule_score, 1)
-                    product_copy['ranking_reasons'] = reasons
-                    product_copy['ml_score'] = 0.0
-                    product_copy['rule_score'] = round(rule_score, 1)
-                    ranked_products.append(product_copy)
-                except Exception as e2:
-                    print(f"Double fault ranking {product_name}: {e2}")
+        ranked_products = []
+        for index, product in enumerate(products):
+            if reasons[index] is None:
+                continue
+            product_copy = product.copy()
+            product_copy['match_score'] = float(combined[index])
+            product_copy['ranking_reasons'] = reasons[index]
+            product_copy['ml_score'] = float(ml_scores[index])
+            product_copy['rule_score'] = float(rule_scores[index])
+            ranked_products.append(product_copy)
 
         # Sort by combined score
         ranked_products.sort(key=lambda x: x['match_score'], reverse=True)
@@ -376,8 +433,7 @@ class EnhancedRanker:
         # Storage requirements
         storage_needed = requirements.get('storage_needed_gb', 512)
         if storage_needed:
-            import re
-            storage_match = re.search(r'(\d+)\s*(?:gb|tb)', full_text)
+            storage_match = STORAGE_PATTERN.search(full_text)
             if storage_match:
                 val = int(storage_match.group(1))
                 if 'tb' in full_text:
@@ -417,14 +473,13 @@ class EnhancedRanker:
 
         # Extract RAM
         ram_gb = 8  # default
-        import re
-        ram_match = re.search(r'(\d+)\s*gb\s*ram', specs)
+        ram_match = RAM_PATTERN.search(specs)
         if ram_match:
             ram_gb = int(ram_match.group(1))
 
         # Extract storage
         storage_gb = 512  # default
-        storage_match = re.search(r'(\d+)\s*(?:gb|tb)', specs)
+        storage_match = STORAGE_PATTERN.search(specs)
         if storage_match:
             val = int(storage_match.group(1))
             if 'tb' in specs:
@@ -434,7 +489,7 @@ class EnhancedRanker:
 
         # Extract screen size
         screen_size = 15.6  # default
-        screen_match = re.search(r'(\d+(?:\.\d+)?)\s*["\"]', specs)
+        screen_match = SCREEN_PATTERN.search(specs)
         if screen_match:
             screen_size = float(screen_match.group(1))
 
@@ -463,3 +518,8 @@ class EnhancedRanker:
             'has_gpu': 'rtx' in specs or 'gtx' in specs or 'gpu' in specs,
             'refresh_rate': 120 if '120hz' in specs else 60
         }
+
+
+if __name__ == '__main__':
+    # Offline training: python recommendations/ml_ranker.py [model_file]
+    MLProductRanker(model_file=sys.argv[1] if len(sys.argv) > 1 else None).train_model()
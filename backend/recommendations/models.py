@@ -164,3 +164,27 @@ class SystemConfiguration(models.Model):
         except cls.DoesNotExist:
             return default
 
+
+
+class ScrapeCacheEntry(models.Model):
+    """Last scraped products of one retailer for one normalized search query"""
+    
+    retailer = models.CharField(max_length=50)
+    query_key = models.CharField(max_length=255, help_text="Normalized search query")
+    query = models.TextField(help_text="Query as last scraped")
+    products = models.JSONField(default=list)
+    fetched_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'scrape_cache_entries'
+        verbose_name = 'Scrape Cache Entry'
+        verbose_name_plural = 'Scrape Cache Entries'
+        constraints = [
+            models.UniqueConstraint(fields=['retailer', 'query_key'], name='unique_scrape_cache_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['-fetched_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.retailer}: {self.query_key} ({len(self.products)} products)"
@@ -0,0 +1,272 @@
+"""
+Scrape Cache
+Persistent per-retailer cache of search results with stale-while-revalidate
+"""
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+
+DEFAULT_CACHE_CONFIG = {
+    'ENABLED': True,
+    'TTL_SECONDS': {},
+    'DEFAULT_TTL_SECONDS': 3600,
+    'STALE_SECONDS': 86400,
+    'REFRESH_DEADLINE_SECONDS': 30.0,
+    'REFRESH_WORKERS': 1,
+    'REFRESH_MAX_PENDING': 16,
+}
+NUMBER_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(k|l|lakh|lakhs)\b')
+# "Rs 80000" / "INR 80000" / "₹80000" all price in rupees
+CURRENCY_PATTERN = re.compile(r'(?:\b(?:rs|inr)\.?|₹)\s*(?=\d)')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+MULTIPLIERS = {'k': 1000, 'l': 100000, 'lakh': 100000, 'lakhs': 100000}
+
+
+def cache_setting(name):
+    return getattr(settings, 'SCRAPE_CACHE', {}).get(name, DEFAULT_CACHE_CONFIG[name])
+
+
+def ttl_seconds(retailer):
+    return cache_setting('TTL_SECONDS').get(retailer, cache_setting('DEFAULT_TTL_SECONDS'))
+
+
+def normalize_query(query):
+    """Cache key of a search query.
+
+    Case, punctuation, thousands separators and the currency (``₹``, ``Rs``,
+    ``INR``) are ignored and ``80k`` / ``1.5 lakh`` are spelled out, so
+    "Best gaming laptop under ₹80,000" and "best gaming laptop under 80k"
+    share an entry. Word order and repeated words are kept: the retailers'
+    search results depend on them.
+    """
+    text = CURRENCY_PATTERN.sub('', str(query).lower().replace(',', ''))
+    text = NUMBER_PATTERN.sub(lambda m: str(int(float(m.group(1)) * MULTIPLIERS[m.group(2)])), text)
+    return ' '.join(TOKEN_PATTERN.findall(text))[:255]
+
+
+class _Scrape:
+    """One in-flight scrape of a (retailer, query) key, shared by its waiters."""
+
+    def __init__(self, deadline, background):
+        self.future = Future()
+        self.cancel = threading.Event()
+        # None for a background refresh: its deadline starts when it runs
+        self.deadline = deadline
+        # A background refresh runs to completion even without waiters
+        self.background = background
+        # Started by refresh() (on the refresh pool), not joined by one later
+        self.refresh = background
+        self.waiters = 0
+
+
+class ScrapeCache:
+    """Stale-while-revalidate cache in front of the retailer scrapers.
+
+    ``lookup`` returns a stored entry as fresh (younger than the retailer's
+    TTL) or stale (up to STALE_SECONDS past it). Stale entries are served
+    as-is while ``refresh`` re-scrapes them in the background, on a pool
+    of REFRESH_WORKERS threads kept apart from live searches; beyond
+    REFRESH_MAX_PENDING queued or running refreshes, new ones are skipped
+    (the next stale hit asks again). Misses go through ``join``: concurrent
+    misses for the same key in this process share one scrape, which is only
+    cancelled once every waiter gave up. Empty scrape results are not
+    stored, so a blocked page is retried.
+    """
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # In-flight scrapes belong to the parent's threads
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # Pool threads don't survive a fork; started lazily
+        self._refresh_pool = None
+        self._refresh_pending = 0
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refreshes_skipped = 0
+        self.stored = 0
+        self.errors = 0
+
+    def _count(self, counter):
+        # Lookups and stores run on many request and refresh threads at once
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, retailer, query):
+        """Return ``(products, 'fresh' | 'stale')`` or ``(None, None)`` on a miss."""
+        if not cache_setting('ENABLED'):
+            return None, None
+        from .models import ScrapeCacheEntry
+
+        try:
+            entry = ScrapeCacheEntry.objects.filter(
+                retailer=retailer, query_key=normalize_query(query)
+            ).first()
+        except DatabaseError as exc:
+            self._count('errors')
+            print(f"⚠️  Warning: scrape cache lookup failed: {exc}")
+            return None, None
+        if entry is not None:
+            age = (timezone.now() - entry.fetched_at).total_seconds()
+            ttl = ttl_seconds(retailer)
+            if age < ttl:
+                self._count('fresh_hits')
+                return entry.products, 'fresh'
+            if age < ttl + cache_setting('STALE_SECONDS'):
+                self._count('stale_hits')
+                return entry.products, 'stale'
+        self._count('misses')
+        return None, None
+
+    def join(self, scraper, query, executor, deadline):
+        """Wait on the scrape of ``(scraper, query)``, starting it if none is running.
+
+        Call ``leave`` with the returned scrape once its result is no longer
+        needed.
+        """
+        return self._start(scraper, query, executor, deadline, background=False)
+
+    def leave(self, scrape):
+        with self._lock:
+            scrape.waiters -= 1
+            abandoned = scrape.waiters <= 0 and not scrape.background
+        if abandoned and not scrape.future.done():
+            scrape.cancel.set()
+
+    def refresh(self, scraper, query):
+        """Re-scrape a stale entry in the background (once per key at a time)."""
+        self._start(scraper, query, None, None, background=True)
+
+    def _refresh_executor(self):
+        with self._lock:
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(
+                    max_workers=cache_setting('REFRESH_WORKERS'), thread_name_prefix='scrape-refresh'
+                )
+            return self._refresh_pool
+
+    def _start(self, scraper, query, executor, deadline, background):
+        key = (scraper.retailer, normalize_query(query))
+        if background:
+            executor = self._refresh_executor()
+        with self._lock:
+            scrape = self._inflight.get(key)
+            # A cancelled scrape may still be winding down; don't join it
+            if scrape is not None and not scrape.cancel.is_set():
+                if background:
+                    scrape.background = True
+                else:
+                    scrape.waiters += 1
+                    self.coalesced += 1
+                return scrape
+            if background:
+                if self._refresh_pending >= cache_setting('REFRESH_MAX_PENDING'):
+                    self.refreshes_skipped += 1
+                    return None
+                self._refresh_pending += 1
+                self.refreshes += 1
+            scrape = self._inflight[key] = _Scrape(deadline, background)
+            if not background:
+                scrape.waiters += 1
+        try:
+            executor.submit(self._run, key, scrape, scraper, query)
+        except RuntimeError as exc:
+            # Executor shut down (interpreter exit)
+            self._finish(key, scrape, exc=exc)
+        return scrape
+
+    def _run(self, key, scrape, scraper, query):
+        products, error = None, None
+        if scrape.deadline is None:
+            scrape.deadline = time.monotonic() + cache_setting('REFRESH_DEADLINE_SECONDS')
+        try:
+            products = scraper.search(query, cancel=scrape.cancel, deadline=scrape.deadline)
+            if products and not scrape.cancel.is_set():
+                self.store(scraper.retailer, query, products)
+        except Exception as exc:
+            error = exc
+        finally:
+            # Pool threads outlive requests; don't leave a connection open
+            connection.close()
+            self._finish(key, scrape, products=products, exc=error)
+
+    def _finish(self, key, scrape, products=None, exc=None):
+        with self._lock:
+            if self._inflight.get(key) is scrape:
+                del self._inflight[key]
+            if scrape.refresh:
+                self._refresh_pending -= 1
+        if exc is not None:
+            scrape.future.set_exception(exc)
+        else:
+            scrape.future.set_result(products)
+
+    def store(self, retailer, query, products):
+        if not cache_setting('ENABLED'):
+            return
+        from .models import ScrapeCacheEntry
+
+        try:
+            # One INSERT ... ON CONFLICT statement: concurrent refreshes of a
+            # key can't race each other on the unique constraint
+            ScrapeCacheEntry.objects.bulk_create(
+                [ScrapeCacheEntry(
+                    retailer=retailer,
+                    query_key=normalize_query(query),
+                    query=query,
+                    products=products,
+                    fetched_at=timezone.now(),
+                )],
+                update_conflicts=True,
+                unique_fields=['retailer', 'query_key'],
+                update_fields=['query', 'products', 'fetched_at'],
+            )
+            self._count('stored')
+        except DatabaseError as exc:
+            self._count('errors')
+            print(f"⚠️  Warning: could not store scrape results: {exc}")
+
+    def purge(self):
+        """Delete entries too old to be served even as stale; returns the count."""
+        from .models import ScrapeCacheEntry
+
+        ttl = max([cache_setting('DEFAULT_TTL_SECONDS'), *cache_setting('TTL_SECONDS').values()])
+        cutoff = timezone.now() - timedelta(seconds=ttl + cache_setting('STALE_SECONDS'))
+        deleted, _ = ScrapeCacheEntry.objects.filter(fetched_at__lt=cutoff).delete()
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.fresh_hits + self.stale_hits + self.misses
+            return {
+                "enabled": cache_setting('ENABLED'),
+                "fresh_hits": self.fresh_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.fresh_hits + self.stale_hits) / lookups, 4) if lookups else None,
+                "coalesced": self.coalesced,
+                "refreshes": self.refreshes,
+                "refreshes_skipped": self.refreshes_skipped,
+                "in_flight": len(self._inflight),
+                "stored": self.stored,
+                "errors": self.errors,
+            }
+
+
+scrape_cache = ScrapeCache()
@@ -1,74 +1,231 @@
+import os
 import time
 import random
 import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.conf import settings
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+from .browser_pool import BrowserPool, pool_setting
+from .http_fetcher import fetch_log, fetch_setting, http_fetcher, parse_html
+from .scrape_cache import scrape_cache
+
+
+# Longest wait for a results page to render
+PAGE_WAIT_SECONDS = 10
+DEFAULT_SEARCH_CONFIG = {
+    'MAX_WORKERS': 4,
+    'MAX_QUERIES': 2,
+    'DEADLINE_SECONDS': 20.0,
+    'ENOUGH_PRODUCTS': 5,
+}
+
+
+def search_setting(name):
+    return getattr(settings, 'PRODUCT_SEARCH', {}).get(name, DEFAULT_SEARCH_CONFIG[name])
+
+
+# Requests the scraping browser never makes: images, media, fonts, ads
+# and trackers. Product data only needs the HTML (image URLs are read from
+# the src attributes). Wildcards as accepted by Network.setBlockedURLs.
+BLOCKED_URL_PATTERNS = [
+    '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*',
+    '*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*',
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+    '*doubleclick.net*', '*googlesyndication.com*', '*googletagmanager.com*',
+    '*google-analytics.com*', '*amazon-adsystem.com*', '*facebook.net*',
+    '*scorecardresearch.com*', '*criteo.*', '*fls-eu.amazon.*', '*unagi.amazon.*',
+]
+# Result containers as HTML fragments, straight from the DOM: the first
+# selector with matches wins
+RESULTS_SCRIPT = """
+const [selectors, limit] = arguments;
+for (const selector of selectors) {
+    const nodes = document.querySelectorAll(selector);
+    if (nodes.length) {
+        return Array.from(nodes).slice(0, limit).map(node => node.outerHTML);
+    }
+}
+return [];
+"""
+
+
+def is_cancelled(cancel):
+    return cancel is not None and cancel.is_set()
+
+
+def chrome_options(block_resources=True):
+    options = Options()
+    options.add_argument('--headless=new')  # Use new headless mode
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--window-size=1920,1080')
+    # Add realistic user agent
+    options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    if block_resources:
+        # get() returns at DOMContentLoaded; the result wait does the rest
+        options.page_load_strategy = 'eager'
+        options.add_argument('--disable-extensions')
+        options.add_argument('--mute-audio')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    return options
+
+
+def start_chrome():
+    block_resources = pool_setting('BLOCK_RESOURCES')
+    driver = webdriver.Chrome(options=chrome_options(block_resources))
+    if block_resources:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except WebDriverException as e:
+            print(f"⚠️  Warning: could not block browser resources: {e}")
+    return driver
+
+
+# Warm browsers shared by every scraper of the process
+browser_pool = BrowserPool(start_chrome)
+
 
 class BaseScraper:
+    """Retailer search: plain HTTP first, a pooled browser as fallback
+
+    Subclasses set ``retailer``, ``result_selectors`` (CSS selectors of
+    the result containers, tried in order), ``result_strainer`` (the tags
+    worth parsing from a search page) and implement ``search_url``,
+    ``extract_product_data`` and ``browser_search``.
+    """
+
+    retailer = None
+    result_selectors = []
+    result_strainer = None
+
     def __init__(self):
-        self.options = Options()
-        self.options.add_argument('--headless=new')  # Use new headless mode
-        self.options.add_argument('--disable-gpu')
-        self.options.add_argument('--no-sandbox')
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.options.add_argument('--window-size=1920,1080')
-        # Add realistic user agent
-        self.options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        self.options = chrome_options()
+
+    def search(self, query, max_results=8, cancel=None, deadline=None):
+        if is_cancelled(cancel):
+            return []
+        started = time.perf_counter()
+        items, fallback_reason = self.fetch_results(query, deadline)
+        if items is not None:
+            strategy = 'http'
+            products = self.extract_products(items, max_results)
+            print(f"[{self.retailer.upper()}] HTTP search extracted {len(products)} valid products")
+        else:
+            strategy = 'browser'
+            print(f"[{self.retailer.upper()}] HTTP search unusable ({fallback_reason}), using browser")
+            products = self.browser_search(query, max_results, cancel, deadline)
+        if not is_cancelled(cancel):
+            fetch_log.record(
+                self.retailer, query, strategy, len(products),
+                (time.perf_counter() - started) * 1000, fallback_reason,
+            )
+        return products
+
+    def fetch_results(self, query, deadline=None):
+        """Result containers of the server-rendered search page.
+
+        Returns ``(items, None)``, or ``(None, reason)`` when the page
+        can't be fetched or has none of the expected containers (e.g. a
+        captcha page), in which case the browser has to render it.
+        """
+        if not fetch_setting('ENABLED'):
+            return None, 'disabled'
+        html, reason = http_fetcher.get(self.search_url(query), deadline)
+        if html is None:
+            return None, reason
+        items = self.select_results(parse_html(html, self.result_strainer))
+        if not items:
+            return None, 'no result containers'
+        return items, None
+
+    def select_results(self, soup):
+        for selector in self.result_selectors:
+            items = soup.select(selector)
+            if items:
+                return items
+        return []
+
+    def dom_results(self, driver, max_results):
+        """Result containers read from the live DOM, each parsed on its own."""
+        fragments = driver.execute_script(RESULTS_SCRIPT, self.result_selectors, max_results)
+        return [parse_html(fragment) for fragment in fragments or []]
+
+    def extract_products(self, items, max_results):
+        products = []
+        for item in items[:max_results]:
+            try:
+                product = self.extract_product_data(item)
+                if product and product['price'] > 0:
+                    products.append(product)
+            except Exception:
+                continue
+        return products
     
-    def get_driver(self):
-        try:
-            return webdriver.Chrome(options=self.options)
-        except Exception as e:
-            print(f"Error initializing Chrome driver: {e}")
-            return None
+    def browser(self, deadline=None, cancel=None):
+        """Lease a pooled browser: ``with self.browser(...) as driver``; driver is None if unavailable"""
+        return browser_pool.lease(deadline, cancel)
+
+    def wait_for(self, driver, condition, cancel=None, deadline=None):
+        """Wait until ``condition`` holds, the search is cancelled or time runs out.
+
+        Gives up after PAGE_WAIT_SECONDS or at ``deadline`` (a
+        ``time.monotonic()`` value), whichever is first, raising
+        TimeoutException. ``cancel`` is checked on every poll.
+        """
+        timeout = PAGE_WAIT_SECONDS
+        if deadline is not None:
+            timeout = max(0, min(timeout, deadline - time.monotonic()))
+        WebDriverWait(driver, timeout).until(lambda d: is_cancelled(cancel) or condition(d))
 
 class AmazonScraper(BaseScraper):
+    retailer = 'amazon'
+    result_selectors = ["div[data-component-type='s-search-result']"]
+    result_strainer = SoupStrainer('div', attrs={'data-component-type': 's-search-result'})
+
     def __init__(self):
         super().__init__()
         self.base_url = "https://www.amazon.in/s"
 
-    def search(self, query, max_results=8):
+    def search_url(self, query):
+        return f"{self.base_url}?k={query.replace(' ', '+')}"
+
+    def browser_search(self, query, max_results=8, cancel=None, deadline=None):
         print(f"[AMAZON] Starting Selenium search for: {query}")
-        driver = self.get_driver()
-        if not driver:
-            return []
-            
         products = []
-        try:
-            search_url = f"{self.base_url}?k={query.replace(' ', '+')}"
-            driver.get(search_url)
-            
-            # Wait for products to load
+        with self.browser(deadline, cancel) as driver:
+            if not driver:
+                return []
             try:
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-component-type='s-search-result']"))
-                )
-            except TimeoutException:
-                print("[AMAZON] Timeout waiting for results")
-            
-            # Parse with BeautifulSoup for speed after loading
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            results = soup.select("div[data-component-type='s-search-result']")
-            print(f"[AMAZON] Found {len(results)} raw results")
+                driver.get(self.search_url(query))
             
-            for item in results[:max_results]:
+                # Wait for products to load
                 try:
-                    product = self.extract_product_data(item)
-                    if product and product['price'] > 0:
-                        products.append(product)
-                except Exception as e:
-                    continue
+                    self.wait_for(
+                        driver,
+                        EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-component-type='s-search-result']")),
+                        cancel, deadline,
+                    )
+                except TimeoutException:
+                    print("[AMAZON] Timeout waiting for results")
+                if is_cancelled(cancel):
+                    print(f"[AMAZON] Search cancelled: {query}")
+                    return []
+            
+                results = self.dom_results(driver, max_results)
+                print(f"[AMAZON] Found {len(results)} raw results")
+                products = self.extract_products(results, max_results)
                     
-        except Exception as e:
-            print(f"[AMAZON] Search error: {e}")
-        finally:
-            driver.quit()
+            except Exception as e:
+                print(f"[AMAZON] Search error: {e}")
             
         print(f"[AMAZON] Extracted {len(products)} valid products")
         return products
@@ -130,52 +287,48 @@ class AmazonScraper(BaseScraper):
             return None
 
 class FlipkartScraper(BaseScraper):
+    retailer = 'flipkart'
+    result_selectors = ["._2kHMtA", "._1UoZlX", "._4ddWXP", "div[data-id]"]
+    # Product cards are div[data-id] wrappers around the listing containers
+    result_strainer = SoupStrainer('div', attrs={'data-id': True})
+
     def __init__(self):
         super().__init__()
         self.base_url = "https://www.flipkart.com/search"
 
-    def search(self, query):
+    def search_url(self, query):
+        return f"{self.base_url}?q={query.replace(' ', '+')}"
+
+    def browser_search(self, query, max_results=8, cancel=None, deadline=None):
         print(f"[FLIPKART] Starting Selenium search for: {query}")
-        driver = self.get_driver()
-        if not driver:
-            return []
-            
         products = []
-        try:
-            search_url = f"{self.base_url}?q={query.replace(' ', '+')}"
-            driver.get(search_url)
-            
-            # Wait for any common result container
+        with self.browser(deadline, cancel) as driver:
+            if not driver:
+                return []
             try:
-                WebDriverWait(driver, 10).until(
-                    lambda d: d.find_elements(By.CLASS_NAME, "_1UoZlX") or 
-                             d.find_elements(By.CLASS_NAME, "_4ddWXP") or
-                             d.find_elements(By.CLASS_NAME, "_2kHMtA")
-                )
-            except TimeoutException:
-                print("[FLIPKART] Timeout waiting for results")
-
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
+                driver.get(self.search_url(query))
             
-            # Try multiple selectors
-            items = []
-            for selector in ["._2kHMtA", "._1UoZlX", "._4ddWXP", "div[data-id]"]:
-                items = soup.select(selector)
-                if items: break
-                
-            print(f"[FLIPKART] Found {len(items)} raw results")
-            
-            for item in items[:8]:
+                # Wait for any common result container
                 try:
-                    product = self.extract_product_data(item)
-                    if product and product['price'] > 0:
-                        products.append(product)
-                except: continue
+                    self.wait_for(
+                        driver,
+                        lambda d: d.find_elements(By.CLASS_NAME, "_1UoZlX") or 
+                                 d.find_elements(By.CLASS_NAME, "_4ddWXP") or
+                                 d.find_elements(By.CLASS_NAME, "_2kHMtA"),
+                        cancel, deadline,
+                    )
+                except TimeoutException:
+                    print("[FLIPKART] Timeout waiting for results")
+                if is_cancelled(cancel):
+                    print(f"[FLIPKART] Search cancelled: {query}")
+                    return []
+
+                items = self.dom_results(driver, max_results)
+                print(f"[FLIPKART] Found {len(items)} raw results")
+                products = self.extract_products(items, max_results)
                 
-        except Exception as e:
-            print(f"[FLIPKART] Search error: {e}")
-        finally:
-            driver.quit()
+            except Exception as e:
+                print(f"[FLIPKART] Search error: {e}")
             
         print(f"[FLIPKART] Extracted {len(products)} valid products")
         return products
@@ -231,11 +384,28 @@ class FlipkartScraper(BaseScraper):
             return None
 
 class ProductSearcher:
-    """Unified product searcher combining Selenium scraping with fallback"""
+    """Unified product searcher combining Selenium scraping with fallback
+
+    Every (retailer, query) search is first looked up in the scrape
+    cache: fresh and stale entries are used at once (stale ones are
+    re-scraped in the background, on the cache's own refresh pool). When
+    the cached products are already ENOUGH_PRODUCTS the misses are not
+    searched; otherwise they run concurrently on a shared thread pool,
+    coalesced with identical in-flight scrapes. Results are
+    merged as they complete; once ENOUGH_PRODUCTS are collected or
+    DEADLINE_SECONDS have passed, the remaining searches are cancelled
+    (queued ones never start, running ones stop at their next wait poll
+    and close their browser) unless another request still waits on them.
+    """
     
     def __init__(self):
         self.amazon = AmazonScraper()
         self.flipkart = FlipkartScraper()
+        self.retailers = [('amazon', self.amazon), ('flipkart', self.flipkart)]
+        self._reset_pool()
+        if hasattr(os, "register_at_fork"):
+            # Pool threads do not survive a fork; start a fresh pool lazily
+            os.register_at_fork(after_in_child=self._reset_pool)
         
         # Comprehensive fallback database
         self.product_database = {
@@ -255,23 +425,22 @@ class ProductSearcher:
             ]
         }
     
+    def _reset_pool(self):
+        self._pool_lock = threading.Lock()
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=search_setting('MAX_WORKERS'), thread_name_prefix='product-search'
+                    )
+        return self._pool
+
     def search(self, queries, parsed_requirements=None):
         print(f"[SEARCHER] Processing queries: {queries}")
-        all_products = []
-        
-        # Try live scraping
-        for query in queries[:2]: # Limit to 2 queries to save time
-            try:
-                # Selenium is slow, run efficiently
-                amz_results = self.amazon.search(query)
-                all_products.extend(amz_results)
-                
-                fk_results = self.flipkart.search(query)
-                all_products.extend(fk_results)
-                
-                if len(all_products) >= 5: break
-            except Exception as e:
-                print(f"[SEARCHER] Error scraping '{query}': {e}")
+        all_products = self._scrape(queries[:search_setting('MAX_QUERIES')])
 
         # If scraping returned nothing, use fallback
         if not all_products:
@@ -280,6 +449,57 @@ class ProductSearcher:
             
         return self._deduplicate(all_products)
 
+    def _scrape(self, queries):
+        """Run every (retailer, query) search concurrently; returns the merged products"""
+        deadline = time.monotonic() + search_setting('DEADLINE_SECONDS')
+        enough = search_setting('ENOUGH_PRODUCTS')
+        executor = self._executor()
+
+        all_products = []
+        misses = []
+        for query in queries:
+            for retailer, scraper in self.retailers:
+                cached, state = scrape_cache.lookup(retailer, query)
+                if cached is not None:
+                    print(f"[SEARCHER] {state.capitalize()} cache hit for {retailer} '{query}'")
+                    all_products.extend(cached)
+                    if state == 'stale':
+                        scrape_cache.refresh(scraper, query)
+                    continue
+                misses.append((retailer, scraper, query))
+        if misses and len(all_products) >= enough:
+            print(f"[SEARCHER] Enough cached products, skipping {len(misses)} searches")
+            return all_products
+
+        tasks = {}
+        for retailer, scraper, query in misses:
+            scrape = scrape_cache.join(scraper, query, executor, deadline)
+            if scrape.future in tasks:
+                # Same normalized query twice in this search
+                scrape_cache.leave(scrape)
+                continue
+            tasks[scrape.future] = (len(tasks), retailer, query, scrape)
+
+        pending = set(tasks)
+        try:
+            while pending and len(all_products) < enough:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"[SEARCHER] Deadline reached, cancelling {len(pending)} searches")
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                # Merge searches finishing together in submission order
+                for future in sorted(done, key=lambda f: tasks[f][0]):
+                    _, retailer, query, _ = tasks[future]
+                    try:
+                        all_products.extend(future.result())
+                    except Exception as e:
+                        print(f"[SEARCHER] Error scraping {retailer} '{query}': {e}")
+        finally:
+            for _, _, _, scrape in tasks.values():
+                scrape_cache.leave(scrape)
+        return all_products
+
     def get_fallback_products(self, parsed_requirements):
         device_type = 'laptop'
         if parsed_requirements:
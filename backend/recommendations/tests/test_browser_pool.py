@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from recommendations.browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.quit_called = False
+        self.visited = []
+        self.cookies_cleared = 0
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeout = seconds
+
+    def delete_all_cookies(self):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        self.cookies_cleared += 1
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def quit(self):
+        self.quit_called = True
+
+
+@override_settings(BROWSER_POOL={"SIZE": 1, "MAX_USES": 3, "ACQUIRE_TIMEOUT_SECONDS": 1.0,
+                                 "PAGE_LOAD_TIMEOUT_SECONDS": 30.0, "BLOCK_RESOURCES": True})
+class BrowserPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.drivers = []
+        self.pool = BrowserPool(self.start_driver)
+        self.addCleanup(self.pool.close)
+
+    def start_driver(self):
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+    def test_sessions_are_reset_and_reused(self):
+        with self.pool.lease() as first:
+            first.get("https://www.amazon.in/s?k=laptop")
+        with self.pool.lease() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(first.visited[-1], "about:blank")
+        self.assertEqual(first.cookies_cleared, 2)
+        self.assertEqual(self.pool.stats()["started"], 1)
+
+    def test_session_is_recycled_after_max_uses(self):
+        for _ in range(4):
+            with self.pool.lease():
+                pass
+
+        self.assertEqual(len(self.drivers), 2)
+        self.assertTrue(self.drivers[0].quit_called)
+        self.assertEqual(self.pool.stats()["recycled"], 1)
+
+    def test_crashed_browser_is_replaced(self):
+        with self.pool.lease() as driver:
+            driver.alive = False
+        with self.pool.lease() as replacement:
+            self.assertIsNot(replacement, driver)
+
+        self.assertTrue(driver.quit_called)
+        self.assertEqual(self.pool.stats()["crashed"], 1)
+
+    def test_waiting_for_a_session_stops_at_the_deadline_or_on_cancel(self):
+        cancel = threading.Event()
+        with self.pool.lease():
+            with self.pool.lease(deadline=time.monotonic() + 0.05) as driver:
+                self.assertIsNone(driver)
+            cancel.set()
+            started = time.monotonic()
+            with self.pool.lease(deadline=time.monotonic() + 10, cancel=cancel) as driver:
+                self.assertIsNone(driver)
+            self.assertLess(time.monotonic() - started, 1.0)
+
+        self.assertEqual(self.pool.stats()["timeouts"], 2)
+
+    def test_returned_session_wakes_a_waiter(self):
+        leased = threading.Event()
+        result = {}
+
+        def waiter():
+            leased.wait(5)
+            with self.pool.lease(deadline=time.monotonic() + 5) as driver:
+                result["driver"] = driver
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        with self.pool.lease() as driver:
+            leased.set()
+            time.sleep(0.05)
+        thread.join(5)
+
+        self.assertIs(result["driver"], driver)
+        self.assertEqual(self.pool.stats()["waited"], 1)
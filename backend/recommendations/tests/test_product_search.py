@@ -0,0 +1,72 @@
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from recommendations.scrapers import ProductSearcher
+
+
+class FakeScraper:
+    """Returns ``products`` after ``delay`` seconds unless cancelled first."""
+
+    def __init__(self, retailer, products, delay=0.0):
+        self.retailer = retailer
+        self.products = products
+        self.delay = delay
+        self.cancelled = threading.Event()
+
+    def search(self, query, max_results=8, cancel=None, deadline=None):
+        waited = cancel.wait(self.delay) if cancel is not None else time.sleep(self.delay)
+        if waited:
+            self.cancelled.set()
+            return []
+        return [{**product, 'name': f"{product['name']} {query}"} for product in self.products]
+
+
+def products(count, retailer):
+    return [{'name': f'{retailer} laptop {i}', 'price': 40000 + i, 'source': retailer} for i in range(count)]
+
+
+@override_settings(
+    PRODUCT_SEARCH={'MAX_WORKERS': 4, 'MAX_QUERIES': 2, 'DEADLINE_SECONDS': 0.3, 'ENOUGH_PRODUCTS': 5},
+    SCRAPE_CACHE={'ENABLED': False},
+)
+class ProductSearcherTests(SimpleTestCase):
+    def make_searcher(self, *scrapers):
+        searcher = ProductSearcher()
+        searcher.retailers = [(scraper.retailer, scraper) for scraper in scrapers]
+        self.addCleanup(lambda: searcher._pool and searcher._pool.shutdown(wait=False))
+        return searcher
+
+    def test_slow_searches_are_cancelled_once_enough_products_arrive(self):
+        # The fast search answers once the slow one is running
+        fast = FakeScraper('amazon', products(5, 'amazon'), delay=0.05)
+        slow = FakeScraper('flipkart', products(5, 'flipkart'), delay=5.0)
+        searcher = self.make_searcher(fast, slow)
+
+        started = time.monotonic()
+        found = searcher.search(['gaming laptop'])
+
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual({product['source'] for product in found}, {'amazon'})
+        self.assertTrue(slow.cancelled.wait(1))
+
+    def test_deadline_keeps_what_arrived_and_cancels_the_rest(self):
+        fast = FakeScraper('amazon', products(2, 'amazon'))
+        slow = FakeScraper('flipkart', products(5, 'flipkart'), delay=5.0)
+        searcher = self.make_searcher(fast, slow)
+
+        started = time.monotonic()
+        found = searcher.search(['gaming laptop', 'office laptop', 'ignored laptop'])
+
+        self.assertLess(time.monotonic() - started, 1.0)
+        # Both allowed queries were searched on the fast retailer, the third never was
+        self.assertEqual(len(found), 4)
+        self.assertFalse(any('ignored' in product['name'] for product in found))
+        self.assertTrue(slow.cancelled.wait(1))
+
+    def test_nothing_in_time_falls_back_to_the_database(self):
+        searcher = self.make_searcher(FakeScraper('amazon', products(3, 'amazon'), delay=5.0))
+        found = searcher.search(['budget phone'], {'device_type': 'phone'})
+        self.assertTrue(found)
+        self.assertEqual({product['source'] for product in found}, {'manual'})
@@ -0,0 +1,145 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from recommendations.models import ScrapeCacheEntry
+from recommendations.scrape_cache import ScrapeCache, normalize_query
+
+
+CACHE_SETTINGS = {
+    'ENABLED': True,
+    'TTL_SECONDS': {'amazon': 60},
+    'DEFAULT_TTL_SECONDS': 60,
+    'STALE_SECONDS': 600,
+    'REFRESH_DEADLINE_SECONDS': 5.0,
+    'REFRESH_WORKERS': 1,
+    'REFRESH_MAX_PENDING': 16,
+}
+
+
+class BlockingScraper:
+    """Returns ``products`` once ``release`` is set; records each call's thread."""
+
+    def __init__(self, retailer='amazon', products=None):
+        self.retailer = retailer
+        self.products = products if products is not None else [{'name': 'Laptop', 'price': 50000}]
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+
+    def search(self, query, cancel=None, deadline=None):
+        self.calls.append(threading.current_thread().name)
+        self.started.set()
+        while not self.release.wait(0.01):
+            if cancel is not None and cancel.is_set():
+                return []
+        return self.products
+
+
+class NormalizeQueryTests(SimpleTestCase):
+    def test_equivalent_queries_share_a_key(self):
+        self.assertEqual(
+            normalize_query("Best gaming laptop under ₹80,000"),
+            normalize_query("best Gaming laptop, under 80k"),
+        )
+        self.assertEqual(normalize_query("laptop under Rs. 80,000"), normalize_query("laptop under 80000"))
+        self.assertEqual(normalize_query("phone under 1.5 lakh"), normalize_query("phone under INR 150000"))
+        self.assertNotEqual(normalize_query("laptop under 80k"), normalize_query("laptop under 90k"))
+
+    def test_word_order_and_repeats_are_kept(self):
+        self.assertEqual(normalize_query("Pixel 7 case"), "pixel 7 case")
+        self.assertNotEqual(normalize_query("case for pixel 7"), normalize_query("pixel 7 for case"))
+        self.assertNotEqual(normalize_query("usb c to usb a"), normalize_query("usb c to a"))
+
+
+@override_settings(SCRAPE_CACHE=CACHE_SETTINGS)
+class ScrapeCacheTests(TransactionTestCase):
+    def setUp(self):
+        self.cache = ScrapeCache()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def store(self, query, age_seconds, products=None):
+        self.cache.store('amazon', query, products or [{'name': 'Cached'}])
+        ScrapeCacheEntry.objects.filter(query_key=normalize_query(query)).update(
+            fetched_at=timezone.now() - timedelta(seconds=age_seconds),
+        )
+
+    def test_fresh_stale_and_expired_entries(self):
+        self.store('gaming laptop', age_seconds=10)
+        self.assertEqual(self.cache.lookup('amazon', 'Gaming  laptop!'), ([{'name': 'Cached'}], 'fresh'))
+
+        self.store('gaming laptop', age_seconds=300)
+        self.assertEqual(self.cache.lookup('amazon', 'gaming laptop'), ([{'name': 'Cached'}], 'stale'))
+
+        self.store('gaming laptop', age_seconds=700)
+        self.assertEqual(self.cache.lookup('amazon', 'gaming laptop'), (None, None))
+        stats = self.cache.stats()
+        self.assertEqual((stats['fresh_hits'], stats['stale_hits'], stats['misses']), (1, 1, 1))
+
+    def test_counters_are_exact_under_concurrent_lookups(self):
+        self.store('gaming laptop', age_seconds=10)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: self.cache.lookup('amazon', 'gaming laptop'), range(200)))
+        self.assertEqual(self.cache.stats()['fresh_hits'], 200)
+
+    def test_concurrent_misses_share_one_scrape(self):
+        scraper = BlockingScraper()
+        deadline = time.monotonic() + 5
+        first = self.cache.join(scraper, 'gaming laptop', self.executor, deadline)
+        second = self.cache.join(scraper, 'Gaming Laptop', self.executor, deadline)
+        self.assertIs(first, second)
+
+        scraper.release.set()
+        self.assertEqual(first.future.result(timeout=5), scraper.products)
+        self.cache.leave(first)
+        self.cache.leave(second)
+        self.assertEqual(len(scraper.calls), 1)
+        self.assertEqual(self.cache.stats()['coalesced'], 1)
+        self.assertEqual(self.cache.lookup('amazon', 'gaming laptop'), (scraper.products, 'fresh'))
+
+    def test_scrape_is_cancelled_once_every_waiter_left(self):
+        scraper = BlockingScraper()
+        deadline = time.monotonic() + 5
+        first = self.cache.join(scraper, 'gaming laptop', self.executor, deadline)
+        second = self.cache.join(scraper, 'gaming laptop', self.executor, deadline)
+        scraper.started.wait(5)
+
+        self.cache.leave(first)
+        self.assertFalse(first.cancel.is_set())
+        self.cache.leave(second)
+        self.assertTrue(first.cancel.is_set())
+        self.assertEqual(first.future.result(timeout=5), [])
+        # Nothing stored for the cancelled scrape
+        self.assertEqual(self.cache.lookup('amazon', 'gaming laptop'), (None, None))
+
+    def test_stale_refresh_runs_on_refresh_pool(self):
+        self.store('gaming laptop', age_seconds=300)
+        scraper = BlockingScraper(products=[{'name': 'Refreshed'}])
+        self.cache.refresh(scraper, 'gaming laptop')
+        self.cache.refresh(scraper, 'Gaming Laptop')
+        scraper.release.set()
+        self.cache._refresh_executor().shutdown(wait=True)
+
+        self.assertEqual(len(scraper.calls), 1)
+        self.assertTrue(scraper.calls[0].startswith('scrape-refresh'))
+        self.assertEqual(self.cache.lookup('amazon', 'gaming laptop'), ([{'name': 'Refreshed'}], 'fresh'))
+        self.assertEqual(self.cache.stats()['refreshes'], 1)
+
+    @override_settings(SCRAPE_CACHE={**CACHE_SETTINGS, 'REFRESH_MAX_PENDING': 1})
+    def test_refreshes_beyond_limit_are_skipped(self):
+        scraper = BlockingScraper()
+        self.cache.refresh(scraper, 'gaming laptop')
+        self.cache.refresh(scraper, 'office laptop')
+        scraper.release.set()
+        self.cache._refresh_executor().shutdown(wait=True)
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['refreshes'], stats['refreshes_skipped'], stats['in_flight']), (1, 1, 0))
+        self.assertEqual(len(scraper.calls), 1)
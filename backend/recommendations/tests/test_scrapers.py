@@ -0,0 +1,129 @@
+from contextlib import nullcontext
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from recommendations import scrapers
+from recommendations.http_fetcher import FetchStrategyLog
+
+
+AMAZON_RESULT = """
+<div data-component-type="s-search-result">
+  <h2><a href="/dp/{asin}"><span>Lenovo IdeaPad Slim {asin}</span></a></h2>
+  <span class="a-price"><span class="a-offscreen">&#8377;{price}</span></span>
+  <img class="s-image" src="https://m.media-amazon.com/{asin}.jpg">
+</div>
+"""
+AMAZON_PAGE = "<html><body><div id='nav'>menu</div>{results}</body></html>"
+CAPTCHA_PAGE = "<html><body><form action='/errors/validateCaptcha'></form></body></html>"
+
+
+def amazon_page(*items):
+    return AMAZON_PAGE.format(results="".join(AMAZON_RESULT.format(asin=asin, price=price) for asin, price in items))
+
+
+@override_settings(HTTP_FETCH={'ENABLED': True, 'TIMEOUT_SECONDS': 1.0, 'POOL_SIZE': 2})
+class HttpFirstSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.scraper = scrapers.AmazonScraper()
+        self.log = FetchStrategyLog()
+        log = mock.patch.object(scrapers, "fetch_log", self.log)
+        log.start()
+        self.addCleanup(log.stop)
+        browser = mock.patch.object(self.scraper, "browser_search", return_value=[{'name': 'from browser'}])
+        self.browser_search = browser.start()
+        self.addCleanup(browser.stop)
+
+    def fetch(self, html=None, reason=None):
+        return mock.patch.object(scrapers.http_fetcher, "get", return_value=(html, reason))
+
+    def test_server_rendered_results_skip_the_browser(self):
+        with self.fetch(amazon_page(("A1", "45,990"), ("A2", "52,000"))) as get:
+            products = self.scraper.search("ideapad slim")
+
+        get.assert_called_once()
+        self.assertEqual(get.call_args.args[0], "https://www.amazon.in/s?k=ideapad+slim")
+        self.assertEqual([(p['name'], p['price']) for p in products],
+                         [("Lenovo IdeaPad Slim A1", 45990), ("Lenovo IdeaPad Slim A2", 52000)])
+        self.assertEqual(products[0]['amazon_link'], "https://www.amazon.in/dp/A1")
+        self.browser_search.assert_not_called()
+        self.assertEqual(self.log.stats()['retailers']['amazon']['http'], 1)
+
+    def test_page_without_results_falls_back_to_the_browser(self):
+        with self.fetch(CAPTCHA_PAGE):
+            products = self.scraper.search("ideapad slim")
+
+        self.assertEqual(products, [{'name': 'from browser'}])
+        [entry] = self.log.stats()['recent']
+        self.assertEqual((entry['strategy'], entry['fallback_reason']), ('browser', 'no result containers'))
+
+    def test_failed_fetch_falls_back_to_the_browser(self):
+        with self.fetch(reason='status 503'):
+            self.scraper.search("ideapad slim")
+
+        self.browser_search.assert_called_once()
+        self.assertEqual(self.log.stats()['recent'][0]['fallback_reason'], 'status 503')
+
+    def test_disabled_fast_path_goes_straight_to_the_browser(self):
+        with self.settings(HTTP_FETCH={'ENABLED': False}), self.fetch(amazon_page(("A1", "45,990"))) as get:
+            self.scraper.search("ideapad slim")
+
+        get.assert_not_called()
+        self.browser_search.assert_called_once()
+
+
+class StubDriver:
+    """Browser stand-in serving a page's result containers to RESULTS_SCRIPT."""
+
+    def __init__(self, fragments):
+        self.fragments = fragments
+        self.scripts = []
+        self.cdp = []
+        self.visited = []
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def find_element(self, by, selector):
+        return object()
+
+    def execute_script(self, script, *args):
+        self.scripts.append(args)
+        selectors, limit = args
+        return self.fragments[:limit]
+
+    def execute_cdp_cmd(self, command, params):
+        self.cdp.append((command, params))
+
+
+class BrowserSearchTests(SimpleTestCase):
+    def test_results_are_read_from_the_dom(self):
+        scraper = scrapers.AmazonScraper()
+        driver = StubDriver([AMAZON_RESULT.format(asin=asin, price="49,990") for asin in ("B1", "B2", "B3")])
+        with mock.patch.object(scraper, "browser", return_value=nullcontext(driver)):
+            products = scraper.browser_search("ideapad slim", max_results=2)
+
+        self.assertEqual(driver.visited, ["https://www.amazon.in/s?k=ideapad+slim"])
+        self.assertEqual(driver.scripts, [(scraper.result_selectors, 2)])
+        self.assertEqual([p['name'] for p in products], ["Lenovo IdeaPad Slim B1", "Lenovo IdeaPad Slim B2"])
+        self.assertEqual(products[0]['image'], "https://m.media-amazon.com/B1.jpg")
+
+    def test_browsers_block_heavy_resources(self):
+        driver = StubDriver([])
+        with self.settings(BROWSER_POOL={'BLOCK_RESOURCES': True}), \
+                mock.patch.object(scrapers.webdriver, "Chrome", return_value=driver) as chrome:
+            scrapers.start_chrome()
+
+        options = chrome.call_args.kwargs["options"]
+        self.assertEqual(options.page_load_strategy, "eager")
+        self.assertEqual(options.experimental_options["prefs"]["profile.managed_default_content_settings.images"], 2)
+        self.assertEqual(driver.cdp[-1], ("Network.setBlockedURLs", {"urls": scrapers.BLOCKED_URL_PATTERNS}))
+
+    def test_resource_blocking_can_be_turned_off(self):
+        driver = StubDriver([])
+        with self.settings(BROWSER_POOL={'BLOCK_RESOURCES': False}), \
+                mock.patch.object(scrapers.webdriver, "Chrome", return_value=driver) as chrome:
+            scrapers.start_chrome()
+
+        self.assertEqual(chrome.call_args.kwargs["options"].page_load_strategy, "normal")
+        self.assertEqual(driver.cdp, [])
@@ -5,9 +5,8 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from .models import RequirementQuery, ProductResult
 from .serializers import RequirementQuerySerializer, ProductResultSerializer
-from .llm_service import LLMService
-from .scrapers import ProductSearcher
-from .sidba_engine import SIDBAEngine
+from .components import components
+from .dynamic_product_manager import DynamicProductManager
 
 
 @api_view(['POST'])
@@ -37,17 +36,12 @@ def find_products(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Initialize services
-        llm_service = LLMService()
-        product_searcher = ProductSearcher()
-        sidba_engine = SIDBAEngine()
-        
-        # NEW: Initialize semantic matcher and partial scorer
-        from .semantic_matcher import SemanticMatcher
-        from .partial_match_scorer import PartialMatchScorer
-        
-        semantic_matcher = SemanticMatcher()
-        partial_scorer = PartialMatchScorer()
+        # Process-wide services (built once, see components.py)
+        llm_service = components.get('llm')
+        product_searcher = components.get('product_searcher')
+        sidba_engine = components.get('sidba_engine')
+        semantic_matcher = components.get('semantic_matcher')
+        partial_scorer = components.get('partial_scorer')
         
         # Step 1: Parse requirements with LLM
         parsed_requirements = llm_service.parse_requirements(requirements_text)
@@ -93,7 +87,7 @@ def find_products(request):
         # This happens before ranking so discounts can influence ranking
         if all_products:
             try:
-                from .dynamic_product_manager import DynamicProductManager
+                # Per request: it keeps price caches and history
                 dynamic_manager = DynamicProductManager()
                 
                 # Update top products with live prices (sample to avoid rate limiting)
@@ -113,14 +107,9 @@ def find_products(request):
         
         # === NEW ADVANCED FILTERING PIPELINE ===
         
-        # Import validators
-        from .constraint_validator import ConstraintValidator
-        from .spec_verifier import SpecVerifier
-        from .availability_checker import AvailabilityChecker
-        
-        constraint_validator = ConstraintValidator()
-        spec_verifier = SpecVerifier()
-        availability_checker = AvailabilityChecker()
+        constraint_validator = components.get('constraint_validator')
+        spec_verifier = components.get('spec_verifier')
+        availability_checker = components.get('availability_checker')
         
         print(f"[FILTERING] Starting with {len(all_products)} products")
         